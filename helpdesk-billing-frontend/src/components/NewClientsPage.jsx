@@ -94,7 +94,7 @@ const NewClientsPage = () => {
       if (response.data.clients) {
         response.data.clients.forEach(client => {
           metrics[client.client_name] = {
-            tickets: client.tickets?.length || 0,
+            tickets: client.tickets_count ?? client.tickets?.length ?? 0,
             total_hours: client.total_hours || 0,
             total_value: client.total_value || 0,
             overtime_hours: client.overtime_hours || 0,
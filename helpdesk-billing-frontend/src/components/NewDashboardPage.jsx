@@ -218,7 +218,7 @@ const NewDashboardPage = ({ onNavigate }) => {
                           <div>
                             <div className="font-semibold">{client.client_name}</div>
                             <div className="text-sm text-gray-500">
-                              {client.tickets?.length || 0} chamados • {formatHoursToHoursMinutes(client.total_hours)}
+                              {client.tickets_count ?? client.tickets?.length ?? 0} chamados • {formatHoursToHoursMinutes(client.total_hours)}
                             </div>
                           </div>
                         </div>
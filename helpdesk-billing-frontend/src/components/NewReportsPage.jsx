@@ -534,7 +534,7 @@ const NewReportsPage = () => {
                             <div>
                               <div className="font-medium">{client.client_name}</div>
                               <div className="text-sm text-muted-foreground">
-                                {client.tickets?.length || 0} tickets
+                                {client.tickets_count ?? client.tickets?.length ?? 0} tickets
                               </div>
                             </div>
                           </TableCell>
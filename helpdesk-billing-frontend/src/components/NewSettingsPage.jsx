@@ -37,6 +37,7 @@ const NewSettingsPage = () => {
   const [file, setFile] = useState(null)
   const [uploading, setUploading] = useState(false)
   const [uploadResult, setUploadResult] = useState(null)
+  const [uploadJob, setUploadJob] = useState(null)
   const [error, setError] = useState(null)
   const [periods, setPeriods] = useState([])
   const [uploadBatches, setUploadBatches] = useState([])
@@ -105,8 +106,9 @@ const NewSettingsPage = () => {
   const handleFileChange = (event) => {
     const selectedFile = event.target.files[0]
     if (selectedFile) {
-      if (!selectedFile.name.endsWith('.xlsx') && !selectedFile.name.endsWith('.xls')) {
-        setError('Por favor, selecione um arquivo Excel (.xlsx ou .xls)')
+      const allowedExtensions = ['.xlsx', '.xls', '.csv', '.parquet']
+      if (!allowedExtensions.some((ext) => selectedFile.name.toLowerCase().endsWith(ext))) {
+        setError('Por favor, selecione uma planilha (.xlsx, .xls, .csv ou .parquet)')
         return
       }
       setFile(selectedFile)
@@ -132,6 +134,8 @@ const NewSettingsPage = () => {
 
     const formData = new FormData()
     formData.append('file', file)
+    // Processamento em segundo plano, acompanhado por /api/upload/jobs/<id>
+    formData.append('async', 'true')
     
     // Adicionar período se especificado manualmente
     if (useManualPeriod && selectedMonth && selectedYear) {
@@ -140,13 +144,28 @@ const NewSettingsPage = () => {
     }
 
     try {
+      // O upload apenas registra um job; o processamento roda em segundo plano
       const response = await axios.post('/api/upload', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
       })
 
-      setUploadResult(response.data)
+      let job = response.data
+      setUploadJob(job)
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000))
+        const statusResponse = await axios.get(`/api/upload/jobs/${job.id}`)
+        job = statusResponse.data
+        setUploadJob(job)
+      }
+
+      if (job.status === 'failed') {
+        setError(job.error || 'Erro ao processar o arquivo')
+        return
+      }
+
+      setUploadResult(job.result)
       setFile(null)
       setSelectedMonth('')
       setSelectedYear('')
@@ -164,6 +183,7 @@ const NewSettingsPage = () => {
       setError(err.response?.data?.error || 'Erro no upload do arquivo')
     } finally {
       setUploading(false)
+      setUploadJob(null)
     }
   }
 
@@ -287,13 +307,13 @@ const NewSettingsPage = () => {
                     <Input
                       id="file-input"
                       type="file"
-                      accept=".xlsx,.xls"
+                      accept=".xlsx,.xls,.csv,.parquet"
                       onChange={handleFileChange}
                       className="mt-2"
                     />
                   </div>
                   <p className="mt-2 text-sm text-gray-500">
-                    Arquivos suportados: .xlsx, .xls (máx. 50MB)
+                    Arquivos suportados: .xlsx, .xls, .csv, .parquet (máx. 50MB)
                   </p>
                 </div>
               </div>
@@ -369,7 +389,7 @@ const NewSettingsPage = () => {
                       {uploading ? (
                         <>
                           <Loader2 className="h-4 w-4 mr-2 animate-spin" />
-                          Processando...
+                          {uploadJob?.progress != null ? `Processando... ${Math.round(uploadJob.progress)}%` : 'Processando...'}
                         </>
                       ) : (
                         <>
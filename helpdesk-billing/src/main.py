@@ -9,6 +9,10 @@ from flask import Flask, send_from_directory, jsonify
 from src.database import db
 from src.models.user import User
 from src.models.client import Client, TicketData
+from src.models.upload_job import UploadJob
+from src.models.period_version import PeriodVersion
+from src.models.rollup import PeriodClientRollup, PeriodTechnicianRollup, PeriodHourlyRollup
+from src.models.invoice_snapshot import ClosedPeriod, InvoiceSnapshot
 from src.routes.user import user_bp
 from src.routes.billing import billing_bp
 from src.routes.reports import reports_bp
@@ -17,6 +21,7 @@ from src.routes.technician import technician_bp
 from src.routes.admin import admin_bp
 from src.routes.analytics import analytics_bp
 from src.routes.auto_clients import auto_clients_bp
+from src.services.upload_jobs import upload_job_manager
 
 def create_app():
     """Cria e configura a aplicação Flask."""
@@ -53,6 +58,18 @@ def create_app():
     app.register_blueprint(analytics_bp, url_prefix='/api')
     app.register_blueprint(auto_clients_bp, url_prefix='/api')
 
+    # --- Fila de uploads assíncronos (jobs interrompidos são retomados no primeiro request) ---
+    upload_job_manager.init_app(app)
+
+    # --- Comandos de linha de comando (flask <comando>) ---
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Recalcula as tabelas de resumo por período a partir de ticket_data."""
+        from src.services.rollups import rollup_service
+        summary = rollup_service.rebuild_all()
+        print(f"✅ Resumos reconstruídos: {summary['periods']} períodos, "
+              f"{summary['client_rows']} linhas de clientes, {summary['technician_rows']} linhas de técnicos")
+
     # --- Servir Arquivos Estáticos (Frontend) ---
     @app.route('/')
     def serve_index():
@@ -91,6 +108,13 @@ with app.app_context():
     # Criar tabelas (caso não existam)
     db.create_all()
     
+    # Calcular os resumos por período em bancos criados antes deles
+    try:
+        from src.services.rollups import rollup_service
+        rollup_service.ensure_built()
+    except Exception as e:
+        print(f"⚠️ Erro ao construir resumos por período: {e}")
+    
     # Configurar SQLite para melhor performance
     try:
         if 'sqlite' in app.config['SQLALCHEMY_DATABASE_URI']:
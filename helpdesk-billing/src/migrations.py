@@ -7,7 +7,7 @@ import logging
 from datetime import datetime
 from flask import current_app
 from src.database import db
-from src.models.client import Client, TicketData
+from src.models.client import Client, TicketData, normalize_name
 
 logger = logging.getLogger(__name__)
 
@@ -239,6 +239,454 @@ class DatabaseMigrator:
             logger.error(f"❌ Erro na migração 005: {e}")
             return False
     
+    def migration_006_create_upload_jobs_table(self):
+        """Migração 006: Criar tabela de jobs de upload (processamento assíncrono)"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS upload_jobs (
+                    id VARCHAR(36) PRIMARY KEY,
+                    filename VARCHAR(255) NOT NULL,
+                    file_path VARCHAR(500) NOT NULL,
+                    month INTEGER,
+                    year INTEGER,
+                    streaming BOOLEAN DEFAULT 0,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    processed_rows INTEGER DEFAULT 0,
+                    total_rows INTEGER,
+                    batch_id VARCHAR(50),
+                    result TEXT,
+                    error TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    started_at DATETIME,
+                    finished_at DATETIME
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_upload_jobs_status ON upload_jobs(status)")
+            logger.info("✅ Tabela upload_jobs verificada/criada")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 006: {e}")
+            return False
+    
+    def migration_007_add_incremental_ingestion(self):
+        """Migração 007: Adicionar row_hash em ticket_data e incremental em upload_jobs"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            if 'row_hash' not in self.get_table_columns('ticket_data'):
+                cursor.execute("ALTER TABLE ticket_data ADD COLUMN row_hash VARCHAR(16)")
+                logger.info("✅ Coluna row_hash adicionada à tabela ticket_data")
+            
+            # Localiza rapidamente os tickets de um período na comparação incremental
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_data_period_ticket
+                ON ticket_data(processing_year, processing_month, ticket_id)
+            """)
+            
+            if 'incremental' not in self.get_table_columns('upload_jobs'):
+                cursor.execute("ALTER TABLE upload_jobs ADD COLUMN incremental BOOLEAN DEFAULT 0")
+                logger.info("✅ Coluna incremental adicionada à tabela upload_jobs")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 007: {e}")
+            return False
+    
+    def migration_008_add_upload_content_hash(self):
+        """Migração 008: Adicionar content_hash (SHA-256 do arquivo) em upload_jobs"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            if 'content_hash' not in self.get_table_columns('upload_jobs'):
+                cursor.execute("ALTER TABLE upload_jobs ADD COLUMN content_hash VARCHAR(64)")
+                logger.info("✅ Coluna content_hash adicionada à tabela upload_jobs")
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_upload_jobs_content_hash ON upload_jobs(content_hash)")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 008: {e}")
+            return False
+    
+    def migration_009_add_upload_batch_index(self):
+        """Migração 009: Índice em ticket_data(upload_batch_id) para consulta paginada dos lotes"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_data_upload_batch ON ticket_data(upload_batch_id, id)")
+            logger.info("✅ Índice idx_ticket_data_upload_batch criado")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 009: {e}")
+            return False
+    
+    def migration_010_add_period_client_index(self):
+        """Migração 010: Índice (ano, mês, cliente) em ticket_data para o faturamento em lote"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            # Permite agrupar o período por cliente percorrendo o índice, sem ordenação temporária
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_data_period_client
+                ON ticket_data(processing_year, processing_month, client_name)
+            """)
+            logger.info("✅ Índice idx_ticket_data_period_client criado")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 010: {e}")
+            return False
+    
+    def migration_011_create_period_versions_table(self):
+        """Migração 011: Tabela period_versions para invalidar o cache de faturamento"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            # Uma linha por período; (0, 0) é a versão global (cadastro de clientes)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS period_versions (
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    updated_at DATETIME,
+                    PRIMARY KEY (year, month)
+                )
+            """)
+            logger.info("✅ Tabela period_versions criada")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 011: {e}")
+            return False
+    
+    def migration_012_create_period_rollups(self):
+        """Migração 012: Tabelas de resumo por (ano, mês, cliente) e (ano, mês, técnico)"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS period_client_rollups (
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    client_name VARCHAR(255) NOT NULL,
+                    total_hours FLOAT NOT NULL DEFAULT 0,
+                    ticket_count INTEGER NOT NULL DEFAULT 0,
+                    external_services INTEGER NOT NULL DEFAULT 0,
+                    primary_categories TEXT,
+                    secondary_categories TEXT,
+                    updated_at DATETIME,
+                    PRIMARY KEY (year, month, client_name)
+                )
+            """)
+            logger.info("✅ Tabela period_client_rollups criada")
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS period_technician_rollups (
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    technician VARCHAR(255) NOT NULL,
+                    total_hours FLOAT NOT NULL DEFAULT 0,
+                    ticket_count INTEGER NOT NULL DEFAULT 0,
+                    external_services INTEGER NOT NULL DEFAULT 0,
+                    unique_clients INTEGER NOT NULL DEFAULT 0,
+                    primary_categories TEXT,
+                    secondary_categories TEXT,
+                    updated_at DATETIME,
+                    PRIMARY KEY (year, month, technician)
+                )
+            """)
+            logger.info("✅ Tabela period_technician_rollups criada")
+            
+            # Recalcular o resumo de um período por técnico percorre o índice, sem ordenação temporária
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_data_period_technician
+                ON ticket_data(processing_year, processing_month, technician)
+            """)
+            logger.info("✅ Índice idx_ticket_data_period_technician criado")
+            
+            # Os resumos em si são calculados na inicialização (RollupService.ensure_built)
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 012: {e}")
+            return False
+    
+    def migration_013_create_invoice_snapshots(self):
+        """Migração 013: Tabelas de períodos fechados e faturas congeladas"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS closed_periods (
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    clients_count INTEGER NOT NULL DEFAULT 0,
+                    total_value FLOAT NOT NULL DEFAULT 0,
+                    notes TEXT,
+                    closed_at DATETIME,
+                    PRIMARY KEY (year, month)
+                )
+            """)
+            logger.info("✅ Tabela closed_periods criada")
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS invoice_snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    client_id INTEGER,
+                    client_name VARCHAR(255) NOT NULL,
+                    total_hours FLOAT NOT NULL DEFAULT 0,
+                    contract_hours FLOAT,
+                    used_contract_hours FLOAT NOT NULL DEFAULT 0,
+                    overtime_hours FLOAT NOT NULL DEFAULT 0,
+                    external_services INTEGER NOT NULL DEFAULT 0,
+                    contract_value FLOAT NOT NULL DEFAULT 0,
+                    overtime_value FLOAT NOT NULL DEFAULT 0,
+                    external_services_value FLOAT NOT NULL DEFAULT 0,
+                    total_value FLOAT NOT NULL DEFAULT 0,
+                    hourly_rate FLOAT,
+                    overtime_rate FLOAT,
+                    external_service_rate FLOAT,
+                    tickets_count INTEGER NOT NULL DEFAULT 0,
+                    tickets TEXT,
+                    closed_at DATETIME,
+                    CONSTRAINT uq_invoice_snapshots_period_client UNIQUE (year, month, client_name)
+                )
+            """)
+            logger.info("✅ Tabela invoice_snapshots criada")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 013: {e}")
+            return False
+    
+    def migration_014_add_ticket_foreign_keys(self):
+        """Migração 014: client_id e technician_id em ticket_data e nos resumos, preenchidos pelos nomes"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            # (tabela, coluna com o nome, coluna de id, tabela de cadastro)
+            links = [
+                ('ticket_data', 'client_name', 'client_id', 'clients'),
+                ('ticket_data', 'technician', 'technician_id', 'technicians'),
+                ('period_client_rollups', 'client_name', 'client_id', 'clients'),
+                ('period_technician_rollups', 'technician', 'technician_id', 'technicians')
+            ]
+            
+            for table, name_column, id_column, registry in links:
+                if id_column not in self.get_table_columns(table):
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {id_column} INTEGER REFERENCES {registry}(id)")
+                    logger.info(f"✅ Coluna {id_column} adicionada à tabela {table}")
+                
+                # Preencher os ids a partir dos nomes já gravados (o índice único de name resolve cada busca)
+                cursor.execute(f"""
+                    UPDATE {table}
+                    SET {id_column} = (SELECT id FROM {registry} WHERE {registry}.name = {table}.{name_column})
+                    WHERE {id_column} IS NULL
+                """)
+                logger.info(f"✅ {cursor.rowcount} linhas de {table} com {id_column} preenchido")
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_data_client_period
+                ON ticket_data(client_id, processing_year, processing_month)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_data_technician_period
+                ON ticket_data(technician_id, processing_year, processing_month)
+            """)
+            logger.info("✅ Índices por client_id e technician_id criados")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 014: {e}")
+            return False
+    
+    def migration_015_add_normalized_client_names(self):
+        """Migração 015: Nomes de cliente normalizados (sem acentos/caixa/espaços) em clients e ticket_data"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            # A mesma normalização usada pela aplicação, disponível no SQL do preenchimento
+            conn.create_function('normalize_name', 1, normalize_name, deterministic=True)
+            cursor = conn.cursor()
+            
+            if 'normalized_name' not in self.get_table_columns('clients'):
+                cursor.execute("ALTER TABLE clients ADD COLUMN normalized_name VARCHAR(255)")
+                logger.info("✅ Coluna normalized_name adicionada à tabela clients")
+            
+            if 'client_name_normalized' not in self.get_table_columns('ticket_data'):
+                cursor.execute("ALTER TABLE ticket_data ADD COLUMN client_name_normalized VARCHAR(255)")
+                logger.info("✅ Coluna client_name_normalized adicionada à tabela ticket_data")
+            
+            cursor.execute("UPDATE clients SET normalized_name = normalize_name(name)")
+            cursor.execute("""
+                UPDATE ticket_data SET client_name_normalized = normalize_name(client_name)
+                WHERE client_name_normalized IS NULL
+            """)
+            logger.info(f"✅ {cursor.rowcount} linhas de ticket_data com client_name_normalized preenchido")
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_clients_normalized_name ON clients(normalized_name)")
+            # Com client_name junto, listar os clientes distintos dos tickets lê apenas o índice
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ticket_data_client_name_normalized
+                ON ticket_data(client_name_normalized, client_name)
+            """)
+            logger.info("✅ Índices de nomes normalizados criados")
+            
+            # A migração 014 só ligou nomes exatos: religar as variações de acento/caixa/espaços
+            # como RollupService.link_clients (nome exato, senão o menor id com o mesmo nome normalizado)
+            cursor.execute("""
+                UPDATE ticket_data
+                SET client_id = COALESCE(
+                    (SELECT id FROM clients WHERE clients.name = ticket_data.client_name),
+                    (SELECT MIN(id) FROM clients WHERE clients.normalized_name = ticket_data.client_name_normalized)
+                )
+                WHERE client_id IS NULL AND client_name_normalized IS NOT NULL
+            """)
+            logger.info(f"✅ {cursor.rowcount} linhas de ticket_data ligadas a clientes pelo nome normalizado")
+            cursor.execute("""
+                UPDATE period_client_rollups
+                SET client_id = (
+                    SELECT MAX(td.client_id) FROM ticket_data td
+                    WHERE td.processing_year = period_client_rollups.year
+                    AND td.processing_month = period_client_rollups.month
+                    AND td.client_name = period_client_rollups.client_name
+                )
+                WHERE client_id IS NULL
+            """)
+            logger.info(f"✅ {cursor.rowcount} linhas de period_client_rollups religadas")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 015: {e}")
+            return False
+    
+    def migration_016_create_hourly_rollups(self):
+        """Migração 016: Tabela de resumo por (data, hora) de atendimento"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS period_hourly_rollups (
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    date DATE NOT NULL,
+                    hour INTEGER NOT NULL,
+                    ticket_count INTEGER NOT NULL DEFAULT 0,
+                    total_hours FLOAT NOT NULL DEFAULT 0,
+                    updated_at DATETIME,
+                    PRIMARY KEY (year, month, date, hour)
+                )
+            """)
+            logger.info("✅ Tabela period_hourly_rollups criada")
+            
+            # Os heatmaps anuais filtram pela data, não pelo período de processamento
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_period_hourly_rollups_date ON period_hourly_rollups(date)")
+            
+            # O resumo em si é calculado na inicialização (RollupService.ensure_built)
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 016: {e}")
+            return False
+    
+    def migration_017_add_arrival_date_index(self):
+        """Migração 017: Índice por arrival_date em ticket_data (ordenação de /tickets/query)"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_data_arrival_date ON ticket_data(arrival_date)")
+            logger.info("✅ Índice idx_ticket_data_arrival_date criado")
+            
+            conn.commit()
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 017: {e}")
+            return False
+    
+    def migration_018_add_upload_job_owner(self):
+        """Migração 018: Adicionar owner (processo dono) e updated_at (heartbeat) em upload_jobs"""
+        try:
+            db_path = self.get_db_path()
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            
+            columns = self.get_table_columns('upload_jobs')
+            if 'owner' not in columns:
+                cursor.execute("ALTER TABLE upload_jobs ADD COLUMN owner VARCHAR(255)")
+                logger.info("✅ Coluna owner adicionada à tabela upload_jobs")
+            if 'updated_at' not in columns:
+                cursor.execute("ALTER TABLE upload_jobs ADD COLUMN updated_at DATETIME")
+                logger.info("✅ Coluna updated_at adicionada à tabela upload_jobs")
+            
+            conn.commit()
+            conn.close()
+            return True
+        
+        except Exception as e:
+            logger.error(f"❌ Erro na migração 018: {e}")
+            return False
+    
     def update_version(self, new_version):
         """Atualiza a versão do banco de dados"""
         try:
@@ -267,7 +715,20 @@ class DatabaseMigrator:
             (2, self.migration_002_add_indexes, "Adicionar índices para melhorar performance das consultas"),
             (3, self.migration_003_create_technicians_table, "Criar tabela de técnicos"),
             (4, self.migration_004_add_upload_batch_id, "Adicionar upload_batch_id na tabela ticket_data"),
-            (5, self.migration_005_add_whatsapp_contact, "Adicionar whatsapp_contact na tabela clients")
+            (5, self.migration_005_add_whatsapp_contact, "Adicionar whatsapp_contact na tabela clients"),
+            (6, self.migration_006_create_upload_jobs_table, "Criar tabela upload_jobs para uploads assíncronos"),
+            (7, self.migration_007_add_incremental_ingestion, "Adicionar row_hash em ticket_data e incremental em upload_jobs"),
+            (8, self.migration_008_add_upload_content_hash, "Adicionar content_hash em upload_jobs para deduplicação de uploads"),
+            (9, self.migration_009_add_upload_batch_index, "Adicionar índice por upload_batch_id em ticket_data"),
+            (10, self.migration_010_add_period_client_index, "Adicionar índice (ano, mês, cliente) em ticket_data"),
+            (11, self.migration_011_create_period_versions_table, "Criar tabela period_versions para o cache de faturamento"),
+            (12, self.migration_012_create_period_rollups, "Criar tabelas de resumo por período (clientes e técnicos)"),
+            (13, self.migration_013_create_invoice_snapshots, "Criar tabelas de períodos fechados e faturas congeladas"),
+            (14, self.migration_014_add_ticket_foreign_keys, "Adicionar client_id e technician_id em ticket_data e nos resumos"),
+            (15, self.migration_015_add_normalized_client_names, "Adicionar nomes de cliente normalizados em clients e ticket_data"),
+            (16, self.migration_016_create_hourly_rollups, "Criar tabela de resumo por data e hora de atendimento"),
+            (17, self.migration_017_add_arrival_date_index, "Adicionar índice por arrival_date em ticket_data"),
+            (18, self.migration_018_add_upload_job_owner, "Adicionar processo dono e heartbeat em upload_jobs")
         ]
         
         for version, migration_func, description in migrations:
@@ -310,7 +771,7 @@ def migrate_database(app):
     
     # Verificar se há migrações pendentes
     current_version = migrator.check_database_version()
-    if current_version < 5:  # Temos migrações até versão 5
+    if current_version < 18:  # Temos migrações até versão 18
         # Só fazer backup se há migrações pendentes
         migrator.backup_database()
         # Executar migrações
@@ -1,11 +1,25 @@
+import unicodedata
 from datetime import datetime
+from sqlalchemy import event
 from src.database import db
 
+def normalize_name(name):
+    """
+    Forma de comparação de nomes de cliente: sem acentos, sem espaços nas pontas
+    e em casefold ("  Padaria São José " -> "padaria sao jose"). Nomes vazios viram None.
+    """
+    if name is None:
+        return None
+    decomposed = unicodedata.normalize('NFKD', str(name))
+    folded = ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+    return folded or None
+
 class Client(db.Model):
     __tablename__ = 'clients'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False, unique=True)
+    normalized_name = db.Column(db.String(255), index=True)  # normalize_name(name), mantido nas escritas
     contact = db.Column(db.String(255))
     sector = db.Column(db.String(100))
     
@@ -59,6 +73,7 @@ class TicketData(db.Model):
     # Por exemplo, se houvesse outras colunas Integer que não fossem chaves primárias e pudessem receber NaN
     ticket_id = db.Column(db.String(50), nullable=False)
     client_name = db.Column(db.String(255), nullable=False)
+    client_name_normalized = db.Column(db.String(255), nullable=True)  # normalize_name(client_name)
     subject = db.Column(db.Text, nullable=True)
     technician = db.Column(db.String(255), nullable=True)
     primary_category = db.Column(db.String(255), nullable=True)
@@ -88,6 +103,13 @@ class TicketData(db.Model):
     
     # ID do lote de upload para permitir deletar uploads específicos
     upload_batch_id = db.Column(db.String(50), nullable=True)
+    
+    # Hash do conteúdo da linha, comparado na ingestão incremental
+    row_hash = db.Column(db.String(16), nullable=True)
+    
+    # Cliente e técnico cadastrados correspondentes a client_name/technician (resolvidos na ingestão)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=True)
+    technician_id = db.Column(db.Integer, db.ForeignKey('technicians.id'), nullable=True)
 
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)
@@ -124,5 +146,17 @@ class TicketData(db.Model):
             'processing_month': self.processing_month,
             'processing_year': self.processing_year,
             'upload_batch_id': self.upload_batch_id,
+            'client_id': self.client_id,
+            'technician_id': self.technician_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+@event.listens_for(Client, 'before_insert')
+@event.listens_for(Client, 'before_update')
+def _normalize_client_name(mapper, connection, target):
+    target.normalized_name = normalize_name(target.name)
+
+@event.listens_for(TicketData, 'before_insert')
+@event.listens_for(TicketData, 'before_update')
+def _normalize_ticket_client_name(mapper, connection, target):
+    target.client_name_normalized = normalize_name(target.client_name)
@@ -0,0 +1,107 @@
+import json
+from datetime import datetime
+from src.database import db
+
+class ClosedPeriod(db.Model):
+    __tablename__ = 'closed_periods'
+    
+    # Período fechado: o faturamento passa a ser servido de invoice_snapshots
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    clients_count = db.Column(db.Integer, nullable=False, default=0)
+    total_value = db.Column(db.Float, nullable=False, default=0.0)
+    notes = db.Column(db.Text)
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ClosedPeriod {self.month:02d}/{self.year}>'
+    
+    @classmethod
+    def is_closed(cls, month, year):
+        return db.session.query(cls.year).filter_by(year=year, month=month).first() is not None
+    
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'clients_count': self.clients_count,
+            'total_value': self.total_value,
+            'notes': self.notes,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None
+        }
+
+class InvoiceSnapshot(db.Model):
+    __tablename__ = 'invoice_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', 'client_name', name='uq_invoice_snapshots_period_client'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    client_id = db.Column(db.Integer)
+    client_name = db.Column(db.String(255), nullable=False)
+    
+    # Totais do fechamento
+    total_hours = db.Column(db.Float, nullable=False, default=0.0)
+    contract_hours = db.Column(db.Float)
+    used_contract_hours = db.Column(db.Float, nullable=False, default=0.0)
+    overtime_hours = db.Column(db.Float, nullable=False, default=0.0)
+    external_services = db.Column(db.Integer, nullable=False, default=0)
+    contract_value = db.Column(db.Float, nullable=False, default=0.0)
+    overtime_value = db.Column(db.Float, nullable=False, default=0.0)
+    external_services_value = db.Column(db.Float, nullable=False, default=0.0)
+    total_value = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Regras de cobrança vigentes no fechamento
+    hourly_rate = db.Column(db.Float)
+    overtime_rate = db.Column(db.Float)
+    external_service_rate = db.Column(db.Float)
+    
+    tickets_count = db.Column(db.Integer, nullable=False, default=0)
+    tickets = db.Column(db.Text)  # JSON com os tickets faturados (SNAPSHOT_TICKET_FIELDS de cada um)
+    
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Campos de cada ticket guardados no fechamento (os usados na fatura em PDF)
+    SNAPSHOT_TICKET_FIELDS = (
+        'id', 'ticket_id', 'subject', 'technician', 'completion_date', 'total_service_time', 'external_service'
+    )
+    
+    def __repr__(self):
+        return f'<InvoiceSnapshot {self.month:02d}/{self.year} {self.client_name}>'
+    
+    def get_tickets(self):
+        return json.loads(self.tickets) if self.tickets else []
+    
+    def set_tickets(self, tickets):
+        self.tickets = json.dumps(tickets, default=str)
+    
+    def to_billing_dict(self, include_tickets=True):
+        """Mesmo formato de BillingCalculator.calculate_client_billing"""
+        billing = {
+            'client_name': self.client_name,
+            'client_id': self.client_id,
+            'total_hours': self.total_hours,
+            'contract_hours': self.contract_hours,
+            'used_contract_hours': self.used_contract_hours,
+            'overtime_hours': self.overtime_hours,
+            'external_services': self.external_services,
+            'contract_value': self.contract_value,
+            'overtime_value': self.overtime_value,
+            'external_services_value': self.external_services_value,
+            'total_value': self.total_value,
+            'rates': {
+                'hourly_rate': self.hourly_rate,
+                'overtime_rate': self.overtime_rate,
+                'external_service_rate': self.external_service_rate
+            },
+            'tickets_count': self.tickets_count,
+            'snapshot': {
+                'id': self.id,
+                'closed_at': self.closed_at.isoformat() if self.closed_at else None
+            }
+        }
+        if include_tickets:
+            billing['tickets'] = self.get_tickets()
+        return billing
@@ -0,0 +1,22 @@
+from datetime import datetime
+from src.database import db
+
+class PeriodVersion(db.Model):
+    __tablename__ = 'period_versions'
+    
+    # Período (ano, mês); a linha (0, 0) guarda a versão global, que muda com o cadastro de clientes
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PeriodVersion {self.month:02d}/{self.year} v{self.version}>'
+    
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
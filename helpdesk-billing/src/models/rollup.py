@@ -0,0 +1,114 @@
+import json
+from datetime import datetime
+from src.database import db
+
+class PeriodClientRollup(db.Model):
+    __tablename__ = 'period_client_rollups'
+    
+    # Totais de ticket_data por (ano, mês, cliente), mantidos pela ingestão e pelas exclusões
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    client_name = db.Column(db.String(255), primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
+    
+    total_hours = db.Column(db.Float, nullable=False, default=0.0)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    external_services = db.Column(db.Integer, nullable=False, default=0)
+    primary_categories = db.Column(db.Text)    # JSON {categoria: quantidade de tickets}
+    secondary_categories = db.Column(db.Text)  # JSON {categoria: quantidade de tickets}
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PeriodClientRollup {self.month:02d}/{self.year} {self.client_name}>'
+    
+    def get_primary_categories(self):
+        return json.loads(self.primary_categories) if self.primary_categories else {}
+    
+    def get_secondary_categories(self):
+        return json.loads(self.secondary_categories) if self.secondary_categories else {}
+    
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'client_name': self.client_name,
+            'client_id': self.client_id,
+            'total_hours': self.total_hours,
+            'ticket_count': self.ticket_count,
+            'external_services': self.external_services,
+            'primary_categories': self.get_primary_categories(),
+            'secondary_categories': self.get_secondary_categories(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class PeriodTechnicianRollup(db.Model):
+    __tablename__ = 'period_technician_rollups'
+    
+    # Totais de ticket_data por (ano, mês, técnico); tickets sem técnico ficam de fora
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    technician = db.Column(db.String(255), primary_key=True)
+    technician_id = db.Column(db.Integer, db.ForeignKey('technicians.id'))
+    
+    total_hours = db.Column(db.Float, nullable=False, default=0.0)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    external_services = db.Column(db.Integer, nullable=False, default=0)
+    unique_clients = db.Column(db.Integer, nullable=False, default=0)
+    primary_categories = db.Column(db.Text)    # JSON {categoria: quantidade de tickets}
+    secondary_categories = db.Column(db.Text)  # JSON {categoria: quantidade de tickets}
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PeriodTechnicianRollup {self.month:02d}/{self.year} {self.technician}>'
+    
+    def get_primary_categories(self):
+        return json.loads(self.primary_categories) if self.primary_categories else {}
+    
+    def get_secondary_categories(self):
+        return json.loads(self.secondary_categories) if self.secondary_categories else {}
+    
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'technician': self.technician,
+            'technician_id': self.technician_id,
+            'total_hours': self.total_hours,
+            'ticket_count': self.ticket_count,
+            'external_services': self.external_services,
+            'unique_clients': self.unique_clients,
+            'primary_categories': self.get_primary_categories(),
+            'secondary_categories': self.get_secondary_categories(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class PeriodHourlyRollup(db.Model):
+    __tablename__ = 'period_hourly_rollups'
+    
+    # Tickets e horas por hora do dia, pela data de referência do ticket
+    # (chegada, senão início, senão criação); year/month são o período de processamento
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, primary_key=True, index=True)
+    hour = db.Column(db.Integer, primary_key=True)
+    
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    total_hours = db.Column(db.Float, nullable=False, default=0.0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PeriodHourlyRollup {self.date} {self.hour:02d}h>'
+    
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'date': self.date.isoformat() if self.date else None,
+            'hour': self.hour,
+            'ticket_count': self.ticket_count,
+            'total_hours': self.total_hours,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
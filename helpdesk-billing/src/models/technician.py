@@ -39,43 +39,75 @@ class Technician(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
-    def get_monthly_stats(self, month, year):
+    def get_monthly_stats(self, month, year, include_tickets=True):
         """Retorna estatísticas do técnico para um mês específico"""
+        return Technician.get_monthly_stats_batch([self], month, year, include_tickets)[self.id]
+    
+    @classmethod
+    def get_monthly_stats_batch(cls, technicians, month, year, include_tickets=False):
+        """
+        Estatísticas do mês para vários técnicos, {technician.id: stats}, com os
+        totais de todos calculados numa única consulta agrupada por technician_id.
+        A lista de tickets de cada técnico só é carregada com include_tickets.
+        """
         from src.models.client import TicketData
         
-        # Buscar tickets do técnico no período
-        tickets = TicketData.query.filter_by(
-            technician=self.name,
-            processing_month=month,
-            processing_year=year
-        ).all()
+        technician_ids = [technician.id for technician in technicians]
+        period_filter = (
+            TicketData.technician_id.in_(technician_ids),
+            TicketData.processing_month == month,
+            TicketData.processing_year == year
+        )
+        
+        rows = db.session.query(
+            TicketData.technician_id,
+            db.func.count(TicketData.id),
+            db.func.sum(db.func.coalesce(TicketData.total_service_time, 0.0)),
+            db.func.sum(db.case((TicketData.external_service == True, 1), else_=0)),
+            db.func.count(db.distinct(db.case((TicketData.client_name != '', TicketData.client_name))))
+        ).filter(*period_filter).group_by(TicketData.technician_id).all() if technician_ids else []
+        totals = {row[0]: row[1:] for row in rows}
         
-        if not tickets:
-            return {
-                'total_tickets': 0,
-                'total_hours': 0.0,
-                'external_services': 0,
-                'clients_served': 0,
-                'efficiency': 0.0,
-                'target_achievement': 0.0
-            }
+        tickets_by_technician = {}
+        if include_tickets and totals:
+            for ticket in TicketData.query.filter(*period_filter).order_by(TicketData.id):
+                tickets_by_technician.setdefault(ticket.technician_id, []).append(ticket.to_dict())
         
-        total_hours = sum(ticket.total_service_time or 0 for ticket in tickets)
-        external_services = sum(1 for ticket in tickets if ticket.external_service)
-        clients_served = len(set(ticket.client_name for ticket in tickets if ticket.client_name))
+        stats = {}
+        for technician in technicians:
+            if technician.id not in totals:
+                stats[technician.id] = {
+                    'total_tickets': 0,
+                    'total_hours': 0.0,
+                    'external_services': 0,
+                    'clients_served': 0,
+                    'efficiency': 0.0,
+                    'target_achievement': 0.0
+                }
+                continue
+            
+            total_tickets, total_hours, external_services, clients_served = totals[technician.id]
+            stats[technician.id] = technician._build_monthly_stats(
+                total_tickets, total_hours or 0.0, int(external_services or 0), clients_served
+            )
+            if include_tickets:
+                stats[technician.id]['tickets'] = tickets_by_technician.get(technician.id, [])
+        return stats
+    
+    def _build_monthly_stats(self, total_tickets, total_hours, external_services, clients_served):
+        target = self.monthly_hours_target or 0
         
         # Calcular eficiência (horas trabalhadas / horas meta * 100)
-        efficiency = (total_hours / self.monthly_hours_target * 100) if self.monthly_hours_target > 0 else 0
+        efficiency = (total_hours / target * 100) if target > 0 else 0
         
         # Alcance da meta
-        target_achievement = min(100, (total_hours / self.monthly_hours_target * 100)) if self.monthly_hours_target > 0 else 0
+        target_achievement = min(100, (total_hours / target * 100)) if target > 0 else 0
         
         return {
-            'total_tickets': len(tickets),
+            'total_tickets': total_tickets,
             'total_hours': round(total_hours, 2),
             'external_services': external_services,
             'clients_served': clients_served,
             'efficiency': round(efficiency, 2),
-            'target_achievement': round(target_achievement, 2),
-            'tickets': [ticket.to_dict() for ticket in tickets]
-        }
\ No newline at end of file
+            'target_achievement': round(target_achievement, 2)
+        }
@@ -0,0 +1,82 @@
+import json
+from datetime import datetime
+from src.database import db
+
+class UploadJob(db.Model):
+    __tablename__ = 'upload_jobs'
+    
+    # Estados possíveis de um job de upload
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    
+    id = db.Column(db.String(36), primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)  # Nome original do arquivo enviado
+    file_path = db.Column(db.String(500), nullable=False) # Arquivo salvo em uploads/ até o fim do processamento
+    content_hash = db.Column(db.String(64), index=True)   # SHA-256 do arquivo, para detectar reenvios idênticos
+    
+    # Parâmetros do processamento
+    month = db.Column(db.Integer)
+    year = db.Column(db.Integer)
+    streaming = db.Column(db.Boolean, default=False)
+    incremental = db.Column(db.Boolean, default=False)   # Grava só as linhas alteradas (row_hash)
+    
+    # Andamento
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+    processed_rows = db.Column(db.Integer, default=0)
+    total_rows = db.Column(db.Integer)
+    
+    # Resultado
+    batch_id = db.Column(db.String(50))
+    result = db.Column(db.Text)                           # JSON retornado por DataProcessor.process_excel_file
+    error = db.Column(db.Text)
+    
+    # Processo que executa o job ('host:pid') e último heartbeat dele
+    owner = db.Column(db.String(255))
+    updated_at = db.Column(db.DateTime)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<UploadJob {self.id} {self.status}>'
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+    
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+    
+    def set_result(self, result):
+        self.result = json.dumps(result, default=str) if result is not None else None
+    
+    def to_dict(self):
+        result = self.get_result() or {}
+        progress = None
+        if self.total_rows:
+            progress = round(min(self.processed_rows or 0, self.total_rows) / self.total_rows * 100, 1)
+        
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'content_hash': self.content_hash,
+            'month': self.month,
+            'year': self.year,
+            'streaming': self.streaming,
+            'incremental': self.incremental,
+            'status': self.status,
+            'processed_rows': self.processed_rows or 0,
+            'total_rows': self.total_rows,
+            'progress': progress,
+            'batch_id': self.batch_id,
+            'statistics': result.get('statistics'),
+            'result': result or None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
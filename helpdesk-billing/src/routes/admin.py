@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from src.models.client import TicketData
+from src.models.rollup import PeriodClientRollup, PeriodTechnicianRollup
 from src.database import db
+from src.services.billing_cache import billing_cache
+from src.services.rollups import rollup_service
 import logging
 from datetime import datetime
 
@@ -68,6 +71,8 @@ def delete_processed_period(month, year):
             processing_year=year
         ).delete()
         
+        rollup_service.refresh_period(month, year)
+        billing_cache.bump_period(month, year)
         db.session.commit()
         
         logger.info(f"Período {month:02d}/{year} deletado - {deleted_count} registros removidos")
@@ -141,9 +146,15 @@ def delete_upload_batch(batch_id):
             db.func.min(TicketData.created_at).label('upload_time')
         ).filter_by(upload_batch_id=batch_id).first()
         
+        periods = db.session.query(
+            TicketData.processing_month, TicketData.processing_year
+        ).filter_by(upload_batch_id=batch_id).distinct().all()
+        
         # Deletar registros
         deleted_count = TicketData.query.filter_by(upload_batch_id=batch_id).delete()
         
+        rollup_service.refresh_periods(periods)
+        billing_cache.bump_periods(periods)
         db.session.commit()
         
         logger.info(f"Lote {batch_id} deletado - {deleted_count} registros removidos")
@@ -168,50 +179,42 @@ def delete_upload_batch(batch_id):
 def get_admin_statistics():
     """Retorna estatísticas gerais do sistema"""
     try:
-        # Estatísticas de registros
-        total_tickets = TicketData.query.count()
+        # Estatísticas de registros (a partir dos resumos por período)
+        total_tickets = db.session.query(
+            db.func.coalesce(db.func.sum(PeriodClientRollup.ticket_count), 0)
+        ).scalar()
         
         # Período mais antigo e mais recente
-        oldest_record = TicketData.query.filter(
-            TicketData.processing_month.isnot(None),
-            TicketData.processing_year.isnot(None)
-        ).order_by(
-            TicketData.processing_year.asc(),
-            TicketData.processing_month.asc()
+        oldest_record = db.session.query(PeriodClientRollup.month, PeriodClientRollup.year).order_by(
+            PeriodClientRollup.year.asc(),
+            PeriodClientRollup.month.asc()
         ).first()
         
-        newest_record = TicketData.query.filter(
-            TicketData.processing_month.isnot(None),
-            TicketData.processing_year.isnot(None)
-        ).order_by(
-            TicketData.processing_year.desc(),
-            TicketData.processing_month.desc()
+        newest_record = db.session.query(PeriodClientRollup.month, PeriodClientRollup.year).order_by(
+            PeriodClientRollup.year.desc(),
+            PeriodClientRollup.month.desc()
         ).first()
         
         # Estatísticas por cliente
         clients_stats = db.session.query(
-            TicketData.client_name,
-            db.func.count(TicketData.id).label('ticket_count'),
-            db.func.sum(TicketData.total_service_time).label('total_hours')
-        ).filter(
-            TicketData.client_name.isnot(None)
+            PeriodClientRollup.client_name,
+            db.func.sum(PeriodClientRollup.ticket_count).label('ticket_count'),
+            db.func.sum(PeriodClientRollup.total_hours).label('total_hours')
         ).group_by(
-            TicketData.client_name
+            PeriodClientRollup.client_name
         ).order_by(
-            db.func.count(TicketData.id).desc()
+            db.func.sum(PeriodClientRollup.ticket_count).desc()
         ).limit(10).all()
         
         # Estatísticas por técnico
         technician_stats = db.session.query(
-            TicketData.technician,
-            db.func.count(TicketData.id).label('ticket_count'),
-            db.func.sum(TicketData.total_service_time).label('total_hours')
-        ).filter(
-            TicketData.technician.isnot(None)
+            PeriodTechnicianRollup.technician,
+            db.func.sum(PeriodTechnicianRollup.ticket_count).label('ticket_count'),
+            db.func.sum(PeriodTechnicianRollup.total_hours).label('total_hours')
         ).group_by(
-            TicketData.technician
+            PeriodTechnicianRollup.technician
         ).order_by(
-            db.func.count(TicketData.id).desc()
+            db.func.sum(PeriodTechnicianRollup.ticket_count).desc()
         ).limit(10).all()
         
         return jsonify({
@@ -219,12 +222,12 @@ def get_admin_statistics():
             'statistics': {
                 'total_tickets': total_tickets,
                 'oldest_period': {
-                    'month': oldest_record.processing_month if oldest_record else None,
-                    'year': oldest_record.processing_year if oldest_record else None
+                    'month': oldest_record.month if oldest_record else None,
+                    'year': oldest_record.year if oldest_record else None
                 },
                 'newest_period': {
-                    'month': newest_record.processing_month if newest_record else None,
-                    'year': newest_record.processing_year if newest_record else None
+                    'month': newest_record.month if newest_record else None,
+                    'year': newest_record.year if newest_record else None
                 },
                 'top_clients': [
                     {
@@ -247,6 +250,52 @@ def get_admin_statistics():
         logger.error(f"Erro ao buscar estatísticas admin: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@admin_bp.route('/admin/rollups/rebuild', methods=['POST'])
+def rebuild_rollups():
+    """Recalcula as tabelas de resumo por período a partir de ticket_data"""
+    try:
+        summary = rollup_service.rebuild_all()
+        billing_cache.bump_all()
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Resumos por período reconstruídos com sucesso',
+            'rebuild': summary
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao reconstruir resumos por período: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@admin_bp.route('/admin/cache', methods=['GET'])
+def get_cache_info():
+    """Estado do cache de faturamento/estatísticas"""
+    try:
+        return jsonify({
+            'success': True,
+            'cache': billing_cache.info()
+        })
+    except Exception as e:
+        logger.error(f"Erro ao consultar cache: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@admin_bp.route('/admin/cache', methods=['DELETE'])
+def clear_cache():
+    """Esvazia o cache de faturamento/estatísticas deste processo"""
+    try:
+        removed = billing_cache.clear()
+        logger.info(f"Cache de faturamento esvaziado - {removed} entradas removidas")
+        return jsonify({
+            'success': True,
+            'message': 'Cache esvaziado com sucesso',
+            'removed_entries': removed
+        })
+    except Exception as e:
+        logger.error(f"Erro ao esvaziar cache: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 @admin_bp.route('/admin/backup-database', methods=['POST'])
 def backup_database():
     """Cria backup do banco de dados"""
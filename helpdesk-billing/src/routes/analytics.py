@@ -1,55 +1,78 @@
 from flask import Blueprint, jsonify, request
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import date, datetime, timedelta
 from src.database import db
 from src.models.client import TicketData
+from src.models.rollup import PeriodHourlyRollup, PeriodTechnicianRollup
+from src.models.technician import Technician
+from src.services.rollups import TICKET_DATE
 
 analytics_bp = Blueprint('analytics', __name__)
 
+TICKET_DAY = db.cast(db.func.strftime('%d', TICKET_DATE), db.Integer)
+
+def _days_in_month(month, year):
+    if month == 12:
+        return (datetime(year + 1, 1, 1) - timedelta(days=1)).day
+    return (datetime(year, month + 1, 1) - timedelta(days=1)).day
+
+def _day_tickets_query(month, year):
+    """Campos dos tickets do período mostrados no detalhamento de um dia do heatmap"""
+    return db.session.query(
+        TicketData.ticket_id,
+        TicketData.client_name,
+        TicketData.technician,
+        TicketData.total_service_time,
+        TICKET_DATE.label('date'),
+        TICKET_DAY.label('day')
+    ).filter(
+        TicketData.processing_month == month,
+        TicketData.processing_year == year
+    )
+
+def _day_ticket(row):
+    return {
+        'ticket_id': row.ticket_id,
+        'client_name': row.client_name,
+        'technician': row.technician,
+        'total_service_time': row.total_service_time,
+        'date': row.date.isoformat() if row.date else None
+    }
+
 @analytics_bp.route('/heatmap-data/<int:month>/<int:year>', methods=['GET'])
 def get_heatmap_data(month, year):
-    """Obter dados de heatmap de atendimentos por dia do mês"""
+    """
+    Obter dados de heatmap de atendimentos por dia do mês.
+    Contagens e horas por dia vêm de um GROUP BY. Os tickets de cada dia vêm
+    em 'tickets' (lidos pelo frontend atual); com include_tickets=false ficam
+    de fora e podem ser buscados, paginados, em /heatmap-data/<month>/<year>/day/<day>.
+    """
     try:
-        # Buscar todos os tickets do período
-        tickets = TicketData.query.filter(
+        include_tickets = request.args.get('include_tickets', 'true').lower() == 'true'
+        
+        # Uma linha por dia (e uma com dia nulo para tickets sem nenhuma data)
+        rows = db.session.query(
+            TICKET_DAY,
+            db.func.count(TicketData.id),
+            db.func.sum(db.func.coalesce(TicketData.total_service_time, 0.0))
+        ).filter(
             TicketData.processing_month == month,
             TicketData.processing_year == year
-        ).all()
+        ).group_by(TICKET_DAY).all()
         
-        if not tickets:
+        if not rows:
             return jsonify({'heatmap_data': [], 'total_tickets': 0})
         
-        # Criar dicionário para contar atendimentos por dia
-        daily_counts = defaultdict(int)
-        daily_hours = defaultdict(float)
-        daily_tickets = defaultdict(list)
+        daily_counts = {day: count for day, count, _ in rows if day is not None}
+        daily_hours = {day: hours or 0.0 for day, _, hours in rows if day is not None}
         
-        # Processar tickets
-        for ticket in tickets:
-            # Usar arrival_date como data principal, fallback para start_date
-            date_field = ticket.arrival_date or ticket.start_date or ticket.created_at
-            
-            if date_field:
-                day = date_field.day
-                daily_counts[day] += 1
-                
-                # Adicionar horas trabalhadas
-                if ticket.total_service_time:
-                    daily_hours[day] += ticket.total_service_time
-                
-                # Guardar informações do ticket para detalhamento
-                daily_tickets[day].append({
-                    'ticket_id': ticket.ticket_id,
-                    'client_name': ticket.client_name,
-                    'technician': ticket.technician,
-                    'total_service_time': ticket.total_service_time,
-                    'date': date_field.isoformat() if date_field else None
-                })
+        daily_tickets = {}
+        if include_tickets:
+            for row in _day_tickets_query(month, year).order_by(TicketData.id):
+                if row.day is not None:
+                    daily_tickets.setdefault(row.day, []).append(_day_ticket(row))
         
         # Criar lista de dados para todos os dias do mês
-        days_in_month = (datetime(year, month + 1, 1) - timedelta(days=1)).day if month < 12 else 31
-        if month == 12:
-            days_in_month = (datetime(year + 1, 1, 1) - timedelta(days=1)).day
+        days_in_month = _days_in_month(month, year)
         
         heatmap_data = []
         for day in range(1, days_in_month + 1):
@@ -57,7 +80,7 @@ def get_heatmap_data(month, year):
             date_obj = datetime(year, month, day)
             is_weekday = date_obj.weekday() < 5  # 0-4 são seg-sex
             
-            heatmap_data.append({
+            day_data = {
                 'day': day,
                 'date': date_obj.isoformat(),
                 'weekday': date_obj.strftime('%A'),
@@ -65,9 +88,11 @@ def get_heatmap_data(month, year):
                 'is_weekday': is_weekday,
                 'ticket_count': daily_counts.get(day, 0),
                 'total_hours': round(daily_hours.get(day, 0), 2),
-                'tickets': daily_tickets.get(day, []),
                 'intensity': min(daily_counts.get(day, 0), 10)  # Escala de 0-10 para cores
-            })
+            }
+            if include_tickets:
+                day_data['tickets'] = daily_tickets.get(day, [])
+            heatmap_data.append(day_data)
         
         # Calcular estatísticas
         total_tickets = sum(daily_counts.values())
@@ -90,23 +115,148 @@ def get_heatmap_data(month, year):
     except Exception as e:
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
+@analytics_bp.route('/heatmap-data/<int:month>/<int:year>/day/<int:day>', methods=['GET'])
+def get_heatmap_day_tickets(month, year, day):
+    """Tickets de um dia do heatmap, paginados (?page=&per_page=)"""
+    try:
+        if not 1 <= month <= 12 or not 1 <= day <= _days_in_month(month, year):
+            return jsonify({'error': 'Dia inválido para o período'}), 400
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 100, type=int), 1), 1000)
+        
+        query = _day_tickets_query(month, year).filter(TICKET_DAY == day)
+        total = query.count()
+        rows = query.order_by(TICKET_DATE, TicketData.id).offset((page - 1) * per_page).limit(per_page).all()
+        
+        return jsonify({
+            'period': f"{month:02d}/{year}",
+            'day': day,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
+            'tickets': [_day_ticket(row) for row in rows]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@analytics_bp.route('/heatmap-data/year/<int:year>', methods=['GET'])
+def get_year_heatmap(year):
+    """Heatmap de calendário do ano: tickets e horas por dia, a partir do resumo por hora"""
+    try:
+        rows = db.session.query(
+            PeriodHourlyRollup.date,
+            db.func.sum(PeriodHourlyRollup.ticket_count),
+            db.func.sum(PeriodHourlyRollup.total_hours)
+        ).filter(
+            PeriodHourlyRollup.date.between(date(year, 1, 1), date(year, 12, 31))
+        ).group_by(PeriodHourlyRollup.date).all()
+        
+        daily = {day: (count, hours or 0.0) for day, count, hours in rows}
+        
+        heatmap_data = []
+        day = date(year, 1, 1)
+        while day.year == year:
+            count, hours = daily.get(day, (0, 0.0))
+            heatmap_data.append({
+                'date': day.isoformat(),
+                'month': day.month,
+                'day': day.day,
+                'weekday': day.strftime('%A'),
+                'weekday_short': day.strftime('%a'),
+                'is_weekday': day.weekday() < 5,
+                'ticket_count': count,
+                'total_hours': round(hours, 2),
+                'intensity': min(count, 10)  # Mesma escala de 0-10 do heatmap mensal
+            })
+            day += timedelta(days=1)
+        
+        counts = [count for count, _ in daily.values()]
+        return jsonify({
+            'year': year,
+            'heatmap_data': heatmap_data,
+            'statistics': {
+                'total_tickets': sum(counts),
+                'total_hours': round(sum(hours for _, hours in daily.values()), 2),
+                'max_tickets_per_day': max(counts) if counts else 0,
+                'active_days': len(counts)
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
+@analytics_bp.route('/heatmap-data/weekday-hour/<int:year>', methods=['GET'])
+def get_weekday_hour_heatmap(year):
+    """
+    Matriz de carga dia da semana x hora (7x24) do ano, ou de um mês com ?month=,
+    a partir do resumo por hora. Segunda-feira é o dia 0, como em datetime.weekday().
+    """
+    try:
+        month = request.args.get('month', type=int)
+        if month is not None and not 1 <= month <= 12:
+            return jsonify({'error': 'Mês inválido'}), 400
+        
+        if month is None:
+            first, last = date(year, 1, 1), date(year, 12, 31)
+        else:
+            first = date(year, month, 1)
+            last = date(year, month, _days_in_month(month, year))
+        
+        # strftime('%w') conta a partir de domingo (0); convertido para segunda = 0
+        weekday = (db.cast(db.func.strftime('%w', PeriodHourlyRollup.date), db.Integer) + 6) % 7
+        rows = db.session.query(
+            weekday,
+            PeriodHourlyRollup.hour,
+            db.func.sum(PeriodHourlyRollup.ticket_count),
+            db.func.sum(PeriodHourlyRollup.total_hours)
+        ).filter(
+            PeriodHourlyRollup.date.between(first, last)
+        ).group_by(weekday, PeriodHourlyRollup.hour).all()
+        
+        cells = {(day, hour): (count, hours or 0.0) for day, hour, count, hours in rows}
+        
+        matrix = []
+        for day in range(7):
+            # 2024-01-01 foi uma segunda-feira
+            reference = date(2024, 1, 1) + timedelta(days=day)
+            hours = []
+            for hour in range(24):
+                count, total_hours = cells.get((day, hour), (0, 0.0))
+                hours.append({'hour': hour, 'ticket_count': count, 'total_hours': round(total_hours, 2)})
+            matrix.append({
+                'weekday': day,
+                'name': reference.strftime('%A'),
+                'short': reference.strftime('%a'),
+                'ticket_count': sum(cell['ticket_count'] for cell in hours),
+                'hours': hours
+            })
+        
+        counts = [count for count, _ in cells.values()]
+        return jsonify({
+            'period': {'year': year, 'month': month},
+            'matrix': matrix,
+            'statistics': {
+                'total_tickets': sum(counts),
+                'total_hours': round(sum(hours for _, hours in cells.values()), 2),
+                'max_tickets_per_cell': max(counts) if counts else 0
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
+
 @analytics_bp.route('/technician-performance/<int:month>/<int:year>', methods=['GET'])
 def get_technician_performance(month, year):
     """Obter dados de performance por técnico"""
     try:
-        # Buscar tickets agrupados por técnico
-        from sqlalchemy import func
-        
-        technician_stats = db.session.query(
-            TicketData.technician,
-            func.count(TicketData.id).label('ticket_count'),
-            func.sum(TicketData.total_service_time).label('total_hours'),
-            func.sum(db.case((TicketData.external_service == True, 1), else_=0)).label('external_services_count')
-        ).filter(
-            TicketData.processing_month == month,
-            TicketData.processing_year == year,
-            TicketData.technician.isnot(None)
-        ).group_by(TicketData.technician).all()
+        # Totais por técnico vêm do resumo do período
+        technician_stats = PeriodTechnicianRollup.query.filter_by(
+            month=month,
+            year=year
+        ).order_by(PeriodTechnicianRollup.technician).all()
         
         performance_data = []
         for stat in technician_stats:
@@ -115,7 +265,7 @@ def get_technician_performance(month, year):
                 'ticket_count': stat.ticket_count,
                 'total_hours': round(stat.total_hours or 0, 2),
                 'avg_hours_per_ticket': round((stat.total_hours or 0) / stat.ticket_count, 2) if stat.ticket_count > 0 else 0,
-                'external_services_count': int(stat.external_services_count or 0)
+                'external_services_count': int(stat.external_services or 0)
             })
         
         # Ordenar por número de tickets (decrescente)
@@ -138,11 +288,14 @@ def get_technician_details(technician_name, month, year):
         # Decodificar o nome do técnico (caso tenha caracteres especiais)
         decoded_technician_name = unquote(technician_name)
         
-        # Buscar tickets específicos do técnico
+        # Buscar tickets específicos do técnico: os ligados ao cadastro e os que só têm o
+        # nome (técnico sem cadastro, ou tickets gravados com o nome anterior a uma renomeação)
+        technician = Technician.query.filter_by(name=decoded_technician_name).first()
+        by_name = db.and_(TicketData.technician_id.is_(None), TicketData.technician == decoded_technician_name)
         tickets = TicketData.query.filter(
             TicketData.processing_month == month,
             TicketData.processing_year == year,
-            TicketData.technician == decoded_technician_name
+            db.or_(TicketData.technician_id == technician.id, by_name) if technician else by_name
         ).order_by(TicketData.created_at.desc()).all()
         
         # Calcular estatísticas resumidas
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from src.models.client import Client
 from src.database import db
+from src.services.billing_cache import billing_cache
+from src.services.rollups import rollup_service
 from sqlalchemy import text
 import logging
 
@@ -8,6 +10,33 @@ logger = logging.getLogger(__name__)
 
 auto_clients_bp = Blueprint('auto_clients', __name__)
 
+# Nomes normalizados distintos de ticket_data, percorrendo o índice
+# idx_ticket_data_client_name_normalized de um nome ao próximo (uma busca por
+# cliente em vez de uma leitura de todos os tickets)
+TICKET_CLIENTS_CTE = """
+    WITH RECURSIVE ticket_clients(normalized_name) AS (
+        SELECT MIN(client_name_normalized) FROM ticket_data
+        UNION ALL
+        SELECT (
+            SELECT MIN(td.client_name_normalized) FROM ticket_data td
+            WHERE td.client_name_normalized > ticket_clients.normalized_name
+        )
+        FROM ticket_clients
+        WHERE ticket_clients.normalized_name IS NOT NULL
+    )
+"""
+
+# Clientes dos tickets sem cadastro equivalente, com um nome original de exemplo
+MISSING_CLIENTS_QUERY = TICKET_CLIENTS_CTE + """
+    SELECT
+        (SELECT MIN(td.client_name) FROM ticket_data td
+         WHERE td.client_name_normalized = tc.normalized_name) AS client_name
+    FROM ticket_clients tc
+    WHERE tc.normalized_name IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM clients c WHERE c.normalized_name = tc.normalized_name)
+    ORDER BY client_name
+"""
+
 @auto_clients_bp.route('/clients/auto-populate', methods=['POST'])
 def auto_populate_clients():
     """
@@ -16,17 +45,8 @@ def auto_populate_clients():
     """
     try:
         # Buscar clientes únicos nos dados de tickets que não estão na tabela clients
-        query = text("""
-            SELECT DISTINCT td.client_name
-            FROM ticket_data td
-            LEFT JOIN clients c ON LOWER(TRIM(td.client_name)) = LOWER(TRIM(c.name))
-            WHERE c.id IS NULL 
-            AND td.client_name IS NOT NULL 
-            AND TRIM(td.client_name) != ''
-            ORDER BY td.client_name
-        """)
-        
-        result = db.session.execute(query)
+        # (comparação por nome normalizado: sem acentos, caixa e espaços nas pontas)
+        result = db.session.execute(text(MISSING_CLIENTS_QUERY))
         new_client_names = [row[0] for row in result.fetchall()]
         
         created_clients = []
@@ -52,6 +72,9 @@ def auto_populate_clients():
             db.session.add(new_client)
             created_clients.append(client_name)
         
+        db.session.flush()
+        rollup_service.link_clients(created_clients)
+        billing_cache.bump_all()
         db.session.commit()
         
         return jsonify({
@@ -74,11 +97,8 @@ def check_sync_status():
     """
     try:
         # Contar total de clientes únicos nos dados
-        total_query = text("""
-            SELECT COUNT(DISTINCT td.client_name)
-            FROM ticket_data td
-            WHERE td.client_name IS NOT NULL 
-            AND TRIM(td.client_name) != ''
+        total_query = text(TICKET_CLIENTS_CTE + """
+            SELECT COUNT(*) FROM ticket_clients WHERE normalized_name IS NOT NULL
         """)
         total_result = db.session.execute(total_query).fetchone()
         total_unique_clients = total_result[0] if total_result else 0
@@ -92,33 +112,10 @@ def check_sync_status():
         registered_clients = registered_result[0] if registered_result else 0
         
         # Buscar clientes únicos nos dados que não estão cadastrados
-        missing_query = text("""
-            SELECT DISTINCT td.client_name
-            FROM ticket_data td
-            LEFT JOIN clients c ON LOWER(TRIM(td.client_name)) = LOWER(TRIM(c.name))
-            WHERE c.id IS NULL 
-            AND td.client_name IS NOT NULL 
-            AND TRIM(td.client_name) != ''
-            ORDER BY td.client_name
-            LIMIT 10
-        """)
-        
-        missing_result = db.session.execute(missing_query)
-        missing_clients = [row[0] for row in missing_result.fetchall()]
-        missing_count = len(missing_clients)
-        
-        # Se não encontrou na amostra, contar todos
-        if missing_count == 0:
-            count_query = text("""
-                SELECT COUNT(DISTINCT td.client_name)
-                FROM ticket_data td
-                LEFT JOIN clients c ON LOWER(TRIM(td.client_name)) = LOWER(TRIM(c.name))
-                WHERE c.id IS NULL 
-                AND td.client_name IS NOT NULL 
-                AND TRIM(td.client_name) != ''
-            """)
-            count_result = db.session.execute(count_query).fetchone()
-            missing_count = count_result[0] if count_result else 0
+        missing_result = db.session.execute(text(MISSING_CLIENTS_QUERY))
+        missing_names = [row[0] for row in missing_result.fetchall()]
+        missing_clients = missing_names[:10]
+        missing_count = len(missing_names)
         
         return jsonify({
             'success': True,
@@ -144,13 +141,13 @@ def get_clients_data_summary():
                 c.id,
                 c.name,
                 c.active,
-                COUNT(DISTINCT td.processing_month || '/' || td.processing_year) as active_months,
-                COUNT(td.ticket_id) as total_tickets,
-                SUM(td.total_hours) as total_hours,
-                MAX(td.processing_year * 12 + td.processing_month) as last_activity_period,
-                MIN(td.processing_year * 12 + td.processing_month) as first_activity_period
+                COUNT(DISTINCT r.month || '/' || r.year) as active_months,
+                SUM(r.ticket_count) as total_tickets,
+                SUM(r.total_hours) as total_hours,
+                MAX(r.year * 12 + r.month) as last_activity_period,
+                MIN(r.year * 12 + r.month) as first_activity_period
             FROM clients c
-            LEFT JOIN ticket_data td ON LOWER(TRIM(c.name)) = LOWER(TRIM(td.client_name))
+            LEFT JOIN period_client_rollups r ON r.client_id = c.id
             GROUP BY c.id, c.name, c.active
             ORDER BY last_activity_period DESC NULLS LAST, c.name
         """)
@@ -1,20 +1,63 @@
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import os
+import hashlib
+from collections import Counter
 from datetime import datetime
-from src.services.data_processor import DataProcessor, BillingCalculator
+from src.services.data_processor import BillingCalculator
+from src.services.upload_jobs import upload_job_manager
+from src.services.billing_cache import billing_cache
+from src.services.rollups import rollup_service
+from src.services.invoice_snapshots import invoice_snapshot_service
+from src.services.ticket_query import ticket_query_service
+from src.services.response_formats import (
+    FormatUnavailableError, entries_to_columns, ndjson_response, negotiate_format, rows_to_columns, table_response
+)
 from src.models.client import Client, TicketData
+from src.models.rollup import PeriodClientRollup, PeriodTechnicianRollup
+from src.models.invoice_snapshot import ClosedPeriod
 from src.database import db
 
 billing_bp = Blueprint('billing', __name__)
 
 # Configurações de upload
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'parquet'}
+# Arquivos .xlsx acima deste tamanho são processados em modo streaming (memória constante)
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+# Maior intervalo aceito por /billing/range
+MAX_RANGE_MONTHS = 120
+# Colunas das respostas de faturamento em formato colunar (rates achatado)
+BILLING_COLUMNS = (
+    'client_name', 'client_id', 'total_hours', 'contract_hours', 'used_contract_hours', 'overtime_hours',
+    'external_services', 'contract_value', 'overtime_value', 'external_services_value', 'total_value',
+    'hourly_rate', 'overtime_rate', 'external_service_rate', 'tickets_count'
+)
+
+def billing_table_response(fmt, entries, names=BILLING_COLUMNS, **metadata):
+    """Entradas de faturamento em formato colunar/arrow, com as tarifas de rates como colunas"""
+    flat = [{**entry, **entry.get('rates', {})} for entry in entries]
+    return table_response(fmt, names, entries_to_columns(flat, names), **metadata)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_upload(file, file_path):
+    """Grava o arquivo enviado em blocos, calculando o SHA-256 no mesmo passo"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'wb') as destination:
+        for chunk in iter(lambda: file.stream.read(1024 * 1024), b''):
+            sha256.update(chunk)
+            destination.write(chunk)
+    return sha256.hexdigest()
+
+def parse_period_arg(value):
+    """Converte 'YYYY-MM' em (mês, ano); ValueError se inválido"""
+    year, month = (int(part) for part in value.split('-'))
+    if not 1 <= month <= 12:
+        raise ValueError(value)
+    return month, year
+
 def ensure_upload_folder():
     """Garante que a pasta de upload existe"""
     upload_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), UPLOAD_FOLDER)
@@ -24,7 +67,15 @@ def ensure_upload_folder():
 
 @billing_bp.route('/upload', methods=['POST'])
 def upload_file():
-    """Endpoint para upload e processamento do arquivo Excel"""
+    """Recebe o arquivo Excel e o processa.
+    
+    Com async=true o processamento roda em segundo plano: retorna
+    imediatamente o job criado, e o andamento e o resultado são consultados
+    em /upload/jobs/<job_id>. Sem ele, responde com o resultado do
+    processamento, como antes dos jobs (formato usado pelo frontend já
+    publicado). Um arquivo idêntico a um já ingerido para o período não é
+    reprocessado, salvo com force=true.
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'Nenhum arquivo foi enviado'}), 400
@@ -34,37 +85,60 @@ def upload_file():
             return jsonify({'error': 'Nenhum arquivo foi selecionado'}), 400
         
         if not allowed_file(file.filename):
-            return jsonify({'error': 'Tipo de arquivo não permitido. Use apenas .xlsx ou .xls'}), 400
+            return jsonify({'error': 'Tipo de arquivo não permitido. Use apenas .xlsx, .xls, .csv ou .parquet'}), 400
         
-        # Salvar arquivo
+        # Salvar arquivo (removido pelo worker ao final do processamento)
+        original_filename = file.filename
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{timestamp}_{filename}"
         
         upload_path = ensure_upload_folder()
         file_path = os.path.join(upload_path, filename)
-        file.save(file_path)
-        
-        # Processar dados
-        processor = DataProcessor()
+        content_hash = save_upload(file, file_path)
         
         # Obter mês e ano dos parâmetros (opcional)
         month = request.form.get('month', type=int)
         year = request.form.get('year', type=int)
         
-        result = processor.process_excel_file(file_path, month, year)
+        # Modo incremental: grava só as linhas que mudaram em relação ao período já carregado
+        incremental = request.form.get('incremental', '').lower() in ('1', 'true', 'yes')
         
-        # Remover arquivo após processamento
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        # Modo streaming (só .xlsx): solicitado explicitamente ou automático para planilhas
+        # grandes; o modo incremental precisa da planilha inteira e tem precedência
+        streaming = not incremental and filename.lower().endswith('.xlsx') and (
+            request.form.get('stream', '').lower() in ('1', 'true', 'yes')
+            or os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES
+        )
         
-        return jsonify(result)
+        force = request.form.get('force', '').lower() in ('1', 'true', 'yes')
+        # Síncrono por padrão só enquanto o bundle em src/static não for reconstruído
+        # (o frontend novo já envia async=true); depois, o job assíncrono vira o padrão
+        run_async = request.form.get('async', request.args.get('async', '')).lower() in ('1', 'true', 'yes')
+        
+        job = upload_job_manager.create_job(original_filename, file_path, month, year,
+                                            streaming=streaming, incremental=incremental,
+                                            content_hash=content_hash, force=force, run_async=run_async)
+        
+        if not run_async:
+            return jsonify(job.get_result())
+        return jsonify(upload_job_manager.get_job_status(job.id)), 200 if job.is_finished else 202
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Erro interno do servidor: {str(e)}'}), 500
 
+@billing_bp.route('/upload/jobs/<job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    """Status, progresso, estatísticas e erros de um job de upload"""
+    try:
+        job = upload_job_manager.get_job_status(job_id)
+        if not job:
+            return jsonify({'error': 'Job de upload não encontrado'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @billing_bp.route('/billing/clients', methods=['GET'])
 def get_clients():
     """Retorna lista de todos os clientes para faturamento"""
@@ -93,6 +167,7 @@ def update_client(client_id):
 
 
         data = request.get_json()
+        previous_name = client.name
         
         # Atualizar campos permitidos
         allowed_fields = ['name', 'contact', 'sector', 'email', 'phone', 'whatsapp_contact', 
@@ -104,6 +179,10 @@ def update_client(client_id):
                 setattr(client, field, data[field])
         
         client.updated_at = datetime.utcnow()
+        if client.name != previous_name:
+            db.session.flush()
+            rollup_service.link_clients([previous_name, client.name])
+        billing_cache.bump_all()
         db.session.commit()
         
         return jsonify(client.to_dict())
@@ -116,7 +195,11 @@ def get_client_billing(client_name, month, year):
     """Retorna o faturamento de um cliente específico para um período"""
     try:
         calculator = BillingCalculator()
-        billing_data = calculator.calculate_client_billing(client_name, month, year)
+        billing_data = billing_cache.get_or_compute(
+            'client_billing', month, year,
+            lambda: calculator.calculate_client_billing(client_name, month, year),
+            client_name=client_name
+        )
         
         if 'error' in billing_data:
             return jsonify(billing_data), 404
@@ -125,119 +208,355 @@ def get_client_billing(client_name, month, year):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@billing_bp.route('/billing/<int:month>/<int:year>', methods=['GET'])
-def get_all_billing(month, year):
-    """Retorna o faturamento de todos os clientes para um período"""
+@billing_bp.route('/billing/range', methods=['GET'])
+def get_range_billing():
+    """
+    Faturamento mês a mês de todos os clientes num intervalo (?from=YYYY-MM&to=YYYY-MM).
+    
+    Com ?format=columnar ou arrow (ou pelo Accept), as linhas (cliente, mês) vêm
+    em colunas e months, clients e summary vão como metadados.
+    """
     try:
+        try:
+            fmt = negotiate_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except FormatUnavailableError as e:
+            return jsonify({'error': str(e)}), 406
+        
+        try:
+            from_month, from_year = parse_period_arg(request.args.get('from', ''))
+            to_month, to_year = parse_period_arg(request.args.get('to', ''))
+        except ValueError:
+            return jsonify({'error': 'Parâmetros from e to devem estar no formato YYYY-MM'}), 400
+        
+        months = (to_year * 12 + to_month) - (from_year * 12 + from_month) + 1
+        if months < 1:
+            return jsonify({'error': 'O período inicial deve ser anterior ou igual ao final'}), 400
+        if months > MAX_RANGE_MONTHS:
+            return jsonify({'error': f'Intervalo máximo de {MAX_RANGE_MONTHS} meses'}), 400
+        
         calculator = BillingCalculator()
-        billing_data = calculator.calculate_all_clients_billing(month, year)
+        billing_data = calculator.calculate_range_billing(from_month, from_year, to_month, to_year)
+        
+        if fmt != 'json':
+            return billing_table_response(
+                fmt, billing_data['rows'], names=('year', 'month') + BILLING_COLUMNS,
+                **{'from': {'month': from_month, 'year': from_year}, 'to': {'month': to_month, 'year': to_year}},
+                months=billing_data['months'], clients=billing_data['clients'], summary=billing_data['summary']
+            )
         
         return jsonify({
-            'month': month,
-            'year': year,
-            'clients': billing_data,
-            'summary': {
-                'total_clients': len(billing_data),
-                'total_value': sum(client['total_value'] for client in billing_data),
-                'total_hours': sum(client['total_hours'] for client in billing_data),
-                'total_overtime_hours': sum(client['overtime_hours'] for client in billing_data),
-                'total_external_services': sum(client['external_services'] for client in billing_data)
-            }
+            'from': {'month': from_month, 'year': from_year},
+            'to': {'month': to_month, 'year': to_year},
+            **billing_data
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@billing_bp.route('/billing/simulate', methods=['POST'])
+def simulate_billing():
+    """
+    Simula a receita de um intervalo com regras de cobrança alteradas, sem gravar nada.
+    
+    Corpo JSON: {"from": "YYYY-MM", "to": "YYYY-MM",
+                 "multipliers": {"hourly_rate": 1.1, ...},
+                 "overrides": {"<cliente>": {"contract_hours": 20, ...}}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            from_month, from_year = parse_period_arg(str(data.get('from', '')))
+            to_month, to_year = parse_period_arg(str(data.get('to', '')))
+        except ValueError:
+            return jsonify({'error': 'Campos from e to devem estar no formato YYYY-MM'}), 400
+        
+        months = (to_year * 12 + to_month) - (from_year * 12 + from_month) + 1
+        if months < 1:
+            return jsonify({'error': 'O período inicial deve ser anterior ou igual ao final'}), 400
+        if months > MAX_RANGE_MONTHS:
+            return jsonify({'error': f'Intervalo máximo de {MAX_RANGE_MONTHS} meses'}), 400
+        
+        overrides = data.get('overrides') or {}
+        if not isinstance(overrides, dict):
+            return jsonify({'error': 'overrides deve ser um objeto {cliente: {campo: valor}}'}), 400
+        
+        calculator = BillingCalculator()
+        try:
+            simulation = calculator.simulate_billing(
+                from_month, from_year, to_month, to_year,
+                multipliers=data.get('multipliers'),
+                overrides=overrides
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'from': {'month': from_month, 'year': from_year},
+            'to': {'month': to_month, 'year': to_year},
+            **simulation
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@billing_bp.route('/billing/<int:month>/<int:year>', methods=['GET'])
+def get_all_billing(month, year):
+    """Retorna o faturamento de todos os clientes para um período.
+    
+    No formato json a lista de tickets de cada cliente vem por padrão (a tela de
+    faturamento do frontend atual a lê); include_tickets=false a omite.
+    Com ?format=columnar ou arrow (ou pelo Accept), os clientes vêm em colunas,
+    sem tickets, e o resumo vai como metadado.
+    """
+    try:
+        try:
+            fmt = negotiate_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except FormatUnavailableError as e:
+            return jsonify({'error': str(e)}), 406
+        include_tickets = request.args.get('include_tickets', 'true' if fmt == 'json' else 'false').lower() == 'true'
+        if include_tickets and fmt != 'json':
+            return jsonify({'error': 'include_tickets só é suportado no formato json'}), 400
+        
+        def compute():
+            calculator = BillingCalculator()
+            billing_data = calculator.calculate_all_clients_billing(month, year, include_tickets=include_tickets)
+            return {
+                'month': month,
+                'year': year,
+                'clients': billing_data,
+                'summary': {
+                    'total_clients': len(billing_data),
+                    'total_value': sum(client['total_value'] for client in billing_data),
+                    'total_hours': sum(client['total_hours'] for client in billing_data),
+                    'total_overtime_hours': sum(client['overtime_hours'] for client in billing_data),
+                    'total_external_services': sum(client['external_services'] for client in billing_data)
+                }
+            }
+        
+        billing = billing_cache.get_or_compute('billing', month, year, compute, include_tickets=include_tickets)
+        if fmt != 'json':
+            return billing_table_response(fmt, billing['clients'], month=month, year=year, summary=billing['summary'])
+        return jsonify(billing)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @billing_bp.route('/statistics/<int:month>/<int:year>', methods=['GET'])
 def get_statistics(month, year):
     """Retorna estatísticas gerais para um período"""
     try:
-        # Buscar dados do período
-        tickets = db.session.query(TicketData).filter_by(
-            processing_month=month,
-            processing_year=year
-        ).all()
-        
-        if not tickets:
+        stats = billing_cache.get_or_compute('statistics', month, year, lambda: _calculate_period_statistics(month, year))
+        if stats is None:
             return jsonify({'error': 'Nenhum dado encontrado para o período especificado'}), 404
         
-        # Calcular estatísticas
-        stats = {
-            'period': {'month': month, 'year': year},
-            'general': {
-                'total_tickets': len(tickets),
-                'unique_clients': len(set(ticket.client_name for ticket in tickets)),
-                'unique_technicians': len(set(ticket.technician for ticket in tickets if ticket.technician)),
-                'total_hours': sum(ticket.total_service_time for ticket in tickets),
-                'total_external_services': sum(1 for ticket in tickets if ticket.external_service)
-            }
-        }
+        return jsonify(stats)
         
-        # Horas por cliente
-        client_hours = {}
-        for ticket in tickets:
-            if ticket.client_name:
-                client_hours[ticket.client_name] = client_hours.get(ticket.client_name, 0) + ticket.total_service_time
-        stats['hours_by_client'] = client_hours
-        
-        # Horas por técnico
-        technician_hours = {}
-        for ticket in tickets:
-            if ticket.technician:
-                technician_hours[ticket.technician] = technician_hours.get(ticket.technician, 0) + ticket.total_service_time
-        stats['hours_by_technician'] = technician_hours
-        
-        # Atendimentos externos por técnico
-        external_by_tech = {}
-        for ticket in tickets:
-            if ticket.technician and ticket.external_service:
-                external_by_tech[ticket.technician] = external_by_tech.get(ticket.technician, 0) + 1
-        stats['external_services_by_technician'] = external_by_tech
-        
-        # Tickets por técnico
-        tickets_by_tech = {}
-        for ticket in tickets:
-            if ticket.technician:
-                tickets_by_tech[ticket.technician] = tickets_by_tech.get(ticket.technician, 0) + 1
-        stats['tickets_by_technician'] = tickets_by_tech
-        
-        # Clientes únicos por técnico
-        clients_by_tech = {}
-        for ticket in tickets:
-            if ticket.technician:
-                if ticket.technician not in clients_by_tech:
-                    clients_by_tech[ticket.technician] = set()
-                clients_by_tech[ticket.technician].add(ticket.client_name)
-        
-        # Converter sets para contagem
-        unique_clients_by_tech = {tech: len(clients) for tech, clients in clients_by_tech.items()}
-        stats['unique_clients_by_technician'] = unique_clients_by_tech
-        
-        # Categorias mais comuns
-        primary_categories = {}
-        secondary_categories = {}
-        for ticket in tickets:
-            if ticket.primary_category:
-                primary_categories[ticket.primary_category] = primary_categories.get(ticket.primary_category, 0) + 1
-            if ticket.secondary_category:
-                secondary_categories[ticket.secondary_category] = secondary_categories.get(ticket.secondary_category, 0) + 1
-        
-        stats['primary_categories'] = primary_categories
-        stats['secondary_categories'] = secondary_categories
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _calculate_period_statistics(month, year):
+    """Estatísticas gerais do período, ou None se não houver tickets"""
+    if rollup_service.has_period(month, year):
+        return _statistics_from_rollups(month, year)
+    return _statistics_from_tickets(month, year)
+
+def _statistics_from_rollups(month, year):
+    """
+    Estatísticas do período a partir dos resumos por cliente e por técnico.
+    
+    Os resumos por cliente são agrupados por client_name, que nunca é nulo, e
+    não por client_id: todo ticket está em exatamente uma linha, inclusive os
+    de clientes sem cadastro, então contagens de tickets, clientes e
+    atendimentos externos são as mesmas do cálculo ticket a ticket. Já
+    total_hours soma os totais por cliente, e a ordem diferente das somas pode
+    mudar os últimos bits do float.
+    """
+    clients = PeriodClientRollup.query.filter_by(year=year, month=month).order_by(PeriodClientRollup.client_name).all()
+    technicians = [
+        rollup for rollup in
+        PeriodTechnicianRollup.query.filter_by(year=year, month=month).order_by(PeriodTechnicianRollup.technician).all()
+        if rollup.technician
+    ]
+    
+    primary_categories = Counter()
+    secondary_categories = Counter()
+    for rollup in clients:
+        primary_categories.update({name: count for name, count in rollup.get_primary_categories().items() if name})
+        secondary_categories.update({name: count for name, count in rollup.get_secondary_categories().items() if name})
+    
+    return {
+        'period': {'month': month, 'year': year},
+        'general': {
+            'total_tickets': sum(rollup.ticket_count for rollup in clients),
+            'unique_clients': len(clients),
+            'unique_technicians': len(technicians),
+            'total_hours': sum(rollup.total_hours for rollup in clients),
+            'total_external_services': sum(rollup.external_services for rollup in clients)
+        },
+        'hours_by_client': {rollup.client_name: rollup.total_hours for rollup in clients if rollup.client_name},
+        'hours_by_technician': {rollup.technician: rollup.total_hours for rollup in technicians},
+        'external_services_by_technician': {
+            rollup.technician: rollup.external_services for rollup in technicians if rollup.external_services
+        },
+        'tickets_by_technician': {rollup.technician: rollup.ticket_count for rollup in technicians},
+        'unique_clients_by_technician': {rollup.technician: rollup.unique_clients for rollup in technicians},
+        'primary_categories': dict(primary_categories),
+        'secondary_categories': dict(secondary_categories)
+    }
+
+def _statistics_from_tickets(month, year):
+    """
+    Estatísticas do período agregadas em SQL sobre ticket_data (períodos ainda
+    sem resumo), sem carregar os tickets: uma consulta agrupada por dimensão
+    """
+    period_filter = (TicketData.processing_month == month, TicketData.processing_year == year)
+    hours = db.func.coalesce(TicketData.total_service_time, 0.0)
+    is_external = db.case((TicketData.external_service == True, 1), else_=0)
+    has_technician = db.and_(TicketData.technician.isnot(None), TicketData.technician != '')
+    
+    general = db.session.query(
+        db.func.count(TicketData.id),
+        db.func.count(db.distinct(TicketData.client_name)),
+        db.func.count(db.distinct(db.case((has_technician, TicketData.technician)))),
+        db.func.sum(hours),
+        db.func.sum(is_external)
+    ).filter(*period_filter).one()
+    
+    if not general[0]:
+        return None
+    
+    client_hours = db.session.query(TicketData.client_name, db.func.sum(hours)).filter(
+        *period_filter, TicketData.client_name.isnot(None), TicketData.client_name != ''
+    ).group_by(TicketData.client_name).all()
+    
+    technicians = db.session.query(
+        TicketData.technician,
+        db.func.sum(hours),
+        db.func.count(TicketData.id),
+        db.func.sum(is_external),
+        db.func.count(db.distinct(TicketData.client_name))
+    ).filter(*period_filter, has_technician).group_by(TicketData.technician).all()
+    
+    return {
+        'period': {'month': month, 'year': year},
+        'general': {
+            'total_tickets': general[0],
+            'unique_clients': general[1],
+            'unique_technicians': general[2],
+            'total_hours': general[3] or 0.0,
+            'total_external_services': int(general[4] or 0)
+        },
+        'hours_by_client': dict(client_hours),
+        'hours_by_technician': {name: total for name, total, _, _, _ in technicians},
+        'external_services_by_technician': {name: int(external) for name, _, _, external, _ in technicians if external},
+        'tickets_by_technician': {name: count for name, _, count, _, _ in technicians},
+        'unique_clients_by_technician': {name: clients for name, _, _, _, clients in technicians},
+        'primary_categories': _count_period_categories(TicketData.primary_category, period_filter),
+        'secondary_categories': _count_period_categories(TicketData.secondary_category, period_filter)
+    }
+
+def _count_period_categories(category, period_filter):
+    """Quantidade de tickets do período por categoria (categorias vazias ficam de fora)"""
+    rows = db.session.query(category, db.func.count(TicketData.id)).filter(
+        *period_filter, category.isnot(None), category != ''
+    ).group_by(category).all()
+    return dict(rows)
+
+@billing_bp.route('/tickets/query', methods=['GET'])
+def query_tickets():
+    """
+    Tickets filtrados, ordenados e paginados por cursor.
+    
+    Parâmetros: from/to (YYYY-MM), client, client_id, technician, technician_id,
+    category, secondary_category, status, external (true/false),
+    fields (lista separada por vírgulas), sort, order (asc/desc), limit e
+    cursor (next_cursor da página anterior). Com ?format=columnar ou arrow (ou
+    pelo Accept), a página vem em colunas; no arrow o next_cursor também vai no
+    cabeçalho X-Next-Cursor.
+    """
+    try:
+        args = request.args
+        try:
+            fmt = negotiate_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except FormatUnavailableError as e:
+            return jsonify({'error': str(e)}), 406
         
-        return jsonify(stats)
+        try:
+            filters = {
+                'period_from': parse_period_arg(args['from']) if args.get('from') else None,
+                'period_to': parse_period_arg(args['to']) if args.get('to') else None
+            }
+        except ValueError:
+            return jsonify({'error': 'Parâmetros from e to devem estar no formato YYYY-MM'}), 400
         
+        for name in ('client', 'technician', 'category', 'secondary_category', 'status'):
+            filters[name] = args.get(name)
+        try:
+            for name in ('client_id', 'technician_id', 'limit'):
+                filters[name] = int(args[name]) if args.get(name) else None
+        except ValueError:
+            return jsonify({'error': f'Parâmetro {name} deve ser um número inteiro'}), 400
+        
+        external = args.get('external', '').lower()
+        if external not in ('', 'true', 'false'):
+            return jsonify({'error': 'Parâmetro external deve ser true ou false'}), 400
+        filters['external'] = {'true': True, 'false': False}.get(external)
+        
+        options = {
+            'fields': args.get('fields', '').split(','),
+            'sort': args.get('sort', 'id'),
+            'order': args.get('order', 'asc').lower(),
+            'limit': filters.pop('limit'),
+            'cursor': args.get('cursor')
+        }
+        try:
+            if fmt == 'json':
+                return jsonify(ticket_query_service.query(filters, **options))
+            fields, rows, page = ticket_query_service.fetch_page(filters, **options)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # As colunas de cursor (_sort_*) vêm depois dos campos pedidos
+        columns = rows_to_columns([row[:len(fields)] for row in rows], fields)
+        headers = {'X-Next-Cursor': page['next_cursor']} if page['next_cursor'] else None
+        return table_response(fmt, fields, columns, headers=headers, **page)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @billing_bp.route('/tickets/<int:month>/<int:year>', methods=['GET'])
 def get_tickets(month, year):
-    """Retorna todos os tickets de um período"""
+    """
+    Retorna todos os tickets de um período. Também responde em streaming NDJSON
+    (?stream=1 ou ?format=ndjson) e em colunas (?format=columnar ou arrow), ou
+    conforme o cabeçalho Accept.
+    """
     try:
-        tickets = db.session.query(TicketData).filter_by(
+        try:
+            fmt = negotiate_format(('json', 'ndjson', 'columnar', 'arrow'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except FormatUnavailableError as e:
+            return jsonify({'error': str(e)}), 406
+        
+        query = db.session.query(TicketData).filter_by(
             processing_month=month,
             processing_year=year
-        ).all()
-        
+        )
+        if fmt == 'ndjson':
+            return ndjson_response(query.order_by(TicketData.id))
+        if fmt in ('columnar', 'arrow'):
+            # Só as colunas, sem instanciar objetos ORM
+            fields = list(ticket_query_service.fields)
+            rows = db.session.query(*(getattr(TicketData, field) for field in fields)).filter(
+                TicketData.processing_month == month,
+                TicketData.processing_year == year
+            ).order_by(TicketData.id).all()
+            return table_response(fmt, fields, rows_to_columns(rows, fields), month=month, year=year)
+        
+        tickets = query.all()
         return jsonify([ticket.to_dict() for ticket in tickets])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -261,6 +580,8 @@ def delete_period(month, year):
             processing_year=year
         ).delete()
         
+        rollup_service.refresh_period(month, year)
+        billing_cache.bump_period(month, year)
         db.session.commit()
         
         return jsonify({
@@ -316,6 +637,8 @@ def get_periods():
         
         print(f"DEBUG: Períodos encontrados na query: {len(periods_query)}")
         
+        closed_periods = {(period.year, period.month) for period in ClosedPeriod.query.all()}
+        
         periods_data = []
         for period in periods_query:
             print(f"DEBUG: Processando período {period.processing_month}/{period.processing_year} - Tickets: {period.total_tickets}, Clientes: {period.total_clients}")
@@ -325,7 +648,8 @@ def get_periods():
                 'label': f"{period.processing_month:02d}/{period.processing_year}",
                 'total_tickets': int(period.total_tickets) if period.total_tickets else 0,
                 'total_clients': int(period.total_clients) if period.total_clients else 0,
-                'last_update': period.last_update.isoformat() if period.last_update else None
+                'last_update': period.last_update.isoformat() if period.last_update else None,
+                'closed': (period.processing_year, period.processing_month) in closed_periods
             }
             periods_data.append(period_data)
             print(f"DEBUG: Período adicionado: {period_data}")
@@ -339,6 +663,38 @@ def get_periods():
         traceback.print_exc()
         return jsonify({'error': f'Erro ao buscar períodos: {str(e)}'}), 500
 
+@billing_bp.route('/periods/<int:month>/<int:year>/close', methods=['POST'])
+def close_period(month, year):
+    """Fecha o período, congelando a fatura de cada cliente"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            closed = invoice_snapshot_service.close_period(month, year, notes=data.get('notes'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        
+        if closed is None:
+            return jsonify({'error': f'Nenhum faturamento encontrado para {month:02d}/{year}'}), 404
+        
+        return jsonify({
+            'success': True,
+            'message': f'Período {month:02d}/{year} fechado com {closed.clients_count} faturas',
+            'period': closed.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@billing_bp.route('/closed-periods', methods=['GET'])
+def get_closed_periods():
+    """Lista os períodos fechados"""
+    try:
+        periods = ClosedPeriod.query.order_by(ClosedPeriod.year.desc(), ClosedPeriod.month.desc()).all()
+        return jsonify([period.to_dict() for period in periods])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @billing_bp.route('/upload-batches', methods=['GET'])
 def get_upload_batches():
     """Retorna histórico de uploads realizados"""
@@ -375,6 +731,32 @@ def get_upload_batches():
     except Exception as e:
         return jsonify({'error': f'Erro ao buscar histórico de uploads: {str(e)}'}), 500
 
+@billing_bp.route('/upload-batches/<batch_id>/tickets', methods=['GET'])
+def get_upload_batch_tickets(batch_id):
+    """Retorna, paginados, os tickets gravados por um lote de upload"""
+    try:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 100, type=int), 1), 1000)
+        
+        query = TicketData.query.filter_by(upload_batch_id=batch_id)
+        total = query.count()
+        if total == 0:
+            return jsonify({'error': 'Lote de upload não encontrado'}), 404
+        
+        tickets = query.order_by(TicketData.id).offset((page - 1) * per_page).limit(per_page).all()
+        
+        return jsonify({
+            'batch_id': batch_id,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
+            'tickets': [ticket.to_dict() for ticket in tickets]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro ao buscar tickets do lote: {str(e)}'}), 500
+
 @billing_bp.route('/delete-batch/<batch_id>', methods=['DELETE'])
 def delete_batch(batch_id):
     """Deleta um lote específico de upload"""
@@ -385,9 +767,15 @@ def delete_batch(batch_id):
         if record_count == 0:
             return jsonify({'error': 'Lote de upload não encontrado'}), 404
         
+        periods = db.session.query(
+            TicketData.processing_month, TicketData.processing_year
+        ).filter_by(upload_batch_id=batch_id).distinct().all()
+        
         # Deletar registros
         deleted_count = TicketData.query.filter_by(upload_batch_id=batch_id).delete()
         
+        rollup_service.refresh_periods(periods)
+        billing_cache.bump_periods(periods)
         db.session.commit()
         
         return jsonify({
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from src.models.client import Client
 from src.database import db
+from src.services.billing_cache import billing_cache
+from src.services.rollups import rollup_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,6 +67,9 @@ def create_client():
         )
         
         db.session.add(client)
+        db.session.flush()
+        rollup_service.link_clients([client.name])
+        billing_cache.bump_all()
         db.session.commit()
         
         return jsonify({
@@ -97,6 +102,8 @@ def update_client(client_id):
             if existing:
                 return jsonify({'error': 'Cliente com este nome já existe'}), 400
         
+        previous_name = client.name
+        
         # Atualizar campos
         updatable_fields = [
             'name', 'contact', 'sector', 'email', 'phone', 'address', 'notes', 'active'
@@ -115,6 +122,10 @@ def update_client(client_id):
                 except (ValueError, TypeError):
                     return jsonify({'error': f'Valor inválido para {field}'}), 400
         
+        if client.name != previous_name:
+            db.session.flush()
+            rollup_service.link_clients([previous_name, client.name])
+        billing_cache.bump_all()
         db.session.commit()
         
         return jsonify({
@@ -136,6 +147,7 @@ def delete_client(client_id):
         
         # Soft delete - apenas marca como inativo
         client.active = False
+        billing_cache.bump_all()
         db.session.commit()
         
         return jsonify({
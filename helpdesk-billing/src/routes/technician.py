@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from src.models.technician import Technician
 from src.database import db
+from src.services.rollups import rollup_service
 import logging
 from datetime import datetime
 
@@ -62,6 +63,8 @@ def create_technician():
         )
         
         db.session.add(technician)
+        db.session.flush()
+        rollup_service.link_technicians([technician.name])
         db.session.commit()
         
         return jsonify({
@@ -94,6 +97,8 @@ def update_technician(technician_id):
             if existing:
                 return jsonify({'error': 'Técnico com este nome já existe'}), 400
         
+        previous_name = technician.name
+        
         # Atualizar campos
         updatable_fields = ['name', 'email', 'phone', 'department', 'active']
         
@@ -121,6 +126,9 @@ def update_technician(technician_id):
             except ValueError:
                 return jsonify({'error': 'Formato de data inválido'}), 400
         
+        if technician.name != previous_name:
+            db.session.flush()
+            rollup_service.link_technicians([previous_name, technician.name])
         db.session.commit()
         
         return jsonify({
@@ -154,17 +162,23 @@ def get_technician_stats(technician_id, month, year):
 
 @technician_bp.route('/technicians/stats/<int:month>/<int:year>', methods=['GET'])
 def get_all_technicians_stats(month, year):
-    """Retorna estatísticas de todos os técnicos para um período"""
+    """
+    Retorna estatísticas de todos os técnicos para um período. A lista de tickets
+    de cada técnico vem por padrão (lida pelo frontend atual); include_tickets=false
+    a omite e deixa só os totais da consulta agrupada.
+    """
     try:
+        include_tickets = request.args.get('include_tickets', 'true').lower() == 'true'
         technicians = Technician.query.filter_by(active=True).all()
+        stats_by_technician = Technician.get_monthly_stats_batch(technicians, month, year, include_tickets)
         
-        stats_data = []
-        for technician in technicians:
-            stats = technician.get_monthly_stats(month, year)
-            stats_data.append({
+        stats_data = [
+            {
                 'technician': technician.to_dict(),
-                'stats': stats
-            })
+                'stats': stats_by_technician[technician.id]
+            }
+            for technician in technicians
+        ]
         
         return jsonify({
             'success': True,
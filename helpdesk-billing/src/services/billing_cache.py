@@ -0,0 +1,140 @@
+"""
+Cache dos resultados de faturamento e estatísticas por período.
+
+Cada entrada é guardada junto com a versão do período e a versão global no
+momento do cálculo. As versões ficam no banco (tabela period_versions) e são
+incrementadas por quem altera os dados: ingestão, exclusão de período/lote e
+alterações no cadastro de clientes. Uma entrada com versão antiga nunca é
+servida, inclusive entre processos diferentes.
+
+Os valores ficam serializados (pickle) e cada leitura devolve uma cópia nova,
+então quem ajusta o resultado antes do jsonify não altera a entrada em cache.
+"""
+import logging
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.database import db
+from src.models.period_version import PeriodVersion
+
+logger = logging.getLogger(__name__)
+
+class BillingCache:
+    """Cache LRU, limitado em número de entradas, invalidado por versão de período"""
+    
+    # Linha de period_versions que vale para todos os períodos
+    GLOBAL_PERIOD = (0, 0)
+    MAX_ENTRIES = 256
+    
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_compute(self, kind: str, month: int, year: int, compute: Callable[[], Any], **params) -> Any:
+        """
+        Retorna o resultado em cache para (kind, período, params) se ele ainda
+        corresponde às versões atuais; senão calcula, guarda e retorna.
+        Resultados None não são guardados. O objeto retornado é sempre do
+        chamador: pode ser alterado sem afetar o cache.
+        """
+        key = (kind, year, month, tuple(sorted(params.items())))
+        versions = self.get_versions(month, year)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                payload = entry[1]
+            else:
+                payload = None
+                self.misses += 1
+        if payload is not None:
+            return pickle.loads(payload)
+        
+        value = compute()
+        if value is None:
+            return value
+        
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (versions, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+    
+    def get_versions(self, month: int, year: int) -> Tuple[int, int]:
+        """(versão do período, versão global), lidas numa única consulta"""
+        rows = db.session.query(PeriodVersion.year, PeriodVersion.month, PeriodVersion.version).filter(
+            db.or_(
+                db.and_(PeriodVersion.year == year, PeriodVersion.month == month),
+                db.and_(PeriodVersion.year == self.GLOBAL_PERIOD[0], PeriodVersion.month == self.GLOBAL_PERIOD[1])
+            )
+        ).all()
+        versions = {(row.year, row.month): row.version for row in rows}
+        return versions.get((year, month), 0), versions.get(self.GLOBAL_PERIOD, 0)
+    
+    def bump_period(self, month: Optional[int], year: Optional[int]):
+        """Incrementa a versão do período (na transação corrente, sem commit)"""
+        if month is None or year is None:
+            return
+        table = PeriodVersion.__table__
+        now = datetime.utcnow()
+        db.session.execute(
+            sqlite_insert(table)
+            .values(year=year, month=month, version=1, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=['year', 'month'],
+                set_={'version': table.c.version + 1, 'updated_at': now}
+            )
+        )
+    
+    def bump_periods(self, periods: Iterable[Tuple[int, int]]):
+        """Incrementa a versão de vários períodos (month, year)"""
+        for month, year in set(periods):
+            self.bump_period(month, year)
+    
+    def bump_all(self):
+        """Invalida todos os períodos (ex.: tarifas ou cadastro de clientes alterados)"""
+        self.bump_period(self.GLOBAL_PERIOD[1], self.GLOBAL_PERIOD[0])
+    
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+    
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = [
+                {
+                    'kind': kind,
+                    'month': month,
+                    'year': year,
+                    'params': dict(params),
+                    'period_version': versions[0],
+                    'global_version': versions[1],
+                    'size_bytes': len(payload)
+                }
+                for (kind, year, month, params), (versions, payload) in reversed(self._entries.items())
+            ]
+            requests = self.hits + self.misses
+            return {
+                'size': len(entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests * 100, 1) if requests else None,
+                'entries': entries
+            }
+
+billing_cache = BillingCache()
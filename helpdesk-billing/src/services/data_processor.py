@@ -1,17 +1,55 @@
 import pandas as pd
+import numpy as np
+import openpyxl
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Iterator, Callable, Optional
 import re
+import csv
+import time
 import logging
+import importlib.util
 import uuid
 
 logger = logging.getLogger(__name__)
-from src.models.client import Client, TicketData
+from src.models.client import Client, TicketData, normalize_name
+from src.models.technician import Technician
+from src.models.rollup import PeriodClientRollup
+from src.models.invoice_snapshot import ClosedPeriod, InvoiceSnapshot
 from src.database import db
+from src.services.billing_cache import billing_cache
+from src.services.rollups import rollup_service
 
 class DataProcessor:
     """Classe responsável por processar os dados da planilha de helpdesk"""
     
+    # Colunas de TicketData preenchidas a partir da planilha, na ordem de to_dict()
+    TICKET_COLUMNS = [
+        'ticket_id', 'client_name', 'subject', 'technician', 'primary_category',
+        'secondary_category', 'contact', 'arrival_date', 'departure_date', 'completion_date',
+        'workstation', 'pause_reason', 'sector', 'status', 'ticket_type', 'service',
+        'description', 'business_hours', 'external_service', 'start_date', 'end_date',
+        'total_service_time'
+    ]
+    TICKET_DATE_COLUMNS = ['arrival_date', 'departure_date', 'completion_date', 'start_date', 'end_date']
+    TICKET_BOOLEAN_COLUMNS = ['business_hours', 'external_service']
+    
+    # Tempo em texto HH:MM ou HH:MM:SS, convertido com NumPy (demais textos usam _convert_time_to_hours)
+    TIME_TEXT_PATTERN = r'^\s*([0-9]+):([0-9]+)(?::([0-9]+))?\s*$'
+    # Vocabulário de _convert_to_boolean, já em minúsculas e sem espaços nas pontas
+    TRUE_TEXT_VALUES = ('sim', 'yes', 'true', '1', 'verdadeiro', 's', 'y')
+    FALSE_TEXT_VALUES = ('não', 'nao', 'no', 'false', '0', 'falso', 'n')
+    
+    # Quantidade de linhas lidas, limpas e inseridas por vez no modo streaming
+    STREAMING_CHUNK_SIZE = 5000
+    
+    # Máximo de ids por DELETE ... WHERE id IN (...) no modo incremental
+    DELETE_BATCH_SIZE = 500
+    
+    # Registros incluídos em 'preview' na resposta do processamento
+    PREVIEW_SIZE = 20
+    
     def __init__(self):
         self.column_mapping = {
             'Ticket': 'ticket_id',
@@ -37,28 +75,48 @@ class DataProcessor:
             'Data final': 'end_date',
             'Tempo total de atendimento': 'total_service_time'
         }
+        self.reader = SpreadsheetReader()
     
-    def process_excel_file(self, file_path: str, month: int = None, year: int = None) -> Dict[str, Any]:
+    def process_excel_file(self, file_path: str, month: int = None, year: int = None, streaming: bool = False,
+                           progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                           engine: str = None, incremental: bool = False,
+                           include_data: bool = False) -> Dict[str, Any]:
         """
-        Processa o arquivo Excel e retorna estatísticas e dados processados
+        Processa a planilha (Excel, CSV ou Parquet) e retorna estatísticas e dados processados
         
         Args:
-            file_path: Caminho para o arquivo Excel
+            file_path: Caminho para o arquivo
             month: Mês de referência (opcional, será inferido dos dados se não fornecido)
             year: Ano de referência (opcional, será inferido dos dados se não fornecido)
+            streaming: Processa a planilha em blocos de linhas, com uso de memória
+                constante (ver _process_excel_file_streaming)
+            progress_callback: Função opcional chamada com (linhas processadas,
+                total de linhas ou None) à medida que o arquivo é processado
+            engine: Engine de leitura preferida (ver SpreadsheetReader); as
+                demais compatíveis com o formato são usadas como fallback
+            incremental: Em vez de apagar e regravar o período, compara o hash de
+                cada linha com o armazenado e grava só o que mudou (ver
+                _upsert_period_data). Não se aplica ao modo streaming.
+            include_data: Inclui em 'data' todos os registros gravados. Por padrão
+                a resposta traz só 'preview' (PREVIEW_SIZE registros); o lote
+                completo é consultado por /upload-batches/<batch_id>/tickets.
+                Não se aplica ao modo streaming.
         
         Returns:
-            Dict com estatísticas e dados processados
+            Dict com estatísticas, prévia e (opcionalmente) dados processados
         """
+        if streaming:
+            return self._process_excel_file_streaming(file_path, month, year, progress_callback)
+        
         try:
             # Gerar ID único para este lote de upload
             batch_id = str(uuid.uuid4())[:8]  # 8 caracteres únicos
             
-            # Ler o arquivo Excel
-            df = pd.read_excel(file_path)
-            
-            # Limpar e padronizar os dados
+            # Ler a planilha e liberar o DataFrame bruto logo após a limpeza
+            df, reader_info = self.reader.read(file_path, engine)
             df_clean = self._clean_dataframe(df)
+            del df
+            self._report_progress(progress_callback, 0, len(df_clean))
             
             # Inferir mês e ano se não fornecidos
             if not month or not year:
@@ -66,17 +124,22 @@ class DataProcessor:
                 month = month or inferred_month
                 year = year or inferred_year
             
+            # Atualizar/criar clientes e técnicos antes dos tickets, que guardam seus ids
+            self._update_clients(df_clean)
+            self._update_technicians(df_clean)
+            
             # Processar e salvar os dados no banco
-            processed_data = self._process_and_save_data(df_clean, month, year, batch_id)
+            changes = None
+            if incremental:
+                saved_records, changes = self._upsert_period_data(df_clean, month, year, batch_id)
+            else:
+                saved_records = self._process_and_save_data(df_clean, month, year, batch_id)
             
             # Calcular estatísticas
             stats = self._calculate_statistics(df_clean)
+            self._report_progress(progress_callback, len(df_clean), len(df_clean))
             
-            # Atualizar/criar clientes e técnicos
-            self._update_clients(df_clean)
-            self._update_technicians(df_clean)
-            
-            return {
+            result = {
                 'success': True,
                 'message': f'Dados processados com sucesso para {month:02d}/{year} (Lote: {batch_id})',
                 'statistics': stats,
@@ -84,8 +147,14 @@ class DataProcessor:
                 'month': month,
                 'year': year,
                 'batch_id': batch_id,
-                'data': processed_data
+                'reader': reader_info,
+                'preview': [self._serialize_record(record) for record in saved_records[:self.PREVIEW_SIZE]]
             }
+            if changes is not None:
+                result['changes'] = changes
+            if include_data:
+                result['data'] = [self._serialize_record(record) for record in saved_records]
+            return result
             
         except Exception as e:
             logger.exception("Erro ao processar o arquivo Excel")
@@ -96,12 +165,134 @@ class DataProcessor:
                 'processed_records': 0
             }
     
+    def _process_excel_file_streaming(self, file_path: str, month: int = None, year: int = None,
+                                      progress_callback: Optional[Callable[[int, Optional[int]], None]] = None) -> Dict[str, Any]:
+        """
+        Processa planilhas grandes em blocos de STREAMING_CHUNK_SIZE linhas.
+        
+        A planilha é lida com o openpyxl em modo somente leitura; cada bloco é
+        limpo, inserido e somado às estatísticas antes do próximo ser lido, de
+        modo que o pico de memória não depende do tamanho do arquivo. Por isso a
+        resposta nunca inclui a lista completa de registros ('data').
+        """
+        try:
+            batch_id = str(uuid.uuid4())[:8]
+            
+            # Sem período informado, uma primeira leitura apenas das datas o define
+            if not month or not year:
+                inferred_month, inferred_year = self._infer_period_from_file(file_path)
+                month = month or inferred_month
+                year = year or inferred_year
+            
+            self._delete_period_data(month, year)
+            
+            statistics = StatisticsAccumulator()
+            preview = []
+            processed_records = 0
+            total_rows = self._count_excel_rows(file_path) if progress_callback else None
+            self._report_progress(progress_callback, 0, total_rows)
+            
+            for chunk in self._iter_excel_chunks(file_path):
+                chunk_clean = self._clean_dataframe(chunk)
+                self._update_clients(chunk_clean)
+                self._update_technicians(chunk_clean)
+                
+                saved_records = self._process_and_save_data(chunk_clean, month, year, batch_id, replace_period=False)
+                if len(preview) < self.PREVIEW_SIZE:
+                    preview += [self._serialize_record(record) for record in saved_records[:self.PREVIEW_SIZE - len(preview)]]
+                del saved_records
+                statistics.add(chunk_clean)
+                
+                processed_records += len(chunk_clean)
+                logger.info(f"Streaming: {processed_records} registros processados (Lote: {batch_id})")
+                self._report_progress(progress_callback, processed_records, total_rows)
+            
+            self._refresh_period_rollups(month, year)
+            
+            return {
+                'success': True,
+                'message': f'Dados processados com sucesso para {month:02d}/{year} (Lote: {batch_id})',
+                'statistics': statistics.result(),
+                'processed_records': processed_records,
+                'month': month,
+                'year': year,
+                'batch_id': batch_id,
+                'preview': preview
+            }
+            
+        except Exception as e:
+            logger.exception("Erro ao processar o arquivo Excel em modo streaming")
+            db.session.rollback()
+            # Os blocos anteriores à falha já foram gravados; os resumos devem refleti-los
+            self._refresh_period_rollups(month, year)
+            return {
+                'success': False,
+                'message': f'Erro ao processar arquivo: {str(e)}',
+                'statistics': None,
+                'processed_records': 0
+            }
+    
+    def _refresh_period_rollups(self, month: int | None, year: int | None):
+        """Recalcula e grava os resumos do período (usado ao final do modo streaming)"""
+        try:
+            rollup_service.refresh_period(month, year)
+            billing_cache.bump_period(month, year)
+            db.session.commit()
+        except Exception:
+            logger.exception(f"Erro ao recalcular os resumos do período {month}/{year}")
+            db.session.rollback()
+    
+    def _iter_excel_chunks(self, file_path: str, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+        """Lê a primeira aba da planilha em blocos de linhas (openpyxl read-only)"""
+        return self.reader.iter_excel_chunks(file_path, chunk_size or self.STREAMING_CHUNK_SIZE)
+    
+    def _count_excel_rows(self, file_path: str) -> Optional[int]:
+        """Estimativa do número de linhas de dados a partir da dimensão declarada na aba"""
+        try:
+            workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                max_row = workbook.worksheets[0].max_row
+            finally:
+                workbook.close()
+            return max(max_row - 1, 0) if max_row else None
+        except Exception as e:
+            logger.warning(f"Não foi possível obter o total de linhas da planilha: {e}")
+            return None
+    
+    def _report_progress(self, progress_callback, processed: int, total: Optional[int]):
+        """Repassa o progresso ao callback, sem deixar que falhas nele interrompam o processamento"""
+        if progress_callback is None:
+            return
+        try:
+            progress_callback(processed, total)
+        except Exception as e:
+            logger.warning(f"Erro ao reportar progresso: {e}")
+    
+    def _infer_period_from_file(self, file_path: str) -> Tuple[int, int]:
+        """Equivalente a _infer_period_from_data, lendo apenas as colunas de data bloco a bloco"""
+        date_columns = ['completion_date', 'departure_date', 'arrival_date']
+        source_columns = {source: target for source, target in self.column_mapping.items() if target in date_columns}
+        latest = {}
+        
+        for chunk in self._iter_excel_chunks(file_path):
+            chunk = chunk[[col for col in chunk.columns if col in source_columns]].rename(columns=source_columns)
+            for col in chunk.columns:
+                chunk_max = pd.to_datetime(chunk[col], errors='coerce').max()
+                if pd.notna(chunk_max) and (col not in latest or chunk_max > latest[col]):
+                    latest[col] = chunk_max
+        
+        for col in date_columns:
+            if col in latest:
+                return latest[col].month, latest[col].year
+        
+        now = datetime.now()
+        logger.warning("Não foi possível inferir período dos dados, usando mês/ano atual")
+        return now.month, now.year
+    
     def _clean_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Limpa e padroniza os dados do DataFrame"""
-        df_clean = df.copy()
-        
-        # Renomear colunas para o padrão interno
-        df_clean = df_clean.rename(columns=self.column_mapping)
+        # Renomear colunas para o padrão interno (rename já devolve uma cópia)
+        df_clean = df.rename(columns=self.column_mapping)
         
         # Converter colunas de data com melhor tratamento
         date_columns = ['arrival_date', 'departure_date', 'completion_date', 'start_date', 'end_date']
@@ -117,14 +308,14 @@ class DataProcessor:
         
         # Converter tempo total de atendimento para horas
         if 'total_service_time' in df_clean.columns:
-            df_clean['total_service_time'] = df_clean['total_service_time'].apply(self._convert_time_to_hours)
+            df_clean['total_service_time'] = self._convert_time_series_to_hours(df_clean['total_service_time'])
             logger.info(f"Processados {len(df_clean)} registros de tempo de atendimento")
         
         # Converter colunas booleanas
         boolean_columns = ['business_hours', 'external_service']
         for col in boolean_columns:
             if col in df_clean.columns:
-                df_clean[col] = df_clean[col].apply(self._convert_to_boolean)
+                df_clean[col] = self._convert_boolean_series(df_clean[col])
         
         # Limpar strings
         string_columns = ['client_name', 'technician', 'primary_category', 'secondary_category']
@@ -185,10 +376,10 @@ class DataProcessor:
         if isinstance(value, str):
             value_lower = value.lower().strip()
             # Valores considerados True
-            if value_lower in ['sim', 'yes', 'true', '1', 'verdadeiro', 's', 'y']:
+            if value_lower in self.TRUE_TEXT_VALUES:
                 return True
-            # Valores considerados False  
-            if value_lower in ['não', 'nao', 'no', 'false', '0', 'falso', 'n']:
+            # Valores considerados False
+            if value_lower in self.FALSE_TEXT_VALUES:
                 return False
             logger.warning(f"Valor boolean não reconhecido: '{value}' - assumindo None")
             return None
@@ -199,6 +390,95 @@ class DataProcessor:
         logger.warning(f"Tipo não suportado para conversão boolean: {type(value)} - valor: {value}")
         return None
     
+    def _convert_time_series_to_hours(self, series: pd.Series) -> pd.Series:
+        """
+        Versão vetorizada de _convert_time_to_hours para uma coluna inteira.
+        
+        Colunas timedelta, numéricas e booleanas são convertidas com NumPy. Em
+        colunas de texto/mistas, os textos HH:MM[:SS] (quase todos distintos) são
+        separados com str.extract e somados com NumPy, na mesma ordem de operações
+        do conversor escalar; só o restante é fatorado e passa, um valor distinto
+        por vez, por _convert_time_to_hours.
+        """
+        if pd.api.types.is_timedelta64_dtype(series):
+            return (series.dt.total_seconds() / 3600.0).fillna(0.0)
+        
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            return series.astype(float).fillna(0.0)
+        
+        text = self._text_methods(series)
+        if text is None:
+            return self._convert_by_unique_values(series, self._convert_time_to_hours, missing_value=0.0)
+        
+        parts = text.extract(self.TIME_TEXT_PATTERN)
+        matched = parts[0].notna().to_numpy()
+        result = np.empty(len(series), dtype=float)
+        hours = parts[0][matched].astype(float).to_numpy()
+        minutes = parts[1][matched].astype(float).to_numpy()
+        seconds = parts[2][matched].fillna('0').astype(float).to_numpy()
+        result[matched] = hours + (minutes / 60) + (seconds / 3600)
+        if not matched.all():
+            rest = series[~matched]
+            result[~matched] = self._convert_by_unique_values(
+                rest, self._convert_time_to_hours, missing_value=0.0
+            ).to_numpy(dtype=float)
+        return pd.Series(result, index=series.index)
+    
+    def _convert_boolean_series(self, series: pd.Series) -> pd.Series:
+        """
+        Versão vetorizada de _convert_to_boolean para uma coluna inteira.
+        
+        Colunas numéricas são comparadas com zero via NumPy. Textos do vocabulário
+        sim/não são normalizados com os métodos .str e mapeados por dicionário;
+        os demais valores (textos desconhecidos, números em colunas mistas) são
+        fatorados e convertidos uma vez por valor distinto com o conversor escalar.
+        """
+        if pd.api.types.is_bool_dtype(series):
+            return series
+        
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy()
+            missing = pd.isna(values)
+            result = np.full(len(values), None, dtype=object)
+            result[~missing] = (values[~missing] != 0).astype(object)
+            return pd.Series(result, index=series.index).infer_objects()
+        
+        text = self._text_methods(series)
+        if text is None:
+            return self._convert_by_unique_values(series, self._convert_to_boolean, missing_value=None)
+        
+        vocabulary = {**dict.fromkeys(self.TRUE_TEXT_VALUES, True), **dict.fromkeys(self.FALSE_TEXT_VALUES, False)}
+        known = text.lower().str.strip().map(vocabulary)
+        matched = known.notna().to_numpy()
+        result = np.full(len(series), None, dtype=object)
+        result[matched] = known[matched].to_numpy(dtype=object)
+        if not matched.all():
+            result[~matched] = self._convert_by_unique_values(
+                series[~matched], self._convert_to_boolean, missing_value=None
+            ).to_numpy(dtype=object)
+        return pd.Series(result, index=series.index).infer_objects()
+    
+    def _text_methods(self, series: pd.Series):
+        """Métodos .str da coluna, ou None se ela não tem textos (valores não textuais viram NaN)"""
+        try:
+            return series.str
+        except AttributeError:
+            return None
+    
+    def _convert_by_unique_values(self, series: pd.Series, converter, missing_value) -> pd.Series:
+        """
+        Aplica um conversor escalar apenas aos valores distintos da coluna e
+        espalha o resultado com NumPy (planilhas repetem muito os mesmos valores)
+        """
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        
+        converted = np.empty(len(uniques) + 1, dtype=object)
+        converted[:-1] = [converter(value) for value in uniques]
+        # O código -1 (valores ausentes) aponta para a última posição
+        converted[-1] = missing_value
+        
+        return pd.Series(converted[codes], index=series.index).infer_objects()
+    
     def _infer_period_from_data(self, df: pd.DataFrame) -> Tuple[int | None, int | None]:
         """Infere o mês e ano dos dados baseado nas datas de finalização"""
         # Tentar diferentes colunas de data
@@ -222,11 +502,115 @@ class DataProcessor:
         logger.warning("Não foi possível inferir período dos dados, usando mês/ano atual")
         return now.month, now.year
     
-    def _process_and_save_data(self, df: pd.DataFrame, month: int | None, year: int | None, batch_id: str, filename: str = None) -> List[Dict]:
-        """Processa e salva os dados no banco de dados de forma otimizada"""
-        processed_data = []
+    def _process_and_save_data(self, df: pd.DataFrame, month: int | None, year: int | None, batch_id: str, filename: str = None, replace_period: bool = True) -> List[Dict]:
+        """
+        Processa e salva os dados no banco com um único INSERT em lote (executemany)
+        dentro de uma transação. Se o lote falhar, ele é dividido até isolar as
+        linhas com erro, que são descartadas e registradas no log.
+        
+        Com replace_period=False os dados existentes do período são mantidos
+        (usado pelo modo streaming, que limpa o período uma única vez e
+        recalcula os resumos e a versão do período só depois do último bloco).
+        
+        Returns:
+            Registros inseridos, no formato das colunas de ticket_data
+        """
+        if replace_period:
+            self._delete_period_data(month, year)
+        
+        records = self._build_ticket_records(df, month, year, batch_id)
+        logger.info(f"Inserindo {len(records)} registros em lote")
+        
+        inserted, failed = self._execute_records(TicketData.__table__.insert(), records)
+        if replace_period:
+            rollup_service.refresh_period(month, year)
+            billing_cache.bump_period(month, year)
+        db.session.commit()
+        
+        if failed:
+            logger.warning(f"{len(failed)} registros não puderam ser inseridos e foram ignorados")
+        logger.info(f"Processamento concluído: {len(inserted)} registros salvos")
+        
+        return inserted
+    
+    def _upsert_period_data(self, df: pd.DataFrame, month: int | None, year: int | None, batch_id: str) -> Tuple[List[Dict], Dict[str, int]]:
+        """
+        Sincroniza o período com a planilha gravando apenas as diferenças.
+        
+        Cada linha é identificada por (ticket_id, ocorrência), onde a ocorrência
+        numera as repetições do mesmo ticket na ordem do arquivo (no banco, na
+        ordem de id). Linhas novas são inseridas, linhas cujo row_hash mudou são
+        atualizadas e linhas que sumiram da planilha são removidas; as demais
+        não são tocadas e mantêm o lote original.
+        
+        Returns:
+            Tupla (registros atualizados e inseridos, contagens por operação)
+        """
+        table = TicketData.__table__
+        records = self._build_ticket_records(df, month, year, batch_id)
+        
+        incoming = pd.DataFrame({
+            'ticket_id': [record['ticket_id'] for record in records],
+            'row_hash': [record['row_hash'] for record in records]
+        })
+        incoming['occurrence'] = incoming.groupby('ticket_id', dropna=False).cumcount()
+        incoming['position'] = np.arange(len(incoming))
+        
+        existing = pd.DataFrame(
+            db.session.query(TicketData.id, TicketData.ticket_id, TicketData.row_hash)
+            .filter_by(processing_month=month, processing_year=year)
+            .order_by(TicketData.id)
+            .all(),
+            columns=['id', 'ticket_id', 'row_hash']
+        )
+        existing['occurrence'] = existing.groupby('ticket_id', dropna=False).cumcount()
+        
+        merged = incoming.merge(
+            existing, on=['ticket_id', 'occurrence'], how='outer',
+            suffixes=('', '_stored'), indicator=True
+        )
+        to_insert = merged[merged['_merge'] == 'left_only']
+        to_delete = merged[merged['_merge'] == 'right_only']
+        matched = merged[merged['_merge'] == 'both']
+        to_update = matched[matched['row_hash'] != matched['row_hash_stored']]
+        
+        deleted_ids = to_delete['id'].astype(int).tolist()
+        for start in range(0, len(deleted_ids), self.DELETE_BATCH_SIZE):
+            chunk = deleted_ids[start:start + self.DELETE_BATCH_SIZE]
+            db.session.execute(table.delete().where(table.c.id.in_(chunk)))
         
-        # Limpar dados existentes do período de forma eficiente
+        update_records = [
+            {**records[position], '_id': int(row_id)}
+            for position, row_id in zip(to_update['position'].astype(int), to_update['id'].astype(int))
+        ]
+        updated, failed_updates = self._execute_records(
+            table.update().where(table.c.id == db.bindparam('_id')), update_records
+        )
+        
+        insert_records = [records[position] for position in to_insert['position'].astype(int)]
+        inserted, failed_inserts = self._execute_records(table.insert(), insert_records)
+        
+        rollup_service.refresh_period(month, year)
+        billing_cache.bump_period(month, year)
+        db.session.commit()
+        
+        changes = {
+            'inserted': len(inserted),
+            'updated': len(updated),
+            'deleted': len(deleted_ids),
+            'unchanged': len(matched) - len(to_update),
+            'failed': len(failed_inserts) + len(failed_updates)
+        }
+        logger.info(f"Ingestão incremental do período {month}/{year}: {changes}")
+        
+        saved = [
+            {'id': record['_id'], **{key: value for key, value in record.items() if key != '_id'}}
+            for record in updated
+        ]
+        return saved + inserted, changes
+    
+    def _delete_period_data(self, month: int | None, year: int | None):
+        """Remove os registros existentes do período (sem commit)"""
         if month is not None and year is not None:
             deleted_count = db.session.query(TicketData).filter_by(
                 processing_month=month, 
@@ -234,145 +618,228 @@ class DataProcessor:
             ).delete()
             if deleted_count > 0:
                 logger.info(f"Removidos {deleted_count} registros existentes do período {month}/{year}")
-        
-        # Processar em lotes para melhor performance
-        batch_size = 100
+    
+    def _build_ticket_records(self, df: pd.DataFrame, month: int | None, year: int | None, batch_id: str) -> List[Dict]:
+        """Converte o DataFrame limpo em registros prontos para inserção, coluna a coluna"""
         total_rows = len(df)
-        logger.info(f"Processando {total_rows} registros em lotes de {batch_size}")
+        columns = {}
         
-        for start_idx in range(0, total_rows, batch_size):
-            end_idx = min(start_idx + batch_size, total_rows)
-            batch_df = df.iloc[start_idx:end_idx]
+        for col in self.TICKET_COLUMNS:
+            if col not in df.columns:
+                columns[col] = [0.0 if col == 'total_service_time' else None] * total_rows
+                continue
             
-            batch_objects = []
-            for _, row in batch_df.iterrows():
-                try:
-                    ticket_data = TicketData(
-                        ticket_id=str(row.get('ticket_id', '')) if pd.notna(row.get('ticket_id')) else None,
-                        client_name=str(row.get('client_name', '')) if pd.notna(row.get('client_name')) else None,
-                        subject=str(row.get('subject', '')) if pd.notna(row.get('subject')) else None,
-                        technician=str(row.get('technician', '')) if pd.notna(row.get('technician')) else None,
-                        primary_category=str(row.get('primary_category', '')) if pd.notna(row.get('primary_category')) else None,
-                        secondary_category=str(row.get('secondary_category', '')) if pd.notna(row.get('secondary_category')) else None,
-                        contact=str(row.get('contact', '')) if pd.notna(row.get('contact')) else None,
-                        arrival_date=row.get('arrival_date') if pd.notna(row.get('arrival_date')) else None,
-                        departure_date=row.get('departure_date') if pd.notna(row.get('departure_date')) else None,
-                        completion_date=row.get('completion_date') if pd.notna(row.get('completion_date')) else None,
-                        workstation=str(row.get('workstation', '')) if pd.notna(row.get('workstation')) else None,
-                        pause_reason=str(row.get('pause_reason', '')) if pd.notna(row.get('pause_reason')) else None,
-                        sector=str(row.get('sector', '')) if pd.notna(row.get('sector')) else None,
-                        status=str(row.get('status', '')) if pd.notna(row.get('status')) else None,
-                        ticket_type=str(row.get('ticket_type', '')) if pd.notna(row.get('ticket_type')) else None,
-                        service=str(row.get('service', '')) if pd.notna(row.get('service')) else None,
-                        description=str(row.get('description', '')) if pd.notna(row.get('description')) else None,
-                        business_hours=self._convert_to_boolean(row.get('business_hours')),
-                        external_service=self._convert_to_boolean(row.get('external_service')),
-                        start_date=row.get('start_date') if pd.notna(row.get('start_date')) else None,
-                        end_date=row.get('end_date') if pd.notna(row.get('end_date')) else None,
-                        total_service_time=float(row.get('total_service_time', 0.0)) if pd.notna(row.get('total_service_time')) else 0.0,
-                        processing_month=int(month) if pd.notna(month) else None,
-                        processing_year=int(year) if pd.notna(year) else None,
-                        upload_batch_id=batch_id
-                    )
-                    batch_objects.append(ticket_data)
-                    processed_data.append(ticket_data.to_dict())
-                except Exception as e:
-                    logger.error(f"Erro ao criar TicketData para linha {start_idx + len(batch_objects)}: {e}")
-                    continue
+            values = df[col]
+            missing = values.isna().to_numpy()
+            if col == 'total_service_time':
+                columns[col] = values.astype(float).fillna(0.0).tolist()
+                continue
             
-            # Inserir lote no banco
-            try:
-                db.session.add_all(batch_objects)
-                db.session.commit()
-                logger.info(f"Lote {start_idx + 1}-{end_idx} inserido com sucesso ({len(batch_objects)} registros)")
-            except Exception as e:
-                logger.error(f"Erro ao inserir lote {start_idx + 1}-{end_idx}: {e}")
-                db.session.rollback()
-                # Tentar inserir um por vez em caso de erro
-                for obj in batch_objects:
-                    try:
-                        db.session.add(obj)
-                        db.session.commit()
-                    except Exception as individual_error:
-                        logger.error(f"Erro ao inserir registro individual: {individual_error}")
-                        db.session.rollback()
+            if col in self.TICKET_DATE_COLUMNS:
+                converted = values.array.to_pydatetime().astype(object)
+            elif col in self.TICKET_BOOLEAN_COLUMNS:
+                converted = values.to_numpy(dtype=object)
+            else:
+                converted = values.astype(str).to_numpy(dtype=object)
+            converted[missing] = None
+            columns[col] = converted.tolist()
+        
+        columns['processing_month'] = [int(month) if pd.notna(month) else None] * total_rows
+        columns['processing_year'] = [int(year) if pd.notna(year) else None] * total_rows
+        columns['upload_batch_id'] = [batch_id] * total_rows
+        columns['row_hash'] = self._hash_ticket_columns(columns, total_rows)
+        columns['client_name_normalized'] = self._normalize_names(df, 'client_name')
+        columns['client_id'] = self._encode_names(df, 'client_name', Client, normalized=True)
+        columns['technician_id'] = self._encode_names(df, 'technician', Technician)
+        
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+    
+    def _encode_names(self, df: pd.DataFrame, column: str, model, normalized: bool = False) -> List[Optional[int]]:
+        """
+        Resolve os nomes da coluna para ids da tabela do modelo (clients/technicians)
+        por codificação de dicionário: cada nome distinto é procurado uma única vez.
+        Com normalized, nomes sem cadastro exato são procurados por normalized_name
+        (variações de acento, caixa e espaços), como em RollupService.link_clients.
+        Nomes ausentes ou sem cadastro ficam com None.
+        """
+        if column not in df.columns:
+            return [None] * len(df)
+        
+        codes, uniques = pd.factorize(df[column])
+        ids_by_name = dict(db.session.query(model.name, model.id).all())
+        ids_by_normalized = {}
+        if normalized:
+            # Em ordem decrescente de id, para que o menor id prevaleça entre nomes equivalentes
+            ids_by_normalized = dict(db.session.query(model.normalized_name, model.id).order_by(model.id.desc()).all())
+        
+        def lookup(name):
+            registered_id = ids_by_name.get(name)
+            if registered_id is None and normalized:
+                registered_id = ids_by_normalized.get(normalize_name(name))
+            return registered_id
+        
+        # O código -1 (valor ausente) aponta para o último elemento, None
+        dictionary = np.array([lookup(name) for name in uniques] + [None], dtype=object)
+        return dictionary[codes].tolist()
+    
+    def _normalize_names(self, df: pd.DataFrame, column: str) -> List[Optional[str]]:
+        """normalize_name de cada linha, calculado uma vez por nome distinto"""
+        if column not in df.columns:
+            return [None] * len(df)
+        
+        codes, uniques = pd.factorize(df[column])
+        dictionary = np.array([normalize_name(name) for name in uniques] + [None], dtype=object)
+        return dictionary[codes].tolist()
+    
+    def _hash_ticket_columns(self, columns: Dict[str, List], total_rows: int) -> List[str]:
+        """Hash de 64 bits (hex) do conteúdo de cada linha, usado pela ingestão incremental"""
+        if total_rows == 0:
+            return []
+        content = pd.DataFrame({col: columns[col] for col in self.TICKET_COLUMNS}, dtype=object)
+        hashes = pd.util.hash_pandas_object(content, index=False).to_numpy()
+        return [f'{value:016x}' for value in hashes.tolist()]
+    
+    def _execute_records(self, statement, records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Executa o INSERT/UPDATE em lote dentro de um SAVEPOINT. Em caso de erro,
+        divide o lote ao meio recursivamente, de modo que só as linhas
+        problemáticas acabam sendo tentadas individualmente.
         
-        logger.info(f"Processamento concluído: {len(processed_data)} registros salvos")
-        return processed_data
+        Returns:
+            Tupla (registros gravados, registros com erro)
+        """
+        if not records:
+            return [], []
+        
+        try:
+            with db.session.begin_nested():
+                db.session.execute(statement, records)
+            return records, []
+        except Exception as e:
+            if len(records) == 1:
+                logger.error(f"Erro ao gravar registro individual (ticket {records[0].get('ticket_id')}): {e}")
+                return [], records
+            
+            middle = len(records) // 2
+            inserted_left, failed_left = self._execute_records(statement, records[:middle])
+            inserted_right, failed_right = self._execute_records(statement, records[middle:])
+            return inserted_left + inserted_right, failed_left + failed_right
+    
+    def _serialize_record(self, record: Dict) -> Dict:
+        """Serializa um registro inserido no mesmo formato de TicketData.to_dict()"""
+        data = {'id': None, **record, 'created_at': None}
+        data.pop('row_hash', None)
+        for col in self.TICKET_DATE_COLUMNS:
+            if data[col] is not None:
+                data[col] = data[col].isoformat()
+        return data
     
     def _update_clients(self, df: pd.DataFrame):
-        """Atualiza ou cria clientes baseado nos dados processados"""
-        unique_clients = df['client_name'].unique()
+        """
+        Atualiza ou cria clientes baseado nos dados processados.
+        
+        Os clientes existentes são carregados numa única consulta e o contato/setor
+        de cada cliente vem da primeira linha em que ele aparece na planilha; os
+        novos são inseridos e os incompletos atualizados em lote, com um número
+        fixo de comandos independente da quantidade de clientes.
+        """
+        first_seen = self._first_seen_rows(df, 'client_name', ['contact', 'sector'])
+        if first_seen.empty:
+            return
         
-        for client_name in unique_clients:
-            if pd.isna(client_name) or not str(client_name).strip():
+        existing = {
+            row.name: row
+            for row in db.session.query(Client.id, Client.name, Client.contact, Client.sector).all()
+        }
+        
+        new_clients = []
+        updates = []
+        for name, contact, sector in first_seen.itertuples(index=False, name=None):
+            client = existing.get(name)
+            if client is None:
+                new_clients.append({
+                    'name': name,
+                    'normalized_name': normalize_name(name),
+                    'contact': contact,
+                    'sector': sector,
+                    # Usar valores padrão para novos clientes
+                    'contract_hours': 10.0,
+                    'hourly_rate': 100.0,
+                    'overtime_rate': 115.0,
+                    'external_service_rate': 88.0,
+                    'active': True
+                })
                 continue
-                
-            client_name = str(client_name).strip()
-            
-            existing_client = db.session.query(Client).filter_by(name=client_name).first()
             
-            if not existing_client:
-                client_data = df[df['client_name'] == client_name].iloc[0]
-                
-                new_client = Client(
-                    name=client_name,
-                    contact=str(client_data.get('contact', '')) if pd.notna(client_data.get('contact')) else None,
-                    sector=str(client_data.get('sector', '')) if pd.notna(client_data.get('sector')) else None,
-                    # Usar valores padrão para novos clientes
-                    contract_hours=10.0,
-                    hourly_rate=100.0,
-                    overtime_rate=115.0,
-                    external_service_rate=88.0,
-                    active=True
-                )
-                db.session.add(new_client)
-                logger.info(f"Novo cliente criado: {client_name}")
-            else:
-                # Atualizar informações de contato se disponível
-                client_data = df[df['client_name'] == client_name].iloc[0]
-                updated = False
-                
-                if pd.notna(client_data.get('contact')) and not existing_client.contact:
-                    existing_client.contact = str(client_data.get('contact', ''))
-                    updated = True
-                    
-                if pd.notna(client_data.get('sector')) and not existing_client.sector:
-                    existing_client.sector = str(client_data.get('sector', ''))
-                    updated = True
-                
-                if updated:
-                    logger.info(f"Cliente atualizado: {client_name}")
+            # Atualizar informações de contato apenas quando estiverem vazias no cadastro
+            new_contact = contact if contact is not None and not client.contact else client.contact
+            new_sector = sector if sector is not None and not client.sector else client.sector
+            if (new_contact, new_sector) != (client.contact, client.sector):
+                updates.append({'_id': client.id, 'contact': new_contact, 'sector': new_sector})
+        
+        table = Client.__table__
+        if new_clients:
+            # Outro upload simultâneo pode ter criado o mesmo cliente nesse meio-tempo
+            db.session.execute(sqlite_insert(table).on_conflict_do_nothing(index_elements=['name']), new_clients)
+            logger.info(f"{len(new_clients)} novos clientes criados")
+        if updates:
+            db.session.execute(table.update().where(table.c.id == db.bindparam('_id')), updates)
+            logger.info(f"{len(updates)} clientes atualizados")
         
         db.session.commit()
     
     def _update_technicians(self, df: pd.DataFrame):
-        """Atualiza ou cria técnicos baseado nos dados processados"""
-        from src.models.technician import Technician
+        """Cria em lote os técnicos da planilha que ainda não estão cadastrados"""
+        first_seen = self._first_seen_rows(df, 'technician', [])
+        if first_seen.empty:
+            return
         
-        unique_technicians = df['technician'].unique()
+        existing = {name for (name,) in db.session.query(Technician.name).all()}
+        new_technicians = [
+            {
+                'name': name,
+                # Valores padrão para novos técnicos
+                'monthly_hours_target': 160.0,
+                'efficiency_target': 85.0,
+                'active': True
+            }
+            for name in first_seen['technician']
+            if name not in existing
+        ]
         
-        for technician_name in unique_technicians:
-            if pd.isna(technician_name) or not str(technician_name).strip():
-                continue
-                
-            technician_name = str(technician_name).strip()
-            
-            existing_technician = db.session.query(Technician).filter_by(name=technician_name).first()
-            
-            if not existing_technician:
-                new_technician = Technician(
-                    name=technician_name,
-                    # Valores padrão para novos técnicos
-                    monthly_hours_target=160.0,
-                    efficiency_target=85.0,
-                    active=True
-                )
-                db.session.add(new_technician)
-                logger.info(f"Novo técnico criado: {technician_name}")
+        if new_technicians:
+            db.session.execute(
+                sqlite_insert(Technician.__table__).on_conflict_do_nothing(index_elements=['name']),
+                new_technicians
+            )
+            logger.info(f"{len(new_technicians)} novos técnicos criados")
         
         db.session.commit()
     
+    def _first_seen_rows(self, df: pd.DataFrame, key: str, columns: List[str]) -> pd.DataFrame:
+        """
+        Primeira linha de cada nome (sem espaços nas pontas e não vazio), com as
+        colunas pedidas convertidas para texto e valores ausentes como None
+        """
+        available = [col for col in columns if col in df.columns]
+        frame = df[[key] + available].copy()
+        for col in columns:
+            if col not in frame.columns:
+                frame[col] = None
+        
+        frame = frame[frame[key].notna()]
+        frame[key] = frame[key].astype(str).str.strip()
+        frame = frame[frame[key] != ''].drop_duplicates(subset=key, keep='first')
+        
+        for col in columns:
+            values = frame[col]
+            converted = values.astype(str).to_numpy(dtype=object)
+            converted[values.isna().to_numpy()] = None
+            frame[col] = converted
+        
+        return frame[[key] + columns]
+    
     def _calculate_statistics(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Calcula estatísticas dos dados processados"""
         stats = {}
@@ -382,17 +849,17 @@ class DataProcessor:
         stats['unique_technicians'] = df['technician'].nunique()
         stats['total_hours'] = df['total_service_time'].sum()
         
-        client_hours = df.groupby('client_name')['total_service_time'].sum().to_dict()
-        stats['hours_by_client'] = {str(k): v for k, v in client_hours.items()}
+        by_client, by_technician = self._group_statistics(df)
         
-        technician_hours = df.groupby('technician')['total_service_time'].sum().to_dict()
-        stats['hours_by_technician'] = {str(k): v for k, v in technician_hours.items()}
+        stats['hours_by_client'] = {str(k): v for k, v in by_client['hours'].to_dict().items()}
+        stats['hours_by_technician'] = {str(k): v for k, v in by_technician['hours'].sort_index().to_dict().items()}
         
-        external_services = df[df['external_service'] == True].groupby('client_name').size().to_dict()
-        stats['external_services_by_client'] = {str(k): v for k, v in external_services.items()}
+        # Só entram clientes/técnicos com pelo menos um atendimento externo
+        external_services = by_client.loc[by_client['external_services'] > 0, 'external_services']
+        stats['external_services_by_client'] = {str(k): v for k, v in external_services.to_dict().items()}
         
-        external_services_tech = df[df['external_service'] == True].groupby('technician').size().to_dict()
-        stats['external_services_by_technician'] = {str(k): v for k, v in external_services_tech.items()}
+        external_services_tech = by_technician.loc[by_technician['external_services'] > 0, 'external_services']
+        stats['external_services_by_technician'] = {str(k): v for k, v in external_services_tech.sort_index().to_dict().items()}
         
         primary_categories = df['primary_category'].value_counts().to_dict()
         stats['primary_categories'] = {str(k): v for k, v in primary_categories.items()}
@@ -400,26 +867,279 @@ class DataProcessor:
         secondary_categories = df['secondary_category'].value_counts().to_dict()
         stats['secondary_categories'] = {str(k): v for k, v in secondary_categories.items()}
         
-        technician_stats = {}
-        for tech in df['technician'].unique():
-            if pd.isna(tech):
+        # Técnicos na ordem em que aparecem na planilha
+        stats['technician_details'] = {
+            str(tech): {
+                'total_hours': row['detail_hours'],
+                'total_tickets': row['tickets'],
+                'external_services': row['external_services'],
+                'unique_clients': row['unique_clients']
+            }
+            for tech, row in by_technician.to_dict('index').items()
+        }
+        
+        return stats
+    
+    @staticmethod
+    def _group_statistics(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Agregados por cliente e por técnico, com uma única passada agrupada em cada
+        dimensão (agregações nomeadas), em vez de um filtro do DataFrame por técnico.
+        
+        Returns:
+            Tupla (por cliente, ordenado pelo nome; por técnico, na ordem de aparição)
+        """
+        frame = df[['client_name', 'technician', 'total_service_time']].assign(
+            external_service=(df['external_service'] == True)
+        )
+        
+        by_client = frame.groupby('client_name').agg(
+            hours=('total_service_time', 'sum'),
+            external_services=('external_service', 'sum')
+        )
+        by_technician = frame.groupby('technician', sort=False).agg(
+            hours=('total_service_time', 'sum'),
+            # Series.sum (soma pairwise do NumPy), exatamente como o total por técnico
+            # sempre foi calculado; a soma do groupby acima usa compensação de Kahan
+            detail_hours=('total_service_time', lambda values: values.sum()),
+            tickets=('total_service_time', 'size'),
+            external_services=('external_service', 'sum'),
+            unique_clients=('client_name', 'nunique')
+        )
+        return by_client, by_technician
+
+class SpreadsheetReader:
+    """
+    Leitura de planilhas com engines selecionáveis e fallback automático.
+    
+    Engines disponíveis:
+        calamine           leitor em Rust (python-calamine, opcional) para .xlsx/.xls
+        openpyxl_readonly  openpyxl em modo somente leitura, linha a linha
+        openpyxl           pd.read_excel com o openpyxl (comportamento original)
+        xlrd               pd.read_excel com o xlrd, para .xls
+        csv                pd.read_csv, com detecção de separador e encoding
+        parquet            pd.read_parquet (requer pyarrow ou fastparquet)
+    """
+    
+    # Ordem de tentativa por extensão; a primeira é a mais rápida disponível
+    ENGINES_BY_EXTENSION = {
+        'xlsx': ['calamine', 'openpyxl_readonly', 'openpyxl'],
+        'xlsm': ['calamine', 'openpyxl_readonly', 'openpyxl'],
+        'xls': ['calamine', 'xlrd'],
+        'csv': ['csv'],
+        'parquet': ['parquet']
+    }
+    CSV_ENCODINGS = ['utf-8-sig', 'latin-1']
+    CSV_DELIMITERS = ',;\t|'
+    
+    def __init__(self):
+        self._engines = {
+            'calamine': self._read_calamine,
+            'openpyxl_readonly': self._read_openpyxl_readonly,
+            'openpyxl': self._read_openpyxl,
+            'xlrd': self._read_xlrd,
+            'csv': self._read_csv,
+            'parquet': self._read_parquet
+        }
+    
+    @property
+    def engines(self) -> List[str]:
+        return list(self._engines)
+    
+    def read(self, file_path: str, engine: str = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Lê a primeira aba/tabela do arquivo.
+        
+        Tenta a engine pedida (se houver) e depois as compatíveis com a
+        extensão, até uma funcionar. Retorna o DataFrame e um resumo com a
+        engine usada e o tempo de leitura.
+        """
+        if engine and engine not in self._engines:
+            raise ValueError(f"Engine de leitura desconhecida: {engine}")
+        
+        candidates = self._engine_order(file_path, engine)
+        last_error = None
+        
+        for name in candidates:
+            start = time.perf_counter()
+            try:
+                df = self._engines[name](file_path)
+            except Exception as e:
+                logger.warning(f"Engine de leitura '{name}' falhou para {file_path}: {e}")
+                last_error = e
                 continue
             
-            tech_data = df[df['technician'] == tech]
-            technician_stats[str(tech)] = {
-                'total_hours': tech_data['total_service_time'].sum(),
-                'total_tickets': len(tech_data),
-                'external_services': len(tech_data[tech_data['external_service'] == True]),
-                'unique_clients': tech_data['client_name'].nunique()
-            }
+            elapsed = time.perf_counter() - start
+            logger.info(f"Planilha lida com a engine '{name}' em {elapsed:.2f}s ({len(df)} linhas)")
+            return df, {'engine': name, 'parse_seconds': round(elapsed, 3)}
+        
+        raise last_error or ValueError(f"Nenhuma engine de leitura disponível para {file_path}")
+    
+    def _engine_order(self, file_path: str, engine: str = None) -> List[str]:
+        extension = file_path.rsplit('.', 1)[-1].lower() if '.' in file_path else ''
+        order = list(self.ENGINES_BY_EXTENSION.get(extension, self.ENGINES_BY_EXTENSION['xlsx']))
+        if engine:
+            order = [engine] + [name for name in order if name != engine]
+        return order
+    
+    def _read_calamine(self, file_path: str) -> pd.DataFrame:
+        if importlib.util.find_spec('python_calamine') is None:
+            raise ImportError('python-calamine não está instalado')
+        return pd.read_excel(file_path, engine='calamine')
+    
+    def _read_openpyxl_readonly(self, file_path: str) -> pd.DataFrame:
+        chunks = list(self.iter_excel_chunks(file_path, DataProcessor.STREAMING_CHUNK_SIZE))
+        if not chunks:
+            raise ValueError('Planilha vazia')
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    
+    def _read_openpyxl(self, file_path: str) -> pd.DataFrame:
+        return pd.read_excel(file_path, engine='openpyxl')
+    
+    def _read_xlrd(self, file_path: str) -> pd.DataFrame:
+        return pd.read_excel(file_path, engine='xlrd')
+    
+    def _read_csv(self, file_path: str) -> pd.DataFrame:
+        last_error = None
+        for encoding in self.CSV_ENCODINGS:
+            try:
+                with open(file_path, 'r', encoding=encoding, newline='') as f:
+                    sample = f.read(64 * 1024)
+                try:
+                    delimiter = csv.Sniffer().sniff(sample, delimiters=self.CSV_DELIMITERS).delimiter
+                except csv.Error:
+                    delimiter = ','
+                return pd.read_csv(file_path, sep=delimiter, encoding=encoding)
+            except UnicodeDecodeError as e:
+                last_error = e
+        raise last_error
+    
+    def _read_parquet(self, file_path: str) -> pd.DataFrame:
+        return pd.read_parquet(file_path)
+    
+    def iter_excel_chunks(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Lê a primeira aba da planilha em blocos de linhas (openpyxl read-only)"""
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            
+            columns = [str(name) if name is not None else f'Unnamed: {i}' for i, name in enumerate(header)]
+            width = len(columns)
+            
+            chunk = []
+            for row in rows:
+                # Linhas totalmente vazias são ignoradas
+                if all(value is None for value in row):
+                    continue
+                chunk.append(tuple(row[:width]) + (None,) * (width - len(row)))
+                
+                if len(chunk) >= chunk_size:
+                    yield self._chunk_to_dataframe(chunk, columns)
+                    chunk = []
+            
+            if chunk:
+                yield self._chunk_to_dataframe(chunk, columns)
+        finally:
+            workbook.close()
+    
+    def _chunk_to_dataframe(self, rows: List[tuple], columns: List[str]) -> pd.DataFrame:
+        """Monta o DataFrame de um bloco com células vazias como NaN, igual a pd.read_excel"""
+        frame = pd.DataFrame(rows, columns=columns)
+        return frame.mask(frame.isna()).infer_objects()
+
+class StatisticsAccumulator:
+    """
+    Acumula, bloco a bloco, as mesmas estatísticas de DataProcessor._calculate_statistics
+    sem precisar manter o DataFrame inteiro em memória
+    """
+    
+    def __init__(self):
+        self.total_tickets = 0
+        self.total_hours = 0.0
+        self.clients = set()
+        self.technicians = set()
+        self.hours_by_client = Counter()
+        self.hours_by_technician = Counter()
+        self.external_services_by_client = Counter()
+        self.external_services_by_technician = Counter()
+        self.primary_categories = Counter()
+        self.secondary_categories = Counter()
+        self.technician_details = {}
+    
+    def add(self, df: pd.DataFrame):
+        """Soma um bloco já limpo às estatísticas acumuladas"""
+        self.total_tickets += len(df)
+        self.total_hours += df['total_service_time'].sum()
+        self.clients.update(df['client_name'].dropna().unique())
+        self.technicians.update(df['technician'].dropna().unique())
         
-        stats['technician_details'] = technician_stats
+        by_client, by_technician = DataProcessor._group_statistics(df)
         
-        return stats
+        self.hours_by_client.update(by_client['hours'].to_dict())
+        self.hours_by_technician.update(by_technician['hours'].to_dict())
+        self.external_services_by_client.update(by_client.loc[by_client['external_services'] > 0, 'external_services'].to_dict())
+        self.external_services_by_technician.update(by_technician.loc[by_technician['external_services'] > 0, 'external_services'].to_dict())
+        
+        self.primary_categories.update(df['primary_category'].value_counts().to_dict())
+        self.secondary_categories.update(df['secondary_category'].value_counts().to_dict())
+        
+        # Clientes distintos por técnico precisam dos conjuntos, não só das contagens do bloco
+        pairs = df[['technician', 'client_name']].dropna().drop_duplicates()
+        clients_by_technician = pairs.groupby('technician', sort=False)['client_name'].agg(list).to_dict()
+        
+        for tech, row in by_technician.to_dict('index').items():
+            details = self.technician_details.setdefault(tech, {
+                'total_hours': 0.0,
+                'total_tickets': 0,
+                'external_services': 0,
+                'clients': set()
+            })
+            details['total_hours'] += row['hours']
+            details['total_tickets'] += row['tickets']
+            details['external_services'] += row['external_services']
+            details['clients'].update(clients_by_technician.get(tech, []))
+    
+    def result(self) -> Dict[str, Any]:
+        """Retorna as estatísticas no formato de DataProcessor._calculate_statistics"""
+        return {
+            'total_tickets': self.total_tickets,
+            'unique_clients': len(self.clients),
+            'unique_technicians': len(self.technicians),
+            'total_hours': self.total_hours,
+            'hours_by_client': {str(k): v for k, v in self.hours_by_client.items()},
+            'hours_by_technician': {str(k): v for k, v in self.hours_by_technician.items()},
+            'external_services_by_client': {str(k): v for k, v in self.external_services_by_client.items()},
+            'external_services_by_technician': {str(k): v for k, v in self.external_services_by_technician.items()},
+            'primary_categories': {str(k): v for k, v in self.primary_categories.most_common()},
+            'secondary_categories': {str(k): v for k, v in self.secondary_categories.most_common()},
+            'technician_details': {
+                str(tech): {
+                    'total_hours': details['total_hours'],
+                    'total_tickets': details['total_tickets'],
+                    'external_services': details['external_services'],
+                    'unique_clients': len(details['clients'])
+                }
+                for tech, details in self.technician_details.items()
+            }
+        }
 
 class BillingCalculator:
     """Classe responsável pelos cálculos de faturamento"""
     
+    # Regras de cobrança de clientes criados automaticamente
+    DEFAULT_CLIENT_RULES = {
+        'contract_hours': 10.0,
+        'hourly_rate': 100.0,
+        'overtime_rate': 115.0,
+        'external_service_rate': 88.0
+    }
+    # Campos que podem ser alterados em simulate_billing
+    SIMULATION_FIELDS = ('contract_hours', 'hourly_rate', 'overtime_rate', 'external_service_rate')
+    
     def calculate_client_billing(self, client_name: str, month: int, year: int) -> Dict[str, Any]:
         """
         Calcula o faturamento para um cliente específico usando suas regras configuradas
@@ -430,8 +1150,15 @@ class BillingCalculator:
             year: Ano de referência
         
         Returns:
-            Dict com informações de faturamento
+            Dict com informações de faturamento. Em períodos fechados, a fatura
+            congelada no fechamento (ou {'error': ...} se o cliente não foi faturado)
         """
+        if ClosedPeriod.is_closed(month, year):
+            snapshot = InvoiceSnapshot.query.filter_by(year=year, month=month, client_name=client_name).first()
+            if not snapshot:
+                return {'error': f'Cliente {client_name} não possui fatura no período fechado {month:02d}/{year}'}
+            return snapshot.to_billing_dict()
+        
         # Buscar cliente no banco
         client = db.session.query(Client).filter_by(name=client_name, active=True).first()
         if not client:
@@ -446,11 +1173,13 @@ class BillingCalculator:
                 active=True
             )
             db.session.add(client)
+            db.session.flush()
+            rollup_service.link_clients([client_name])
             db.session.commit()
         
         # Buscar tickets do cliente no período
         tickets = TicketData.query.filter_by(
-            client_name=client_name,
+            client_id=client.id,
             processing_month=month,
             processing_year=year
         ).all()
@@ -512,19 +1241,428 @@ class BillingCalculator:
             'tickets_count': len(tickets)
         }
     
-    def calculate_all_clients_billing(self, month: int, year: int) -> List[Dict[str, Any]]:
-        """Calcula o faturamento para todos os clientes do período"""
-        client_names = db.session.query(TicketData.client_name).filter_by(
-            processing_month=month,
-            processing_year=year
-        ).distinct().all()
+    def calculate_all_clients_billing(self, month: int, year: int, include_tickets: bool = False) -> List[Dict[str, Any]]:
+        """
+        Calcula o faturamento para todos os clientes do período.
+        
+        Horas, atendimentos externos e quantidade de tickets de todos os clientes
+        vêm do resumo do período (period_client_rollups) unido a clients numa única
+        consulta; horas contratuais, excedentes e valores são calculados de forma
+        vetorizada. Clientes que ainda não existem são criados em lote com os
+        valores padrão, e os inativos ficam de fora. Períodos fechados são
+        servidos das faturas congeladas no fechamento, sem recálculo.
+        
+        Args:
+            month: Mês de referência
+            year: Ano de referência
+            include_tickets: Inclui em cada cliente a lista completa de tickets
+                (uma consulta adicional para o período inteiro)
+        """
+        if ClosedPeriod.is_closed(month, year):
+            snapshots = InvoiceSnapshot.query.filter_by(year=year, month=month).order_by(InvoiceSnapshot.client_name).all()
+            return [snapshot.to_billing_dict(include_tickets=include_tickets) for snapshot in snapshots]
+        
+        totals = self._load_active_billing_totals(
+            (PeriodClientRollup.year == year, PeriodClientRollup.month == month),
+            f'{month:02d}/{year}'
+        )
+        if totals.empty:
+            return []
+        
+        totals = self._apply_billing_rules(totals)
+        tickets_by_client = self._load_tickets_by_client(month, year) if include_tickets else None
         
         billing_data = []
-        for (client_name,) in client_names:
-            if client_name and client_name.strip():
-                billing = self.calculate_client_billing(client_name, month, year)
-                if 'error' not in billing:
-                    billing_data.append(billing)
+        for row in totals.itertuples(index=False):
+            billing = self._billing_entry(row)
+            if tickets_by_client is not None:
+                billing['tickets'] = tickets_by_client.get(row.client_name, [])
+            billing_data.append(billing)
         
         return billing_data
-
+    
+    def calculate_range_billing(self, from_month: int, from_year: int, to_month: int, to_year: int) -> Dict[str, Any]:
+        """
+        Calcula o faturamento mês a mês de todos os clientes num intervalo de períodos.
+        
+        Os totais de todos os meses vêm de uma única consulta aos resumos por
+        período; cada linha (cliente, mês) é cobrada separadamente, de modo que a
+        franquia de horas contratuais vale mês a mês, como no faturamento mensal.
+        Meses fechados usam as faturas congeladas no fechamento.
+        
+        Returns:
+            Linhas por cliente e mês ('rows'), totais por mês ('months'), totais
+            por cliente no intervalo ('clients') e do intervalo ('summary')
+        """
+        first = from_year * 12 + (from_month - 1)
+        last = to_year * 12 + (to_month - 1)
+        period_key = PeriodClientRollup.year * 12 + (PeriodClientRollup.month - 1)
+        
+        totals = self._load_active_billing_totals(
+            (period_key.between(first, last),),
+            f'{from_month:02d}/{from_year} a {to_month:02d}/{to_year}'
+        )
+        rows = []
+        if not totals.empty:
+            totals = self._apply_billing_rules(totals)
+            rows = [
+                {'year': int(row.year), 'month': int(row.month), **self._billing_entry(row)}
+                for row in totals.itertuples(index=False)
+            ]
+        
+        # Meses fechados vêm das faturas congeladas
+        closed = {
+            (period.year, period.month) for period in
+            ClosedPeriod.query.filter((ClosedPeriod.year * 12 + (ClosedPeriod.month - 1)).between(first, last))
+        }
+        if closed:
+            snapshots = InvoiceSnapshot.query.filter(
+                (InvoiceSnapshot.year * 12 + (InvoiceSnapshot.month - 1)).between(first, last)
+            ).all()
+            rows = [entry for entry in rows if (entry['year'], entry['month']) not in closed]
+            rows += [
+                {'year': snapshot.year, 'month': snapshot.month, **snapshot.to_billing_dict(include_tickets=False)}
+                for snapshot in snapshots
+            ]
+            rows.sort(key=lambda entry: (entry['year'], entry['month'], entry['client_name']))
+        
+        summed = ('total_hours', 'overtime_hours', 'external_services', 'contract_value',
+                  'overtime_value', 'external_services_value', 'total_value')
+        
+        def summarize(entries):
+            summary = {field: round(sum(entry[field] for entry in entries), 2) for field in summed}
+            summary['external_services'] = int(summary['external_services'])
+            summary['tickets_count'] = sum(entry['tickets_count'] for entry in entries)
+            return summary
+        
+        rows_by_month = {}
+        rows_by_client = {}
+        for entry in rows:
+            rows_by_month.setdefault((entry['year'], entry['month']), []).append(entry)
+            rows_by_client.setdefault(entry['client_name'], []).append(entry)
+        
+        months = []
+        for key in range(first, last + 1):
+            year, month = divmod(key, 12)
+            entries = rows_by_month.get((year, month + 1), [])
+            months.append({'year': year, 'month': month + 1, 'total_clients': len(entries), **summarize(entries)})
+        
+        clients = [
+            {
+                'client_name': client_name,
+                'client_id': entries[0]['client_id'],
+                'months_billed': len(entries),
+                **summarize(entries)
+            }
+            for client_name, entries in sorted(rows_by_client.items())
+        ]
+        
+        return {
+            'rows': rows,
+            'months': months,
+            'clients': clients,
+            'summary': {'total_clients': len(clients), 'total_months': len(months), **summarize(rows)}
+        }
+    
+    def simulate_billing(self, from_month: int, from_year: int, to_month: int, to_year: int,
+                         multipliers: Dict[str, float] = None,
+                         overrides: Dict[str, Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Simula a receita do intervalo com regras de cobrança alteradas, sem gravar nada.
+        
+        Os totais mensais por cliente vêm dos resumos por período; as regras
+        propostas são aplicadas sobre eles num único cálculo vetorizado, mês a mês
+        como no faturamento real. Clientes sem cadastro usam os valores padrão em
+        memória (a tabela clients não é alterada) e os inativos ficam de fora.
+        Meses fechados partem das faturas congeladas, como em
+        calculate_range_billing: o valor atual é o faturado no fechamento e a
+        simulação altera as regras vigentes naquele momento. Esses meses são
+        listados em 'closed_months'.
+        
+        Args:
+            multipliers: Fatores globais por campo de SIMULATION_FIELDS (ex.: {'hourly_rate': 1.1})
+            overrides: Valores absolutos por cliente, que substituem o valor
+                multiplicado (ex.: {'Cliente A': {'contract_hours': 20}})
+        
+        Raises:
+            ValueError: Campo desconhecido ou valor não numérico/negativo
+        """
+        multipliers = self._validate_simulation_values(multipliers or {})
+        overrides = {name: self._validate_simulation_values(values or {}) for name, values in (overrides or {}).items()}
+        
+        first = from_year * 12 + (from_month - 1)
+        last = to_year * 12 + (to_month - 1)
+        period_key = PeriodClientRollup.year * 12 + (PeriodClientRollup.month - 1)
+        totals = self._load_billing_totals((period_key.between(first, last),))
+        
+        closed, snapshots = self._load_snapshot_totals(first, last)
+        if closed:
+            in_closed_month = [(year, month) in closed for year, month in zip(totals['year'], totals['month'])]
+            totals = totals[~np.array(in_closed_month, dtype=bool)]
+        
+        totals = totals[totals['active'].isna() | totals['active'].fillna(True).astype(bool)]
+        totals = totals.assign(billed_value=np.nan)
+        if not snapshots.empty:
+            totals = pd.concat([totals, snapshots], ignore_index=True)
+        names = totals['client_name']
+        totals = totals.fillna({field: default for field, default in self.DEFAULT_CLIENT_RULES.items()})
+        
+        proposed = {}
+        for field in self.SIMULATION_FIELDS:
+            values = totals[field].to_numpy(dtype=float) * multipliers.get(field, 1.0)
+            overridden = totals['client_name'].map(
+                {name: values_by_field[field] for name, values_by_field in overrides.items() if field in values_by_field}
+            )
+            proposed[field] = np.where(overridden.notna(), overridden.to_numpy(dtype=float, na_value=np.nan), values)
+        
+        current = self._apply_billing_rules(totals)
+        simulated = self._apply_billing_rules(totals.assign(**proposed))
+        
+        # Nos meses fechados o valor atual é o que foi faturado, não um recálculo
+        billed = totals['billed_value'].to_numpy(dtype=float)
+        current_value = np.where(np.isnan(billed), current['total_value'].to_numpy(dtype=float), billed)
+        
+        frame = pd.DataFrame({
+            'client_name': totals['client_name'].to_numpy(),
+            'client_id': totals['client_id'].to_numpy(),
+            'total_hours': current['total_hours'].to_numpy(),
+            'overtime_hours': current['overtime_hours'].to_numpy(),
+            'simulated_overtime_hours': simulated['overtime_hours'].to_numpy(),
+            'current_value': np.round(current_value, 2),
+            'simulated_value': simulated['total_value'].round(2).to_numpy()
+        })
+        by_client = frame.groupby('client_name', sort=True).agg(
+            client_id=('client_id', 'first'),
+            months=('client_name', 'size'),
+            total_hours=('total_hours', 'sum'),
+            overtime_hours=('overtime_hours', 'sum'),
+            simulated_overtime_hours=('simulated_overtime_hours', 'sum'),
+            current_value=('current_value', 'sum'),
+            simulated_value=('simulated_value', 'sum')
+        )
+        
+        def difference_pct(current_value, simulated_value):
+            return round((simulated_value - current_value) / current_value * 100, 2) if current_value else None
+        
+        clients = []
+        for client_name, row in by_client.iterrows():
+            current_value = round(float(row.current_value), 2)
+            simulated_value = round(float(row.simulated_value), 2)
+            clients.append({
+                'client_name': client_name,
+                'client_id': int(row.client_id) if pd.notna(row.client_id) else None,
+                'months': int(row.months),
+                'total_hours': round(float(row.total_hours), 2),
+                'overtime_hours': round(float(row.overtime_hours), 2),
+                'simulated_overtime_hours': round(float(row.simulated_overtime_hours), 2),
+                'current_value': current_value,
+                'simulated_value': simulated_value,
+                'difference': round(simulated_value - current_value, 2),
+                'difference_pct': difference_pct(current_value, simulated_value)
+            })
+        
+        current_total = round(float(frame['current_value'].sum()), 2)
+        simulated_total = round(float(frame['simulated_value'].sum()), 2)
+        unknown = sorted(set(overrides) - set(names))
+        return {
+            'clients': clients,
+            'closed_months': [{'year': year, 'month': month} for year, month in sorted(closed)],
+            'summary': {
+                'total_clients': len(clients),
+                'current_value': current_total,
+                'simulated_value': simulated_total,
+                'difference': round(simulated_total - current_total, 2),
+                'difference_pct': difference_pct(current_total, simulated_total)
+            },
+            'parameters': {
+                'multipliers': multipliers,
+                'overrides': overrides,
+                'unknown_clients': unknown
+            }
+        }
+    
+    def _load_snapshot_totals(self, first: int, last: int) -> Tuple[set, pd.DataFrame]:
+        """
+        Meses fechados do intervalo ({(ano, mês)}) e as faturas congeladas deles,
+        nas colunas de _load_billing_totals mais o valor faturado (billed_value)
+        """
+        closed = {
+            (period.year, period.month) for period in
+            ClosedPeriod.query.filter((ClosedPeriod.year * 12 + (ClosedPeriod.month - 1)).between(first, last))
+        }
+        snapshots = InvoiceSnapshot.query.filter(
+            (InvoiceSnapshot.year * 12 + (InvoiceSnapshot.month - 1)).between(first, last)
+        ).order_by(InvoiceSnapshot.year, InvoiceSnapshot.month, InvoiceSnapshot.client_name).all() if closed else []
+        
+        columns = [
+            'year', 'month', 'client_name', 'total_hours', 'external_services', 'tickets_count', 'client_id', 'active',
+            'contract_hours', 'hourly_rate', 'overtime_rate', 'external_service_rate', 'billed_value'
+        ]
+        frame = pd.DataFrame([
+            (snapshot.year, snapshot.month, snapshot.client_name, snapshot.total_hours, snapshot.external_services,
+             snapshot.tickets_count, snapshot.client_id, True, snapshot.contract_hours, snapshot.hourly_rate,
+             snapshot.overtime_rate, snapshot.external_service_rate, snapshot.total_value)
+            for snapshot in snapshots if (snapshot.year, snapshot.month) in closed
+        ], columns=columns)
+        return closed, frame
+    
+    def _validate_simulation_values(self, values: Dict[str, Any]) -> Dict[str, float]:
+        """Valida um dicionário {campo: valor} da simulação"""
+        if not isinstance(values, dict):
+            raise ValueError('Esperado um objeto {campo: valor}')
+        validated = {}
+        for field, value in values.items():
+            if field not in self.SIMULATION_FIELDS:
+                raise ValueError(f'Campo desconhecido na simulação: {field}')
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f'Valor inválido para {field}: {value}')
+            validated[field] = float(value)
+        return validated
+    
+    def _load_active_billing_totals(self, period_filter: Tuple, label: str) -> pd.DataFrame:
+        """
+        Totais por cliente e período com as regras de cobrança, sem clientes inativos.
+        Clientes sem cadastro são criados com os valores padrão antes da cobrança.
+        """
+        totals = self._load_billing_totals(period_filter)
+        if totals.empty:
+            return totals
+        
+        # Nomes sem cadastro, do que aparece em mais tickets para o que aparece em menos
+        missing = totals[totals['client_id'].isna()].groupby('client_name')['tickets_count'].sum()
+        if not missing.empty:
+            self._create_default_clients(missing.sort_values(ascending=False, kind='stable').index.tolist())
+            totals = self._load_billing_totals(period_filter)
+        
+        inactive = totals['active'].notna() & ~totals['active'].astype(bool)
+        if inactive.any():
+            logger.info(f"{int(inactive.sum())} clientes inativos ignorados no faturamento de {label}")
+            totals = totals[~inactive]
+        return totals
+    
+    def _load_billing_totals(self, period_filter: Tuple) -> pd.DataFrame:
+        """
+        Totais por cliente e período, com as regras de cobrança do cadastro (uma consulta).
+        
+        Os resumos são por nome escrito nos tickets; variações ligadas ao mesmo
+        cadastro (client_id) são somadas numa única linha com o nome do cadastro,
+        para que a franquia de horas contratuais seja aplicada uma vez só. Nomes
+        sem cadastro continuam uma linha por nome.
+        """
+        query = db.session.query(
+            PeriodClientRollup.year.label('year'),
+            PeriodClientRollup.month.label('month'),
+            db.func.coalesce(Client.name, PeriodClientRollup.client_name).label('client_name'),
+            PeriodClientRollup.total_hours.label('total_hours'),
+            PeriodClientRollup.external_services.label('external_services'),
+            PeriodClientRollup.ticket_count.label('tickets_count'),
+            Client.id.label('client_id'),
+            Client.active.label('active'),
+            Client.contract_hours.label('contract_hours'),
+            Client.hourly_rate.label('hourly_rate'),
+            Client.overtime_rate.label('overtime_rate'),
+            Client.external_service_rate.label('external_service_rate')
+        ).outerjoin(
+            Client, Client.id == PeriodClientRollup.client_id
+        ).filter(
+            *period_filter
+        ).order_by(
+            PeriodClientRollup.year,
+            PeriodClientRollup.month,
+            PeriodClientRollup.client_name
+        )
+        
+        totals = pd.DataFrame(query.all(), columns=[
+            'year', 'month', 'client_name', 'total_hours', 'external_services', 'tickets_count', 'client_id', 'active',
+            'contract_hours', 'hourly_rate', 'overtime_rate', 'external_service_rate'
+        ])
+        names = totals['client_name']
+        totals = totals[names.notna() & (names.fillna('').str.strip() != '')].reset_index(drop=True)
+        
+        period_client = ['year', 'month', 'client_name']
+        if not totals.duplicated(period_client).any():
+            return totals
+        summed = {field: 'sum' for field in ('total_hours', 'external_services', 'tickets_count')}
+        kept = {field: 'first' for field in totals.columns if field not in summed and field not in period_client}
+        return totals.groupby(period_client, sort=True, as_index=False).agg({**summed, **kept})[totals.columns]
+    
+    @staticmethod
+    def _apply_billing_rules(totals: pd.DataFrame) -> pd.DataFrame:
+        """Acrescenta horas usadas/excedentes e valores de cada linha, calculados de forma vetorizada"""
+        total_hours = totals['total_hours'].to_numpy(dtype=float)
+        contract_hours = totals['contract_hours'].to_numpy(dtype=float)
+        used_contract_hours = np.minimum(total_hours, contract_hours)
+        overtime_hours = np.maximum(0.0, total_hours - contract_hours)
+        contract_value = used_contract_hours * totals['hourly_rate'].to_numpy(dtype=float)
+        overtime_value = overtime_hours * totals['overtime_rate'].to_numpy(dtype=float)
+        external_services_value = totals['external_services'].to_numpy(dtype=float) * totals['external_service_rate'].to_numpy(dtype=float)
+        
+        return totals.assign(
+            total_hours=total_hours,
+            used_contract_hours=used_contract_hours,
+            overtime_hours=overtime_hours,
+            contract_value=contract_value,
+            overtime_value=overtime_value,
+            external_services_value=external_services_value,
+            total_value=contract_value + overtime_value + external_services_value
+        )
+    
+    @staticmethod
+    def _billing_entry(row) -> Dict[str, Any]:
+        """Faturamento de um cliente num período, no formato de calculate_client_billing"""
+        return {
+            'client_name': row.client_name,
+            'client_id': int(row.client_id),
+            'total_hours': round(float(row.total_hours), 2),
+            'contract_hours': row.contract_hours,
+            'used_contract_hours': round(float(row.used_contract_hours), 2),
+            'overtime_hours': round(float(row.overtime_hours), 2),
+            'external_services': int(row.external_services),
+            'contract_value': round(float(row.contract_value), 2),
+            'overtime_value': round(float(row.overtime_value), 2),
+            'external_services_value': round(float(row.external_services_value), 2),
+            'total_value': round(float(row.total_value), 2),
+            'rates': {
+                'hourly_rate': row.hourly_rate,
+                'overtime_rate': row.overtime_rate,
+                'external_service_rate': row.external_service_rate
+            },
+            'tickets_count': int(row.tickets_count)
+        }
+    
+    def _create_default_clients(self, client_names: List[str]):
+        """
+        Cria em lote, com os valores padrão, clientes presentes nos tickets mas sem
+        cadastro. Variações de um mesmo nome normalizado viram um único cliente,
+        com a primeira grafia da lista (a mais frequente) sem espaços nas pontas,
+        e link_clients liga todas elas a ele.
+        """
+        names_by_normalized = {}
+        for name in client_names:
+            names_by_normalized.setdefault(normalize_name(name), name.strip())
+        logger.warning(f"{len(names_by_normalized)} clientes não encontrados, criando com valores padrão")
+        db.session.execute(
+            sqlite_insert(Client.__table__).on_conflict_do_nothing(index_elements=['name']),
+            [
+                {'name': name, 'normalized_name': normalized_name, **self.DEFAULT_CLIENT_RULES, 'active': True}
+                for normalized_name, name in names_by_normalized.items()
+            ]
+        )
+        rollup_service.link_clients(client_names)
+        db.session.commit()
+    
+    def _load_tickets_by_client(self, month: int, year: int) -> Dict[str, List[Dict]]:
+        """
+        Tickets do período agrupados por cliente, carregados numa única consulta.
+        Tickets ligados a um cadastro ficam sob o nome dele, como em _load_billing_totals.
+        """
+        tickets_by_client = {}
+        rows = db.session.query(TicketData, db.func.coalesce(Client.name, TicketData.client_name)).outerjoin(
+            Client, Client.id == TicketData.client_id
+        ).filter(
+            TicketData.processing_month == month,
+            TicketData.processing_year == year
+        ).order_by(TicketData.id).all()
+        for ticket, client_name in rows:
+            tickets_by_client.setdefault(client_name, []).append(ticket.to_dict())
+        return tickets_by_client
@@ -0,0 +1,117 @@
+"""
+Fechamento de períodos de faturamento.
+
+Fechar um período grava, para cada cliente faturado, uma fatura congelada em
+invoice_snapshots: totais, regras de cobrança vigentes e os tickets cobrados.
+A partir daí o BillingCalculator (e, por ele, os endpoints de faturamento e os
+PDFs) serve o período a partir dessas linhas, sem recalcular nada, de modo que
+alterações posteriores de tarifas ou de tickets não mudam faturas emitidas.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from src.database import db
+from src.models.client import Client, TicketData
+from src.models.invoice_snapshot import ClosedPeriod, InvoiceSnapshot
+from src.services.billing_cache import billing_cache
+from src.services.data_processor import BillingCalculator
+
+logger = logging.getLogger(__name__)
+
+class InvoiceSnapshotService:
+    """Fechamento de períodos e leitura das faturas congeladas"""
+    
+    def close_period(self, month: int, year: int, notes: str = None) -> Optional[ClosedPeriod]:
+        """
+        Congela o faturamento do período.
+
+        Returns:
+            O ClosedPeriod criado, ou None se o período não tem faturamento
+
+        Raises:
+            ValueError: Período já fechado
+        """
+        if ClosedPeriod.is_closed(month, year):
+            raise ValueError(f'Período {month:02d}/{year} já está fechado')
+        
+        billing_data = BillingCalculator().calculate_all_clients_billing(month, year)
+        if not billing_data:
+            return None
+        
+        tickets_by_client = self._load_ticket_references(month, year)
+        now = datetime.utcnow()
+        snapshots = [
+            {
+                'year': year,
+                'month': month,
+                'client_id': billing['client_id'],
+                'client_name': billing['client_name'],
+                'total_hours': billing['total_hours'],
+                'contract_hours': billing['contract_hours'],
+                'used_contract_hours': billing['used_contract_hours'],
+                'overtime_hours': billing['overtime_hours'],
+                'external_services': billing['external_services'],
+                'contract_value': billing['contract_value'],
+                'overtime_value': billing['overtime_value'],
+                'external_services_value': billing['external_services_value'],
+                'total_value': billing['total_value'],
+                'hourly_rate': billing['rates']['hourly_rate'],
+                'overtime_rate': billing['rates']['overtime_rate'],
+                'external_service_rate': billing['rates']['external_service_rate'],
+                'tickets_count': billing['tickets_count'],
+                'tickets': json.dumps(tickets_by_client.get(billing['client_name'], []), default=str),
+                'closed_at': now
+            }
+            for billing in billing_data
+        ]
+        
+        closed = ClosedPeriod(
+            year=year,
+            month=month,
+            clients_count=len(snapshots),
+            total_value=round(sum(snapshot['total_value'] for snapshot in snapshots), 2),
+            notes=notes,
+            closed_at=now
+        )
+        try:
+            db.session.execute(InvoiceSnapshot.__table__.insert(), snapshots)
+            db.session.add(closed)
+            billing_cache.bump_period(month, year)
+            db.session.commit()
+        except IntegrityError:
+            # Outro processo fechou o período ao mesmo tempo
+            db.session.rollback()
+            raise ValueError(f'Período {month:02d}/{year} já está fechado')
+        
+        logger.info(f"Período {month:02d}/{year} fechado com {len(snapshots)} faturas")
+        return closed
+    
+    def get_snapshots(self, month: int, year: int) -> List[InvoiceSnapshot]:
+        return InvoiceSnapshot.query.filter_by(year=year, month=month).order_by(InvoiceSnapshot.client_name).all()
+    
+    def _load_ticket_references(self, month: int, year: int) -> Dict[str, List[Dict]]:
+        """
+        Campos de fatura dos tickets do período, agrupados por cliente (uma consulta),
+        sob o nome do cadastro quando o ticket está ligado a um, como no faturamento
+        """
+        columns = [getattr(TicketData, field) for field in InvoiceSnapshot.SNAPSHOT_TICKET_FIELDS]
+        rows = db.session.query(db.func.coalesce(Client.name, TicketData.client_name), *columns).outerjoin(
+            Client, Client.id == TicketData.client_id
+        ).filter(
+            TicketData.processing_month == month,
+            TicketData.processing_year == year
+        ).order_by(TicketData.id).all()
+        
+        tickets_by_client = {}
+        for client_name, *values in rows:
+            ticket = dict(zip(InvoiceSnapshot.SNAPSHOT_TICKET_FIELDS, values))
+            if ticket['completion_date']:
+                ticket['completion_date'] = ticket['completion_date'].isoformat()
+            tickets_by_client.setdefault(client_name, []).append(ticket)
+        return tickets_by_client
+
+invoice_snapshot_service = InvoiceSnapshotService()
@@ -0,0 +1,191 @@
+"""
+Formatos de resposta negociados para listas grandes (tickets e faturamento).
+
+Além do JSON padrão (lista de objetos), os endpoints podem responder em:
+
+    ndjson    um objeto por linha, em streaming (application/x-ndjson)
+    columnar  JSON colunar: um array por coluna, sem repetir os nomes dos campos
+              em cada linha; colunas de texto repetitivas vêm codificadas por
+              dicionário (application/vnd.helpdesk.columnar+json)
+    arrow     stream IPC do Apache Arrow (application/vnd.apache.arrow.stream),
+              disponível quando o pyarrow está instalado
+
+O formato vem de ?format= (ou ?stream=1 para ndjson) ou do cabeçalho Accept.
+
+Layout do JSON colunar:
+
+    {"format": "columnar", "length": 3,
+     "columns": ["ticket_id", "client_name"],
+     "data": {"ticket_id": ["1", "2", "3"], "client_name": [0, 1, 0]},
+     "dictionaries": {"client_name": ["Cliente A", "Cliente B"]},
+     ...metadados do endpoint}
+
+Uma coluna presente em "dictionaries" traz em "data" o índice de cada valor no
+dicionário (null para valores nulos).
+"""
+import importlib.util
+import io
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from flask import Response, current_app, request, stream_with_context
+
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+COLUMNAR_MIMETYPE = 'application/vnd.helpdesk.columnar+json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+FORMAT_MIMETYPES = {
+    'json': JSON_MIMETYPE,
+    'ndjson': NDJSON_MIMETYPE,
+    'columnar': COLUMNAR_MIMETYPE,
+    'arrow': ARROW_MIMETYPE
+}
+
+# Linhas lidas do banco e enviadas por vez nas respostas NDJSON
+STREAM_CHUNK_ROWS = 1000
+
+class FormatUnavailableError(Exception):
+    """Formato pedido explicitamente mas não disponível nesta instalação"""
+
+def arrow_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+def negotiate_format(supported: Sequence[str] = ('json', 'columnar', 'arrow')) -> str:
+    """
+    Formato da resposta entre os suportados pelo endpoint ('json' por padrão).
+
+    Raises:
+        ValueError: ?format= com formato não suportado pelo endpoint
+        FormatUnavailableError: ?format=arrow sem pyarrow instalado
+    """
+    requested = request.args.get('format', '').lower()
+    if not requested and 'ndjson' in supported and request.args.get('stream', '').lower() in ('1', 'true'):
+        requested = 'ndjson'
+    
+    if requested:
+        if requested not in supported:
+            raise ValueError(f'Formato não suportado: {requested} (use {", ".join(supported)})')
+        if requested == 'arrow' and not arrow_available():
+            raise FormatUnavailableError('Formato arrow indisponível: pyarrow não está instalado')
+        return requested
+    
+    # Pelo Accept, o JSON vem primeiro para que */* continue recebendo JSON
+    offered = sorted(
+        (name for name in supported if name != 'arrow' or arrow_available()),
+        key=lambda name: name != 'json'
+    )
+    best = request.accept_mimetypes.best_match([FORMAT_MIMETYPES[name] for name in offered], default=JSON_MIMETYPE)
+    return next(name for name in offered if FORMAT_MIMETYPES[name] == best)
+
+def rows_to_columns(rows: Sequence[Sequence[Any]], names: Sequence[str]) -> List[List[Any]]:
+    """Transpõe as linhas de uma consulta SQL em uma lista por coluna"""
+    if not rows:
+        return [[] for _ in names]
+    return [list(column) for column in zip(*rows)]
+
+def entries_to_columns(entries: Iterable[Dict[str, Any]], names: Sequence[str]) -> List[List[Any]]:
+    """Colunas a partir de uma lista de dicts (campos ausentes viram None)"""
+    return rows_to_columns([tuple(entry.get(name) for name in names) for entry in entries], names)
+
+def ndjson_response(query) -> Response:
+    """
+    Resposta NDJSON (um objeto to_dict() por linha) lendo a consulta ORM em
+    blocos com yield_per: cada bloco é serializado e enviado antes do próximo
+    ser lido, então a memória não cresce com o número de linhas
+    """
+    def generate():
+        lines = []
+        for record in query.yield_per(STREAM_CHUNK_ROWS):
+            lines.append(current_app.json.dumps(record.to_dict()))
+            if len(lines) >= STREAM_CHUNK_ROWS:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def columnar_response(names: Sequence[str], columns: Sequence[List[Any]], **metadata) -> Response:
+    """JSON colunar (layout no docstring do módulo); metadata vai no nível de cima do objeto"""
+    data = {}
+    dictionaries = {}
+    for name, values in zip(names, columns):
+        values = _isoformat_dates(values)
+        dictionary = _dictionary_encode(values)
+        if dictionary is None:
+            data[name] = values
+        else:
+            dictionaries[name], data[name] = dictionary
+    
+    payload = {
+        'format': 'columnar',
+        'length': len(columns[0]) if columns else 0,
+        'columns': list(names),
+        'data': data,
+        'dictionaries': dictionaries,
+        **metadata
+    }
+    return Response(current_app.json.dumps(payload), mimetype=COLUMNAR_MIMETYPE)
+
+def arrow_response(names: Sequence[str], columns: Sequence[List[Any]], headers: Optional[Dict[str, str]] = None,
+                   **metadata) -> Response:
+    """
+    Stream IPC do Arrow com uma tabela das colunas; colunas de texto repetitivas
+    viram dictionary arrays. metadata vai, em JSON, nos metadados do schema.
+    """
+    import pyarrow as pa
+    
+    arrays = []
+    for values in columns:
+        array = pa.array(values)
+        if pa.types.is_string(array.type) and _dictionary_encode(values) is not None:
+            array = array.dictionary_encode()
+        arrays.append(array)
+    
+    table = pa.Table.from_arrays(arrays, names=list(names))
+    if metadata:
+        table = table.replace_schema_metadata({
+            key: json.dumps(value, default=str) for key, value in metadata.items()
+        })
+    
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue(), mimetype=ARROW_MIMETYPE, headers=headers)
+
+def table_response(fmt: str, names: Sequence[str], columns: Sequence[List[Any]],
+                   headers: Optional[Dict[str, str]] = None, **metadata) -> Response:
+    """Resposta 'columnar' ou 'arrow' das colunas, conforme o formato negociado"""
+    if fmt == 'arrow':
+        return arrow_response(names, columns, headers=headers, **metadata)
+    response = columnar_response(names, columns, **metadata)
+    response.headers.extend(headers or {})
+    return response
+
+def _isoformat_dates(values: List[Any]) -> List[Any]:
+    if not any(isinstance(value, (date, datetime)) for value in values):
+        return values
+    return [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+
+def _dictionary_encode(values: List[Any]):
+    """
+    (dicionário, códigos) se a coluna é de texto e os valores distintos são no
+    máximo metade das linhas; senão None
+    """
+    codes_by_value = {}
+    codes = []
+    for value in values:
+        if value is None:
+            codes.append(None)
+            continue
+        if not isinstance(value, str):
+            return None
+        code = codes_by_value.setdefault(value, len(codes_by_value))
+        if len(codes_by_value) * 2 > len(values):
+            return None
+        codes.append(code)
+    if not codes_by_value:
+        return None
+    return list(codes_by_value), codes
@@ -0,0 +1,254 @@
+"""
+Tabelas de resumo (rollups) de ticket_data por período.
+
+period_client_rollups e period_technician_rollups guardam horas, tickets,
+atendimentos externos e contagem de categorias por (ano, mês, cliente) e por
+(ano, mês, técnico); period_hourly_rollups guarda tickets e horas por data e
+hora de atendimento, para os heatmaps anuais e de dia da semana. Toda escrita em
+ticket_data (ingestão, exclusão de período ou de lote) recalcula os resumos dos
+períodos afetados na mesma transação, e os endpoints de agregação leem essas
+tabelas pequenas em vez de varrer os tickets.
+"""
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.database import db
+from src.models.client import Client, TicketData, normalize_name
+from src.models.rollup import PeriodClientRollup, PeriodHourlyRollup, PeriodTechnicianRollup
+from src.models.technician import Technician
+
+logger = logging.getLogger(__name__)
+
+# Data de referência do ticket nos heatmaps: chegada, senão início, senão criação
+TICKET_DATE = db.func.coalesce(TicketData.arrival_date, TicketData.start_date, TicketData.created_at)
+
+class RollupService:
+    """Manutenção dos resumos por período"""
+    
+    LINK_CHUNK_SIZE = 500  # Nomes por UPDATE ao reapontar ids (limite de variáveis do SQLite)
+    
+    def refresh_period(self, month: Optional[int], year: Optional[int]):
+        """
+        Recalcula os resumos do período a partir de ticket_data (sem commit).
+
+        Cada período é agregado com um GROUP BY percorrendo os índices
+        (ano, mês, cliente) e (ano, mês, técnico), então as somas de horas
+        seguem a ordem de inserção, como no cálculo feito sobre os tickets.
+        """
+        if month is None or year is None:
+            return
+        
+        for model in (PeriodClientRollup, PeriodTechnicianRollup, PeriodHourlyRollup):
+            table = model.__table__
+            db.session.execute(table.delete().where(table.c.year == year, table.c.month == month))
+        
+        now = datetime.utcnow()
+        client_records = self._aggregate(TicketData.client_name, TicketData.client_id, month, year, now)
+        technician_records = self._aggregate(
+            TicketData.technician, TicketData.technician_id, month, year, now, count_clients=True
+        )
+        
+        if client_records:
+            db.session.execute(PeriodClientRollup.__table__.insert(), [
+                {'client_name': record.pop('key'), 'client_id': record.pop('key_id'), **record}
+                for record in client_records
+            ])
+        if technician_records:
+            db.session.execute(PeriodTechnicianRollup.__table__.insert(), [
+                {'technician': record.pop('key'), 'technician_id': record.pop('key_id'), **record}
+                for record in technician_records
+            ])
+        
+        hourly_records = self._aggregate_hourly(month, year, now)
+        if hourly_records:
+            db.session.execute(PeriodHourlyRollup.__table__.insert(), hourly_records)
+    
+    def refresh_periods(self, periods: Iterable[Tuple[int, int]]):
+        """Recalcula os resumos de vários períodos (month, year)"""
+        for month, year in set(periods):
+            self.refresh_period(month, year)
+    
+    def rebuild_all(self) -> Dict[str, int]:
+        """Descarta e recalcula os resumos de todos os períodos, com commit ao final"""
+        for model in (PeriodClientRollup, PeriodTechnicianRollup, PeriodHourlyRollup):
+            db.session.execute(model.__table__.delete())
+        
+        periods = db.session.query(
+            TicketData.processing_month, TicketData.processing_year
+        ).filter(
+            TicketData.processing_month.isnot(None),
+            TicketData.processing_year.isnot(None)
+        ).distinct().all()
+        
+        for month, year in periods:
+            self.refresh_period(month, year)
+        db.session.commit()
+        
+        summary = {
+            'periods': len(periods),
+            'client_rows': db.session.query(PeriodClientRollup).count(),
+            'technician_rows': db.session.query(PeriodTechnicianRollup).count(),
+            'hourly_rows': db.session.query(PeriodHourlyRollup).count()
+        }
+        logger.info(f"Resumos por período reconstruídos: {summary}")
+        return summary
+    
+    def ensure_built(self):
+        """Reconstrói os resumos se alguma das tabelas está vazia mas já existem tickets (bancos anteriores a ela)"""
+        if all(
+            db.session.query(model.year).first() is not None
+            for model in (PeriodClientRollup, PeriodHourlyRollup)
+        ):
+            return
+        if db.session.query(TicketData.id).filter(TicketData.processing_year.isnot(None)).first() is None:
+            return
+        logger.info("Resumos por período ausentes; reconstruindo a partir de ticket_data")
+        self.rebuild_all()
+    
+    def link_clients(self, names: Iterable[str]):
+        """
+        Reaponta client_id dos tickets e resumos desses nomes, e de suas variações
+        de acento, caixa e espaços, para o cadastro atual (sem commit). Usado
+        quando clientes são criados ou renomeados depois da ingestão.
+        
+        Os tickets são ligados por client_name_normalized = clients.normalized_name,
+        preferindo o cliente com o nome exato; nomes sem cadastro ficam com
+        client_id nulo. Os resumos recebem o client_id dos tickets do período,
+        como em refresh_period.
+        """
+        tickets = TicketData.__table__
+        rollups = PeriodClientRollup.__table__
+        normalized = sorted({normalize_name(name) for name in names} - {None})
+        for start in range(0, len(normalized), self.LINK_CHUNK_SIZE):
+            chunk = normalized[start:start + self.LINK_CHUNK_SIZE]
+            registered_id = db.func.coalesce(
+                db.select(Client.id).where(Client.name == tickets.c.client_name).scalar_subquery(),
+                db.select(db.func.min(Client.id)).where(
+                    Client.normalized_name == tickets.c.client_name_normalized
+                ).scalar_subquery()
+            )
+            db.session.execute(
+                tickets.update().where(tickets.c.client_name_normalized.in_(chunk)).values(client_id=registered_id)
+            )
+            
+            linked_id = db.select(db.func.max(tickets.c.client_id)).where(
+                tickets.c.processing_year == rollups.c.year,
+                tickets.c.processing_month == rollups.c.month,
+                tickets.c.client_name == rollups.c.client_name
+            ).scalar_subquery()
+            variants = db.select(tickets.c.client_name).where(tickets.c.client_name_normalized.in_(chunk))
+            db.session.execute(
+                rollups.update().where(rollups.c.client_name.in_(variants)).values(client_id=linked_id)
+            )
+    
+    def link_technicians(self, names: Iterable[str]):
+        """Reaponta technician_id dos tickets e resumos com esses nomes (sem commit)"""
+        self._link_names(names, Technician, (
+            (TicketData.__table__, 'technician', 'technician_id'),
+            (PeriodTechnicianRollup.__table__, 'technician', 'technician_id')
+        ))
+    
+    def has_period(self, month: int, year: int) -> bool:
+        """Indica se o período tem resumos (todo período com tickets tem ao menos um cliente)"""
+        return db.session.query(PeriodClientRollup.year).filter_by(year=year, month=month).first() is not None
+    
+    def _aggregate(self, key, key_id, month: int, year: int, now: datetime, count_clients: bool = False) -> List[Dict[str, Any]]:
+        """
+        Totais e categorias do período agrupados pela coluna key (nomes nulos
+        ficam de fora), junto com o id cadastrado correspondente (key_id)
+        """
+        columns = [
+            key.label('key'),
+            db.func.max(key_id).label('key_id'),
+            db.func.sum(db.func.coalesce(TicketData.total_service_time, 0.0)).label('total_hours'),
+            db.func.count(TicketData.id).label('ticket_count'),
+            db.func.sum(db.case((TicketData.external_service == True, 1), else_=0)).label('external_services')
+        ]
+        if count_clients:
+            columns.append(db.func.count(db.distinct(TicketData.client_name)).label('unique_clients'))
+        
+        rows = db.session.query(*columns).filter(
+            TicketData.processing_year == year,
+            TicketData.processing_month == month,
+            key.isnot(None)
+        ).group_by(key).all()
+        
+        primary = self._count_categories(key, TicketData.primary_category, month, year)
+        secondary = self._count_categories(key, TicketData.secondary_category, month, year)
+        
+        records = []
+        for row in rows:
+            record = {
+                'year': year,
+                'month': month,
+                'key': row.key,
+                'key_id': row.key_id,
+                'total_hours': row.total_hours or 0.0,
+                'ticket_count': row.ticket_count,
+                'external_services': int(row.external_services or 0),
+                'primary_categories': json.dumps(primary.get(row.key, {}), ensure_ascii=False),
+                'secondary_categories': json.dumps(secondary.get(row.key, {}), ensure_ascii=False),
+                'updated_at': now
+            }
+            if count_clients:
+                record['unique_clients'] = row.unique_clients
+            records.append(record)
+        return records
+    
+    def _link_names(self, names: Iterable[str], model, targets: Tuple):
+        names = sorted({name for name in names if name is not None})
+        for start in range(0, len(names), self.LINK_CHUNK_SIZE):
+            chunk = names[start:start + self.LINK_CHUNK_SIZE]
+            for table, name_column, id_column in targets:
+                registered_id = db.select(model.id).where(
+                    model.name == table.c[name_column]
+                ).scalar_subquery()
+                db.session.execute(
+                    table.update().where(table.c[name_column].in_(chunk)).values({id_column: registered_id})
+                )
+    
+    def _aggregate_hourly(self, month: int, year: int, now: datetime) -> List[Dict[str, Any]]:
+        """Tickets e horas do período por (data, hora) de referência; tickets sem data ficam de fora"""
+        ticket_day = db.func.date(TICKET_DATE)
+        ticket_hour = db.cast(db.func.strftime('%H', TICKET_DATE), db.Integer)
+        rows = db.session.query(
+            ticket_day,
+            ticket_hour,
+            db.func.count(TicketData.id),
+            db.func.sum(db.func.coalesce(TicketData.total_service_time, 0.0))
+        ).filter(
+            TicketData.processing_year == year,
+            TicketData.processing_month == month,
+            TICKET_DATE.isnot(None)
+        ).group_by(ticket_day, ticket_hour).all()
+        
+        return [
+            {
+                'year': year,
+                'month': month,
+                'date': date.fromisoformat(day),
+                'hour': hour,
+                'ticket_count': count,
+                'total_hours': hours or 0.0,
+                'updated_at': now
+            }
+            for day, hour, count, hours in rows
+        ]
+    
+    def _count_categories(self, key, category, month: int, year: int) -> Dict[str, Dict[str, int]]:
+        """Quantidade de tickets por categoria para cada valor de key: {key: {categoria: n}}"""
+        rows = db.session.query(key, category, db.func.count(TicketData.id)).filter(
+            TicketData.processing_year == year,
+            TicketData.processing_month == month,
+            key.isnot(None),
+            category.isnot(None)
+        ).group_by(key, category).all()
+        
+        counts = {}
+        for name, value, count in rows:
+            counts.setdefault(name, {})[value] = count
+        return counts
+
+rollup_service = RollupService()
@@ -0,0 +1,203 @@
+"""
+Consulta paginada de tickets com filtros e ordenação no servidor.
+
+A paginação é por cursor (keyset): o cursor guarda o valor da coluna de
+ordenação e o id do último ticket da página, e a página seguinte começa logo
+depois dele com um WHERE sobre o índice, sem OFFSET. Só as colunas pedidas são
+selecionadas e nunca mais que limit + 1 linhas são lidas por página.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.database import db
+from src.models.client import TicketData, normalize_name
+
+class TicketQueryService:
+    """Filtros, ordenação e cursor de /tickets/query"""
+    
+    # Colunas internas de ticket_data que não são expostas
+    HIDDEN_FIELDS = ('row_hash', 'client_name_normalized')
+    # Colunas com índice (junto com id, que desempata a ordenação)
+    SORTABLE_FIELDS = ('id', 'completion_date', 'arrival_date')
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 1000
+    
+    def __init__(self):
+        self.fields = tuple(
+            name for name in TicketData.__table__.columns.keys() if name not in self.HIDDEN_FIELDS
+        )
+    
+    def query(self, filters: Dict[str, Any], fields: Optional[Iterable[str]] = None, sort: str = 'id',
+              order: str = 'asc', limit: int = None, cursor: str = None) -> Dict[str, Any]:
+        """
+        Uma página de tickets.
+
+        Args:
+            filters: Filtros já convertidos (ver build_filters)
+            fields: Colunas retornadas em cada ticket (todas se vazio)
+            sort: Coluna de ordenação, uma de SORTABLE_FIELDS
+            order: 'asc' ou 'desc'
+            limit: Tamanho da página (até MAX_LIMIT)
+            cursor: next_cursor da página anterior
+
+        Returns:
+            Dict com tickets, count, limit, sort, order e next_cursor (None na última página)
+
+        Raises:
+            ValueError: Campo, ordenação, limite ou cursor inválido
+        """
+        fields, rows, page = self.fetch_page(filters, fields, sort, order, limit, cursor)
+        return {
+            'tickets': [self.serialize_row(row, fields) for row in rows],
+            'count': len(rows),
+            **page
+        }
+    
+    def fetch_page(self, filters: Dict[str, Any], fields: Optional[Iterable[str]] = None, sort: str = 'id',
+                   order: str = 'asc', limit: int = None, cursor: str = None) -> Tuple[List[str], List, Dict[str, Any]]:
+        """
+        Linhas SQL de uma página, sem serializar (usado pelos formatos colunares).
+
+        Returns:
+            (campos validados, linhas com os campos nessa ordem no início,
+             {limit, sort, order, next_cursor})
+        """
+        fields = self.validate_fields(fields)
+        if sort not in self.SORTABLE_FIELDS:
+            raise ValueError(f'Ordenação inválida: {sort} (use {", ".join(self.SORTABLE_FIELDS)})')
+        if order not in ('asc', 'desc'):
+            raise ValueError(f'Direção inválida: {order} (use asc ou desc)')
+        limit = self.validate_limit(limit)
+        
+        rows = self.build_query(filters, fields, sort, order, cursor).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = self.encode_cursor(sort, order, getattr(last, f'_sort_{sort}'), last._sort_id)
+        
+        return fields, rows, {'limit': limit, 'sort': sort, 'order': order, 'next_cursor': next_cursor}
+    
+    def build_query(self, filters: Dict[str, Any], fields: List[str], sort: str, order: str, cursor: str = None):
+        """Consulta ordenada, filtrada e posicionada depois do cursor (sem limite)"""
+        sort_column = getattr(TicketData, sort)
+        columns = [getattr(TicketData, field) for field in fields]
+        # Valores usados no cursor, mesmo quando a coluna não foi pedida
+        columns += [sort_column.label(f'_sort_{sort}'), TicketData.id.label('_sort_id')]
+        
+        query = db.session.query(*columns).filter(*self.build_filters(filters))
+        if cursor:
+            query = query.filter(self._after_cursor(sort_column, sort, order, cursor))
+        
+        if order == 'asc':
+            return query.order_by(sort_column.asc(), TicketData.id.asc())
+        return query.order_by(sort_column.desc(), TicketData.id.desc())
+    
+    def build_filters(self, filters: Dict[str, Any]) -> List:
+        """
+        Condições SQL dos filtros: period_from/period_to ((mês, ano)), client
+        (comparado pelo nome normalizado), client_id, technician, technician_id,
+        category, secondary_category, status e external (bool)
+        """
+        conditions = []
+        period_from, period_to = filters.get('period_from'), filters.get('period_to')
+        if period_from or period_to:
+            # O intervalo de anos usa o índice de período; a chave ano*12+mês recorta os meses
+            period_key = TicketData.processing_year * 12 + TicketData.processing_month
+            if period_from:
+                month, year = period_from
+                conditions += [TicketData.processing_year >= year, period_key >= year * 12 + month]
+            if period_to:
+                month, year = period_to
+                conditions += [TicketData.processing_year <= year, period_key <= year * 12 + month]
+        
+        if filters.get('client'):
+            conditions.append(TicketData.client_name_normalized == normalize_name(filters['client']))
+        if filters.get('client_id') is not None:
+            conditions.append(TicketData.client_id == filters['client_id'])
+        if filters.get('technician'):
+            conditions.append(TicketData.technician == filters['technician'])
+        if filters.get('technician_id') is not None:
+            conditions.append(TicketData.technician_id == filters['technician_id'])
+        if filters.get('category'):
+            conditions.append(TicketData.primary_category == filters['category'])
+        if filters.get('secondary_category'):
+            conditions.append(TicketData.secondary_category == filters['secondary_category'])
+        if filters.get('status'):
+            conditions.append(TicketData.status == filters['status'])
+        if filters.get('external') is True:
+            conditions.append(TicketData.external_service == True)
+        elif filters.get('external') is False:
+            conditions.append(db.or_(TicketData.external_service == False, TicketData.external_service.is_(None)))
+        return conditions
+    
+    def validate_fields(self, fields: Optional[Iterable[str]]) -> List[str]:
+        fields = [field for field in (fields or []) if field] or list(self.fields)
+        invalid = [field for field in fields if field not in self.fields]
+        if invalid:
+            raise ValueError(f'Campos inválidos: {", ".join(invalid)}')
+        return list(dict.fromkeys(fields))
+    
+    def validate_limit(self, limit: Optional[int]) -> int:
+        if limit is None:
+            return self.DEFAULT_LIMIT
+        if not 1 <= limit <= self.MAX_LIMIT:
+            raise ValueError(f'limit deve estar entre 1 e {self.MAX_LIMIT}')
+        return limit
+    
+    def serialize_row(self, row, fields: List[str]) -> Dict[str, Any]:
+        ticket = {}
+        for field in fields:
+            value = getattr(row, field)
+            ticket[field] = value.isoformat() if isinstance(value, datetime) else value
+        return ticket
+    
+    def encode_cursor(self, sort: str, order: str, value: Any, ticket_id: int) -> str:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = json.dumps([sort, order, value, ticket_id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    
+    def decode_cursor(self, cursor: str) -> Tuple[str, str, Any, int]:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            sort, order, value, ticket_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if sort in ('completion_date', 'arrival_date') and value is not None:
+                value = datetime.fromisoformat(value)
+            return sort, order, value, int(ticket_id)
+        except (ValueError, TypeError):
+            raise ValueError('Cursor inválido')
+    
+    def _after_cursor(self, sort_column, sort: str, order: str, cursor: str):
+        """
+        Condição das linhas posteriores ao cursor na ordem (coluna, id). No SQLite
+        os nulos vêm antes em ordem crescente e depois em ordem decrescente.
+        """
+        cursor_sort, cursor_order, value, last_id = self.decode_cursor(cursor)
+        if (cursor_sort, cursor_order) != (sort, order):
+            raise ValueError('Cursor não corresponde à ordenação pedida')
+        
+        if sort == 'id':
+            return TicketData.id > last_id if order == 'asc' else TicketData.id < last_id
+        
+        if order == 'asc':
+            if value is None:
+                return db.or_(
+                    db.and_(sort_column.is_(None), TicketData.id > last_id),
+                    sort_column.isnot(None)
+                )
+            return db.or_(sort_column > value, db.and_(sort_column == value, TicketData.id > last_id))
+        
+        if value is None:
+            return db.and_(sort_column.is_(None), TicketData.id < last_id)
+        return db.or_(
+            sort_column < value,
+            db.and_(sort_column == value, TicketData.id < last_id),
+            sort_column.is_(None)
+        )
+
+ticket_query_service = TicketQueryService()
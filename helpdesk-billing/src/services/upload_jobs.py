@@ -0,0 +1,352 @@
+"""
+Processamento assíncrono de uploads de planilhas.
+
+O endpoint de upload apenas salva o arquivo e registra um UploadJob; o
+processamento (leitura, limpeza, gravação e estatísticas) roda em um pool de
+threads. O estado do job fica no banco, de modo que jobs pendentes são
+retomados quando a aplicação reinicia.
+
+Cada job em execução guarda o processo dono ('host:pid') e um heartbeat
+(updated_at). Um job 'running' só volta para a fila quando está órfão: o
+heartbeat parou ou o dono era um processo desta máquina que já terminou.
+Assim um segundo processo (filho do reloader, outro worker) não executa de
+novo um job que ainda está sendo processado.
+"""
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from src.database import db
+from src.models.upload_job import UploadJob
+from src.models.client import TicketData
+from src.services.data_processor import DataProcessor
+
+logger = logging.getLogger(__name__)
+
+class UploadJobManager:
+    """Fila de jobs de upload executados em segundo plano"""
+    
+    # Uploads gravam muito no SQLite; poucos workers evitam disputa pelo lock de escrita
+    MAX_WORKERS = 2
+    # Intervalo do heartbeat dos jobs em execução e da busca por jobs órfãos
+    HEARTBEAT_SECONDS = 30
+    # Sem heartbeat por mais que isso, o job é considerado órfão. Folgado porque o
+    # heartbeat pode esperar pelo lock de escrita do SQLite durante a gravação dos tickets
+    STALE_AFTER = timedelta(minutes=10)
+    
+    def __init__(self, max_workers: int = None):
+        self.app = None
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self._executor = None
+        self._lock = threading.Lock()
+        # Progresso em memória dos jobs em execução: {job_id: (processadas, total)}.
+        # Não é gravado a cada bloco para não abrir transações concorrentes
+        # com a gravação dos tickets; o banco recebe o valor final.
+        self._progress: Dict[str, tuple] = {}
+        # Jobs em execução neste processo
+        self._running = set()
+        self._started = False
+    
+    def init_app(self, app):
+        """Associa o gerenciador à aplicação; a fila é retomada no primeiro request (ver start)"""
+        self.app = app
+        app.before_request(self.start)
+    
+    @property
+    def owner_id(self) -> str:
+        # Calculado a cada uso: o pid muda quando o processo é criado por fork
+        return f'{socket.gethostname()}:{os.getpid()}'
+    
+    def start(self):
+        """
+        Retoma os jobs interrompidos e inicia o heartbeat, uma vez por processo.
+        
+        Roda no primeiro request e não na importação: o processo pai do reloader
+        do Flask e os comandos de CLI importam a aplicação mas nunca atendem
+        requests, então não retomam jobs.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.resume_pending_jobs()
+        threading.Thread(target=self._heartbeat_loop, name='upload-job-heartbeat', daemon=True).start()
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='upload-job')
+            return self._executor
+    
+    def create_job(self, filename: str, file_path: str, month: int = None, year: int = None,
+                   streaming: bool = False, incremental: bool = False,
+                   content_hash: str = None, force: bool = False, run_async: bool = True) -> UploadJob:
+        """
+        Registra um novo job e o envia para o pool de workers (ou o processa
+        na thread atual com run_async=False).
+        
+        Se o mesmo arquivo (content_hash) já foi ingerido para o período e esses
+        dados ainda são os vigentes, o job é criado já concluído com o resultado
+        do processamento anterior, a menos que force=True.
+        """
+        if content_hash and not force:
+            original = self.find_ingested_duplicate(content_hash, month, year)
+            if original:
+                return self._create_duplicate_job(original, filename, file_path, content_hash)
+        
+        job = UploadJob(
+            id=str(uuid.uuid4()),
+            filename=filename,
+            file_path=file_path,
+            content_hash=content_hash,
+            month=month,
+            year=year,
+            streaming=streaming,
+            incremental=incremental,
+            status=UploadJob.STATUS_QUEUED
+        )
+        db.session.add(job)
+        db.session.commit()
+        
+        if run_async:
+            self.submit(job.id)
+        else:
+            self._run_job(job.id)
+            # O job foi gravado por outra sessão (contexto próprio de _run_job)
+            db.session.refresh(job)
+        return job
+    
+    def find_ingested_duplicate(self, content_hash: str, month: int = None, year: int = None) -> Optional[UploadJob]:
+        """
+        Job concluído com o mesmo conteúdo cujo lote ainda é o dado vigente do período.
+        
+        Sem mês/ano informados, vale o período em que o arquivo foi carregado da
+        última vez. O resultado anterior só é reaproveitado se nenhum outro upload
+        foi concluído depois para o período e o lote não foi apagado.
+        """
+        query = UploadJob.query.filter_by(content_hash=content_hash, status=UploadJob.STATUS_COMPLETED)
+        if month and year:
+            query = query.filter_by(month=month, year=year)
+        candidate = query.order_by(UploadJob.finished_at.desc()).first()
+        if not candidate or not candidate.batch_id:
+            return None
+        
+        latest = UploadJob.query.filter_by(
+            status=UploadJob.STATUS_COMPLETED, month=candidate.month, year=candidate.year
+        ).order_by(UploadJob.finished_at.desc()).first()
+        if latest.batch_id != candidate.batch_id:
+            return None
+        
+        batch_exists = db.session.query(TicketData.id).filter_by(
+            upload_batch_id=candidate.batch_id,
+            processing_month=candidate.month,
+            processing_year=candidate.year
+        ).first() is not None
+        return candidate if batch_exists else None
+    
+    def _create_duplicate_job(self, original: UploadJob, filename: str, file_path: str, content_hash: str) -> UploadJob:
+        """Registra o reenvio como um job concluído com o resultado do original"""
+        result = original.get_result() or {}
+        result.update({
+            'deduplicated': True,
+            'duplicate_of': original.id,
+            'message': (
+                f'Arquivo idêntico já processado para {original.month:02d}/{original.year} '
+                f'(Lote: {original.batch_id}); estatísticas reaproveitadas. '
+                f'Envie force=true para reprocessar.'
+            )
+        })
+        
+        now = datetime.utcnow()
+        job = UploadJob(
+            id=str(uuid.uuid4()),
+            filename=filename,
+            file_path=file_path,
+            content_hash=content_hash,
+            month=original.month,
+            year=original.year,
+            status=UploadJob.STATUS_COMPLETED,
+            processed_rows=original.processed_rows,
+            total_rows=original.total_rows,
+            batch_id=original.batch_id,
+            started_at=now,
+            finished_at=now
+        )
+        job.set_result(result)
+        db.session.add(job)
+        db.session.commit()
+        
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        
+        logger.info(f"Upload {job.id} idêntico ao job {original.id}; processamento ignorado")
+        return job
+    
+    def submit(self, job_id: str):
+        self.executor.submit(self._run_job, job_id)
+    
+    def get_job_status(self, job_id: str) -> Optional[Dict]:
+        """Estado do job, com o progresso em memória quando ele ainda está em execução"""
+        job = db.session.get(UploadJob, job_id)
+        if not job:
+            return None
+        
+        data = job.to_dict()
+        progress = self._progress.get(job_id)
+        if progress and not job.is_finished:
+            processed, total = progress
+            data['processed_rows'] = processed
+            data['total_rows'] = total
+            data['progress'] = round(min(processed, total) / total * 100, 1) if total else None
+        return data
+    
+    def resume_pending_jobs(self, include_queued: bool = True):
+        """
+        Reenfileira os jobs órfãos em execução e, com include_queued, os que
+        estavam na fila quando a aplicação parou. Um job na fila pode ser
+        enviado por mais de um processo: só quem o reservar em _run_job o
+        processa.
+        """
+        statuses = [UploadJob.STATUS_RUNNING] + ([UploadJob.STATUS_QUEUED] if include_queued else [])
+        with self.app.app_context():
+            pending = UploadJob.query.filter(UploadJob.status.in_(statuses)).order_by(UploadJob.created_at).all()
+            
+            now = datetime.utcnow()
+            resumed = []
+            for job in pending:
+                if job.status == UploadJob.STATUS_RUNNING and not self._is_orphaned(job, now):
+                    continue
+                if not os.path.exists(job.file_path):
+                    job.status = UploadJob.STATUS_FAILED
+                    job.error = 'Arquivo do upload não encontrado ao retomar o job'
+                    job.finished_at = now
+                    continue
+                if job.status == UploadJob.STATUS_RUNNING:
+                    # Condicional ao heartbeat lido: se o dono atualizou o job nesse meio-tempo, ele está vivo.
+                    # O processamento substitui os dados do período, então reiniciar do zero é seguro
+                    requeued = UploadJob.query.filter_by(
+                        id=job.id, status=UploadJob.STATUS_RUNNING, updated_at=job.updated_at
+                    ).update(
+                        {'status': UploadJob.STATUS_QUEUED, 'processed_rows': 0, 'owner': None},
+                        synchronize_session=False
+                    )
+                    if not requeued:
+                        continue
+                resumed.append(job.id)
+            db.session.commit()
+        
+        for job_id in resumed:
+            logger.info(f"Retomando job de upload {job_id}")
+            self.submit(job_id)
+    
+    def _is_orphaned(self, job: UploadJob, now: datetime) -> bool:
+        """Job 'running' cujo dono parou: sem heartbeat recente ou processo desta máquina já encerrado"""
+        if job.id in self._running:
+            return False
+        if job.updated_at is None or job.updated_at < now - self.STALE_AFTER:
+            return True
+        
+        host, _, pid = (job.owner or '').rpartition(':')
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        if int(pid) == os.getpid():
+            # Mesmo pid mas fora de _running: é de uma execução anterior (ex.: contêiner reiniciado)
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        return False
+    
+    def _heartbeat_loop(self):
+        """Atualiza o heartbeat dos jobs deste processo e reenfileira jobs órfãos de outros processos"""
+        while True:
+            time.sleep(self.HEARTBEAT_SECONDS)
+            try:
+                running = list(self._running)
+                if running:
+                    with self.app.app_context():
+                        UploadJob.query.filter(
+                            UploadJob.id.in_(running), UploadJob.owner == self.owner_id
+                        ).update({'updated_at': datetime.utcnow()}, synchronize_session=False)
+                        db.session.commit()
+                self.resume_pending_jobs(include_queued=False)
+            except Exception:
+                logger.exception("Erro no heartbeat dos jobs de upload")
+    
+    def _run_job(self, job_id: str):
+        self._running.add(job_id)
+        try:
+            self._process_job(job_id)
+        finally:
+            self._running.discard(job_id)
+    
+    def _process_job(self, job_id: str):
+        with self.app.app_context():
+            # Reserva o job de forma atômica: só quem o tirar da fila o processa
+            now = datetime.utcnow()
+            claimed = UploadJob.query.filter_by(id=job_id, status=UploadJob.STATUS_QUEUED).update(
+                {'status': UploadJob.STATUS_RUNNING, 'started_at': now, 'owner': self.owner_id, 'updated_at': now},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if not claimed:
+                return
+            job = db.session.get(UploadJob, job_id)
+            
+            def on_progress(processed, total):
+                self._progress[job_id] = (processed, total)
+            
+            try:
+                processor = DataProcessor()
+                result = processor.process_excel_file(
+                    job.file_path, job.month, job.year,
+                    streaming=job.streaming, progress_callback=on_progress,
+                    incremental=bool(job.incremental)
+                )
+            except Exception as e:
+                logger.exception(f"Erro inesperado no job de upload {job_id}")
+                db.session.rollback()
+                result = {'success': False, 'message': f'Erro interno do servidor: {str(e)}'}
+            
+            processed, total = self._progress.pop(job_id, (0, None))
+            # A lista completa de registros não é guardada no job
+            result.pop('data', None)
+            job = db.session.get(UploadJob, job_id)
+            job.set_result(result)
+            job.batch_id = result.get('batch_id')
+            job.month = result.get('month', job.month)
+            job.year = result.get('year', job.year)
+            job.processed_rows = result.get('processed_records', processed)
+            if result.get('success'):
+                # O total da planilha é uma estimativa; ao final vale o que foi processado
+                job.total_rows = job.processed_rows
+                job.status = UploadJob.STATUS_COMPLETED
+            else:
+                job.total_rows = total
+                job.status = UploadJob.STATUS_FAILED
+                job.error = result.get('message')
+            job.finished_at = datetime.utcnow()
+            job.updated_at = job.finished_at
+            db.session.commit()
+            
+            # O arquivo só é removido depois que o resultado foi gravado
+            try:
+                os.remove(job.file_path)
+            except OSError:
+                pass
+            
+            logger.info(f"Job de upload {job_id} finalizado: {job.status}")
+
+upload_job_manager = UploadJobManager()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos da aplicação são importados como src.* (ver src/main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplicação com os blueprints da API e um banco SQLite temporário criado pelos modelos"""
+    from flask import Flask
+    from src.database import db
+    import src.models.client, src.models.technician, src.models.upload_job  # noqa: F401
+    import src.models.period_version, src.models.rollup, src.models.invoice_snapshot  # noqa: F401
+    from src.routes.analytics import analytics_bp
+    from src.routes.billing import billing_bp
+    from src.routes.client import client_bp
+    from src.routes.technician import technician_bp
+    from src.routes.auto_clients import auto_clients_bp
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    app.config['TESTING'] = True
+    db.init_app(app)
+    for blueprint in (analytics_bp, billing_bp, client_bp, technician_bp, auto_clients_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    
+    with app.app_context():
+        db.create_all()
+        # O cache é do processo e as versões de um banco novo recomeçam do zero
+        from src.services.billing_cache import billing_cache
+        billing_cache.clear()
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
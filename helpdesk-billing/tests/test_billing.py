@@ -0,0 +1,43 @@
+"""
+/billing/<mês>/<ano>: tickets de cada cliente no json por padrão (lidos pelo
+frontend atual), omitidos com include_tickets=false e no formato colunar
+"""
+from src.database import db
+from src.models.client import Client, TicketData, normalize_name
+from src.services.rollups import rollup_service
+
+def insert_tickets():
+    db.session.add(Client(name='Cliente A'))
+    db.session.flush()
+    db.session.execute(TicketData.__table__.insert(), [
+        {
+            'ticket_id': str(i),
+            'client_name': 'Cliente A',
+            'client_name_normalized': normalize_name('Cliente A'),
+            'total_service_time': 2.0,
+            'processing_month': 9,
+            'processing_year': 2025
+        }
+        for i in range(3)
+    ])
+    rollup_service.link_clients(['Cliente A'])
+    rollup_service.refresh_period(9, 2025)
+    db.session.commit()
+
+def test_billing_includes_tickets_by_default(client):
+    insert_tickets()
+    
+    clients = client.get('/api/billing/9/2025').get_json()['clients']
+    
+    assert [len(entry['tickets']) for entry in clients] == [3]
+    assert [ticket['ticket_id'] for ticket in clients[0]['tickets']] == ['0', '1', '2']
+
+def test_billing_without_tickets(client):
+    insert_tickets()
+    
+    clients = client.get('/api/billing/9/2025?include_tickets=false').get_json()['clients']
+    columnar = client.get('/api/billing/9/2025?format=columnar')
+    
+    assert 'tickets' not in clients[0]
+    assert clients[0]['tickets_count'] == 3
+    assert columnar.status_code == 200
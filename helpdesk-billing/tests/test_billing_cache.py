@@ -0,0 +1,33 @@
+from src.database import db
+from src.services.billing_cache import BillingCache
+
+def test_cached_value_is_a_copy_for_each_caller(app):
+    cache = BillingCache()
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        return {'clients': [{'client_name': 'A', 'total_value': 10.0}], 'summary': {'total_clients': 1}}
+    
+    first = cache.get_or_compute('billing', 9, 2025, compute)
+    first['clients'].append({'client_name': 'B'})
+    first['summary']['total_clients'] = 99
+    
+    second = cache.get_or_compute('billing', 9, 2025, compute)
+    second['clients'].sort(key=lambda client: client['client_name'], reverse=True)
+    third = cache.get_or_compute('billing', 9, 2025, compute)
+    
+    assert len(calls) == 1
+    assert third == {'clients': [{'client_name': 'A', 'total_value': 10.0}], 'summary': {'total_clients': 1}}
+    assert third is not second
+
+def test_bumped_period_is_recomputed(app):
+    cache = BillingCache()
+    values = iter([1, 2])
+    
+    assert cache.get_or_compute('statistics', 9, 2025, lambda: next(values)) == 1
+    cache.bump_period(9, 2025)
+    db.session.commit()
+    
+    assert cache.get_or_compute('statistics', 9, 2025, lambda: next(values)) == 2
+    assert cache.get_or_compute('statistics', 9, 2025, lambda: next(values)) == 2
@@ -0,0 +1,64 @@
+"""
+/billing/simulate com meses fechados: o valor atual vem das faturas congeladas
+e a simulação parte das regras vigentes no fechamento
+"""
+import pytest
+
+from src.database import db
+from src.models.client import Client, TicketData, normalize_name
+from src.services.invoice_snapshots import invoice_snapshot_service
+from src.services.rollups import rollup_service
+
+def insert_period(month, year, hours):
+    db.session.execute(TicketData.__table__.insert(), [
+        {
+            'ticket_id': f'{year}{month:02d}-{i}',
+            'client_name': 'Cliente A',
+            'client_name_normalized': normalize_name('Cliente A'),
+            'technician': 'Ana',
+            'total_service_time': value,
+            'external_service': i == 0,
+            'processing_month': month,
+            'processing_year': year
+        }
+        for i, value in enumerate(hours)
+    ])
+    rollup_service.link_clients(['Cliente A'])
+    rollup_service.refresh_period(month, year)
+    db.session.commit()
+
+@pytest.fixture
+def closed_august(app):
+    """Agosto fechado com hourly_rate 100 e setembro aberto, com a tarifa já alterada para 200"""
+    db.session.add(Client(name='Cliente A', contract_hours=5.0, hourly_rate=100.0, overtime_rate=150.0,
+                          external_service_rate=50.0))
+    db.session.commit()
+    insert_period(8, 2025, [2.0, 3.0, 4.0])
+    insert_period(9, 2025, [1.0, 2.0])
+    assert invoice_snapshot_service.close_period(8, 2025) is not None
+    
+    Client.query.filter_by(name='Cliente A').update({'hourly_rate': 200.0})
+    db.session.commit()
+
+def simulate(client, **body):
+    response = client.post('/api/billing/simulate', json={'from': '2025-08', 'to': '2025-09', **body})
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_closed_month_uses_billed_value(client, closed_august):
+    simulation = simulate(client)
+    
+    # Agosto: 5h x 100 + 4h x 150 + 1 x 50, como faturado; setembro: 3h x 200 + 1 x 50
+    assert simulation['closed_months'] == [{'year': 2025, 'month': 8}]
+    assert simulation['summary']['current_value'] == 1150.0 + 650.0
+    assert simulation['summary']['simulated_value'] == simulation['summary']['current_value']
+    
+    range_billing = client.get('/api/billing/range?from=2025-08&to=2025-09').get_json()
+    assert simulation['summary']['current_value'] == range_billing['summary']['total_value']
+
+def test_closed_month_simulates_rules_in_force_at_closing(client, closed_august):
+    simulation = simulate(client, multipliers={'hourly_rate': 1.5})
+    
+    # Agosto: 5h x 150 + 600 + 50; setembro: 3h x 300 + 50
+    assert simulation['summary']['simulated_value'] == 1400.0 + 950.0
+    assert simulation['clients'][0]['months'] == 2
@@ -0,0 +1,93 @@
+"""
+Ligação de tickets e resumos ao cadastro de clientes pelo nome normalizado:
+variações de acento, caixa e espaços apontam para o mesmo client_id
+"""
+import pandas as pd
+
+from src.database import db
+from src.models.client import Client, TicketData, normalize_name
+from src.models.rollup import PeriodClientRollup
+from src.services.data_processor import BillingCalculator, DataProcessor
+from src.services.invoice_snapshots import invoice_snapshot_service
+from src.services.rollups import rollup_service
+
+VARIANTS = ['Padaria São José', 'padaria sao jose', ' PADARIA SÃO JOSÉ ']
+
+def insert_tickets(names, month=9, year=2025, hours=1.0):
+    db.session.execute(TicketData.__table__.insert(), [
+        {
+            'ticket_id': str(i),
+            'client_name': name,
+            'client_name_normalized': normalize_name(name),
+            'total_service_time': hours,
+            'processing_month': month,
+            'processing_year': year
+        }
+        for i, name in enumerate(names)
+    ])
+    rollup_service.refresh_period(month, year)
+    db.session.commit()
+
+def linked_ids(model):
+    return {row.client_name: row.client_id for row in model.query.all()}
+
+def test_ingestion_encodes_name_variants(app):
+    client = Client(name='Padaria São José')
+    exact = Client(name='padaria sao jose')
+    db.session.add_all([client, exact])
+    db.session.commit()
+    
+    df = pd.DataFrame({'client_name': VARIANTS + ['Outro', None]})
+    encoded = DataProcessor()._encode_names(df, 'client_name', Client, normalized=True)
+    
+    # O nome exato tem prioridade; as demais variações ficam com o menor id
+    assert encoded == [client.id, exact.id, client.id, None, None]
+
+def test_link_clients_after_create_and_rename(app):
+    insert_tickets(VARIANTS + ['Outro'])
+    
+    client = Client(name='Padaria São José')
+    db.session.add(client)
+    db.session.flush()
+    rollup_service.link_clients([client.name])
+    db.session.commit()
+    
+    expected = {name: client.id for name in VARIANTS}
+    expected['Outro'] = None
+    assert linked_ids(TicketData) == expected
+    assert linked_ids(PeriodClientRollup) == expected
+    
+    previous_name, client.name = client.name, 'Outro'
+    db.session.flush()
+    rollup_service.link_clients([previous_name, client.name])
+    db.session.commit()
+    
+    expected = {name: None for name in VARIANTS}
+    expected['Outro'] = client.id
+    assert linked_ids(TicketData) == expected
+    assert linked_ids(PeriodClientRollup) == expected
+
+def test_billing_sums_name_variants_of_one_client(app):
+    insert_tickets(VARIANTS + ['padaria sao jose'], hours=4.0)
+    calculator = BillingCalculator()
+    
+    billing = calculator.calculate_all_clients_billing(9, 2025, include_tickets=True)
+    
+    client = Client.query.one()
+    single = calculator.calculate_client_billing(client.name, 9, 2025)
+    assert len(billing) == 1
+    assert billing[0]['client_id'] == client.id
+    # 16h numa única franquia: 10h x 100 + 6h x 115
+    assert billing[0]['total_hours'] == single['total_hours'] == 16.0
+    assert billing[0]['total_value'] == single['total_value'] == 1690.0
+    assert billing[0]['tickets_count'] == len(billing[0]['tickets']) == 4
+    
+    closed = invoice_snapshot_service.close_period(9, 2025)
+    assert (closed.clients_count, closed.total_value) == (1, 1690.0)
+
+def test_default_client_takes_most_frequent_spelling_trimmed(app):
+    insert_tickets([' PADARIA SÃO JOSÉ ', ' PADARIA SÃO JOSÉ ', 'padaria sao jose'])
+    
+    BillingCalculator().calculate_all_clients_billing(9, 2025)
+    
+    assert [client.name for client in Client.query.all()] == ['PADARIA SÃO JOSÉ']
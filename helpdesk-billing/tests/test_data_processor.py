@@ -0,0 +1,206 @@
+"""
+Paridade das otimizações do DataProcessor com o comportamento original:
+conversões vetorizadas contra os conversores escalares (_convert_time_to_hours
+e _convert_to_boolean) aplicados linha a linha, e estatísticas agrupadas
+(_group_statistics) contra o cálculo antigo com um filtro por técnico.
+"""
+import json
+import random
+from datetime import time, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.data_processor import DataProcessor
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+def row_by_row(series, converter):
+    """Conversão como era feita antes: o conversor escalar em cada linha"""
+    return [converter(value) for value in series]
+
+TIME_VALUES = [
+    '01:30:00', '1:30', ' 02:15:30 ', '10:00', '0:00:45', '2.5', '3', 'cerca de 4 horas',
+    'x:y', '', 'abc', 1, 2.75, 0, np.nan, None, pd.NaT,
+    timedelta(hours=1, minutes=15), pd.Timedelta(minutes=90), time(1, 30), '01:30:00'
+]
+
+BOOLEAN_VALUES = [
+    'Sim', 'sim ', 'SIM', 'Não', 'não', 'NÃO', 'nao', 'N', 's', 'Y', 'yes', 'No', 'TRUE', 'false',
+    '1', '0', 'verdadeiro', 'Falso', 'talvez', '', True, False, 1, 0, 2.5, np.nan, None, 'Sim'
+]
+
+@pytest.mark.parametrize('series', [
+    pd.Series(TIME_VALUES, dtype=object),
+    pd.Series(['01:30:00', '00:45:00', None, '01:30:00', '12:00']),
+    pd.Series([1.5, np.nan, 0.25, 3.0]),
+    pd.Series([1, 2, 3]),
+    pd.Series([True, False, True]),
+    pd.Series(pd.to_timedelta(['01:30:00', None, '00:00:30'])),
+    pd.Series([], dtype=object),
+], ids=['mixed', 'strings', 'float', 'int', 'bool', 'timedelta', 'empty'])
+def test_time_series_matches_scalar_conversion(processor, series):
+    expected = row_by_row(series, processor._convert_time_to_hours)
+    result = processor._convert_time_series_to_hours(series)
+    
+    assert list(result) == expected
+    assert list(result.index) == list(series.index)
+
+def test_time_series_known_values(processor):
+    series = pd.Series(['01:30:00', '2:15', '0.5', np.nan, timedelta(minutes=45), time(1, 0), 'sem número'])
+    
+    assert list(processor._convert_time_series_to_hours(series)) == [1.5, 2.25, 0.5, 0.0, 0.75, 0.0, 0.0]
+
+def count_scalar_calls(monkeypatch, processor, name):
+    """Substitui o conversor escalar por um que registra os valores recebidos"""
+    calls = []
+    scalar = getattr(processor, name)
+    monkeypatch.setattr(processor, name, lambda value: calls.append(value) or scalar(value))
+    return calls
+
+def test_time_strings_skip_scalar_converter(processor, monkeypatch):
+    rng = random.Random(0)
+    values = [f'{rng.randrange(100):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}' for _ in range(5000)]
+    values += [' 7:05 ', '2.5', 'cerca de 4 horas', None, time(1, 30), 1.25, '1:2:3:4']
+    series = pd.Series(values, dtype=object)
+    expected = row_by_row(series, processor._convert_time_to_hours)
+    
+    calls = count_scalar_calls(monkeypatch, processor, '_convert_time_to_hours')
+    result = processor._convert_time_series_to_hours(series)
+    
+    assert list(result) == expected
+    # Só o que não é HH:MM[:SS] passa pelo conversor escalar (ausentes nem isso)
+    assert calls == ['2.5', 'cerca de 4 horas', time(1, 30), 1.25, '1:2:3:4']
+
+def test_boolean_strings_skip_scalar_converter(processor, monkeypatch):
+    series = pd.Series(['Sim', ' não ', 'N', 'talvez', None, 1, 'Y'] * 100, dtype=object)
+    expected = row_by_row(series, processor._convert_to_boolean)
+    
+    calls = count_scalar_calls(monkeypatch, processor, '_convert_to_boolean')
+    result = processor._convert_boolean_series(series)
+    
+    assert list(result) == expected
+    assert calls == ['talvez', 1]
+
+@pytest.mark.parametrize('series', [
+    pd.Series(BOOLEAN_VALUES, dtype=object),
+    pd.Series(['Sim', 'Não', None, 'Sim', 'sim']),
+    pd.Series([1.0, 0.0, np.nan, 2.0]),
+    pd.Series([1, 0, 5]),
+    pd.Series([True, False]),
+    pd.Series([], dtype=object),
+], ids=['mixed', 'strings', 'float', 'int', 'bool', 'empty'])
+def test_boolean_series_matches_scalar_conversion(processor, series):
+    expected = row_by_row(series, processor._convert_to_boolean)
+    result = processor._convert_boolean_series(series)
+    
+    assert list(result) == expected
+    # Ausentes continuam None (e não NaN)
+    assert [value is None for value in result] == [value is None for value in expected]
+
+def test_boolean_series_known_values(processor):
+    series = pd.Series(['Sim', 'NÃO', 's', 'n', 'talvez', None, 1, 0])
+    
+    assert list(processor._convert_boolean_series(series)) == [True, False, True, False, None, None, True, False]
+
+def test_convert_by_unique_values_calls_converter_once_per_distinct_value(processor):
+    calls = []
+    
+    def converter(value):
+        calls.append(value)
+        return value.upper()
+    
+    series = pd.Series(['a', 'b', None, 'a', 'b', 'a'], index=[10, 11, 12, 13, 14, 15])
+    result = processor._convert_by_unique_values(series, converter, missing_value='?')
+    
+    assert sorted(calls) == ['a', 'b']
+    assert list(result) == ['A', 'B', '?', 'A', 'B', 'A']
+    assert list(result.index) == [10, 11, 12, 13, 14, 15]
+
+def per_row_statistics(df):
+    """_calculate_statistics como era antes de _group_statistics (um filtro do DataFrame por técnico)"""
+    stats = {}
+    
+    stats['total_tickets'] = len(df)
+    stats['unique_clients'] = df['client_name'].nunique()
+    stats['unique_technicians'] = df['technician'].nunique()
+    stats['total_hours'] = df['total_service_time'].sum()
+    
+    client_hours = df.groupby('client_name')['total_service_time'].sum().to_dict()
+    stats['hours_by_client'] = {str(k): v for k, v in client_hours.items()}
+    
+    technician_hours = df.groupby('technician')['total_service_time'].sum().to_dict()
+    stats['hours_by_technician'] = {str(k): v for k, v in technician_hours.items()}
+    
+    external_services = df[df['external_service'] == True].groupby('client_name').size().to_dict()
+    stats['external_services_by_client'] = {str(k): v for k, v in external_services.items()}
+    
+    external_services_tech = df[df['external_service'] == True].groupby('technician').size().to_dict()
+    stats['external_services_by_technician'] = {str(k): v for k, v in external_services_tech.items()}
+    
+    primary_categories = df['primary_category'].value_counts().to_dict()
+    stats['primary_categories'] = {str(k): v for k, v in primary_categories.items()}
+    
+    secondary_categories = df['secondary_category'].value_counts().to_dict()
+    stats['secondary_categories'] = {str(k): v for k, v in secondary_categories.items()}
+    
+    technician_stats = {}
+    for tech in df['technician'].unique():
+        if pd.isna(tech):
+            continue
+        
+        tech_data = df[df['technician'] == tech]
+        technician_stats[str(tech)] = {
+            'total_hours': tech_data['total_service_time'].sum(),
+            'total_tickets': len(tech_data),
+            'external_services': len(tech_data[tech_data['external_service'] == True]),
+            'unique_clients': tech_data['client_name'].nunique()
+        }
+    
+    stats['technician_details'] = technician_stats
+    
+    return stats
+
+def statistics_frame(rows, technicians, seed=0):
+    """Tickets já limpos, com técnicos e categorias ausentes e atendimentos externos nulos"""
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'client_name': [f'Cliente {rng.randint(1, 40)}' for _ in range(rows)],
+        'technician': [
+            f'Técnico {rng.randint(1, technicians)}' if rng.random() > 0.05 else None for _ in range(rows)
+        ],
+        'total_service_time': [rng.random() * 4 for _ in range(rows)],
+        'external_service': [rng.choice([True, False, False, None]) for _ in range(rows)],
+        'primary_category': [rng.choice(['Rede', 'Hardware', 'Software', None]) for _ in range(rows)],
+        'secondary_category': [rng.choice(['A', 'B', None]) for _ in range(rows)]
+    })
+
+@pytest.mark.parametrize('rows, technicians', [(3000, 5), (3000, 300), (1, 1), (0, 1)])
+def test_grouped_statistics_match_per_row_calculation(processor, rows, technicians):
+    df = statistics_frame(rows, technicians)
+    
+    stats = processor._calculate_statistics(df)
+    expected = per_row_statistics(df)
+    
+    assert stats == expected
+    # Mesma ordem de chaves (técnicos na ordem de aparição) e floats idênticos
+    assert json.dumps(stats, default=str) == json.dumps(expected, default=str)
+
+def test_group_statistics_aggregates(processor):
+    df = pd.DataFrame({
+        'client_name': ['A', 'B', 'A', 'C'],
+        'technician': ['T2', 'T1', 'T2', None],
+        'total_service_time': [1.0, 2.0, 0.5, 4.0],
+        'external_service': [True, None, True, False]
+    })
+    
+    by_client, by_technician = processor._group_statistics(df)
+    
+    assert by_client['hours'].to_dict() == {'A': 1.5, 'B': 2.0, 'C': 4.0}
+    assert by_client['external_services'].to_dict() == {'A': 2, 'B': 0, 'C': 0}
+    assert list(by_technician.index) == ['T2', 'T1']
+    assert by_technician['tickets'].to_dict() == {'T2': 2, 'T1': 1}
+    assert by_technician['unique_clients'].to_dict() == {'T2': 1, 'T1': 1}
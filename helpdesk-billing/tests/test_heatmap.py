@@ -0,0 +1,46 @@
+"""
+/heatmap-data/<mês>/<ano>: tickets de cada dia no payload por padrão (lidos pelo
+frontend atual) e iguais aos do detalhamento /day/<dia>
+"""
+from datetime import datetime
+
+from src.database import db
+from src.models.client import TicketData
+
+def insert_tickets():
+    db.session.execute(TicketData.__table__.insert(), [
+        {
+            'ticket_id': str(i),
+            'client_name': 'Cliente A',
+            'technician': 'Ana',
+            'total_service_time': 1.5,
+            'arrival_date': datetime(2025, 9, 1 + i % 3, 8 + i),
+            'processing_month': 9,
+            'processing_year': 2025
+        }
+        for i in range(7)
+    ])
+    # Ticket sem nenhuma data: conta para o período mas não para os dias
+    db.session.execute(TicketData.__table__.insert(), [
+        {'ticket_id': 'sem-data', 'client_name': 'Cliente A', 'created_at': None, 'processing_month': 9, 'processing_year': 2025}
+    ])
+    db.session.commit()
+
+def test_day_tickets_in_payload_by_default(client):
+    insert_tickets()
+    
+    days = client.get('/api/heatmap-data/9/2025').get_json()['heatmap_data']
+    
+    assert [len(day['tickets']) for day in days[:4]] == [3, 2, 2, 0]
+    for day in days[:3]:
+        drill_down = client.get(f"/api/heatmap-data/9/2025/day/{day['day']}").get_json()
+        assert sorted(day['tickets'], key=lambda t: t['date']) == drill_down['tickets']
+        assert day['ticket_count'] == drill_down['total']
+
+def test_day_tickets_left_out_on_request(client):
+    insert_tickets()
+    
+    data = client.get('/api/heatmap-data/9/2025?include_tickets=false').get_json()
+    
+    assert all('tickets' not in day for day in data['heatmap_data'])
+    assert data['statistics']['total_tickets'] == 7
@@ -0,0 +1,127 @@
+"""
+/statistics/<mês>/<ano> comparado com o cálculo original, que percorria os
+tickets do período em Python
+"""
+import random
+
+import pytest
+
+from src.database import db
+from src.models.client import Client, TicketData, normalize_name
+from src.services.billing_cache import billing_cache
+from src.services.rollups import rollup_service
+
+def per_ticket_statistics(tickets):
+    """Estatísticas como eram calculadas antes dos resumos, ticket a ticket"""
+    stats = {
+        'general': {
+            'total_tickets': len(tickets),
+            'unique_clients': len(set(ticket.client_name for ticket in tickets)),
+            'unique_technicians': len(set(ticket.technician for ticket in tickets if ticket.technician)),
+            'total_hours': sum(ticket.total_service_time for ticket in tickets),
+            'total_external_services': sum(1 for ticket in tickets if ticket.external_service)
+        },
+        'hours_by_client': {},
+        'hours_by_technician': {},
+        'external_services_by_technician': {},
+        'tickets_by_technician': {},
+        'unique_clients_by_technician': {},
+        'primary_categories': {},
+        'secondary_categories': {}
+    }
+    clients_by_technician = {}
+    for ticket in tickets:
+        if ticket.client_name:
+            stats['hours_by_client'][ticket.client_name] = (
+                stats['hours_by_client'].get(ticket.client_name, 0) + ticket.total_service_time
+            )
+        if ticket.technician:
+            stats['hours_by_technician'][ticket.technician] = (
+                stats['hours_by_technician'].get(ticket.technician, 0) + ticket.total_service_time
+            )
+            stats['tickets_by_technician'][ticket.technician] = stats['tickets_by_technician'].get(ticket.technician, 0) + 1
+            clients_by_technician.setdefault(ticket.technician, set()).add(ticket.client_name)
+            if ticket.external_service:
+                stats['external_services_by_technician'][ticket.technician] = (
+                    stats['external_services_by_technician'].get(ticket.technician, 0) + 1
+                )
+        for category in ('primary_category', 'secondary_category'):
+            value = getattr(ticket, category)
+            if value:
+                counts = stats[category.replace('category', 'categories')]
+                counts[value] = counts.get(value, 0) + 1
+    stats['unique_clients_by_technician'] = {tech: len(clients) for tech, clients in clients_by_technician.items()}
+    return stats
+
+def insert_tickets(rows, month=9, year=2025, seed=0):
+    """Tickets de clientes cadastrados ou não (client_id nulo), com nomes e técnicos vazios"""
+    rng = random.Random(seed)
+    db.session.add(Client(name='Cliente A'))
+    db.session.flush()
+    client_names = [rng.choice(['Cliente A', 'Cliente B', 'cliente á', '']) for _ in range(rows)]
+    db.session.execute(TicketData.__table__.insert(), [
+        {
+            'ticket_id': str(i),
+            'client_name': client_names[i],
+            'client_name_normalized': normalize_name(client_names[i]),
+            'technician': rng.choice(['Ana', 'Bruno', 'Carla', None, '']),
+            'total_service_time': round(rng.random() * 4, 4),
+            'external_service': rng.choice([True, False, None]),
+            'primary_category': rng.choice(['Rede', 'Hardware', None, '']),
+            'secondary_category': rng.choice(['A', 'B', None]),
+            'processing_month': month,
+            'processing_year': year
+        }
+        for i in range(rows)
+    ])
+    rollup_service.link_clients(['Cliente A'])
+    db.session.commit()
+
+def assert_matches_per_ticket(stats, month=9, year=2025):
+    tickets = TicketData.query.filter_by(processing_month=month, processing_year=year).order_by(TicketData.id).all()
+    expected = per_ticket_statistics(tickets)
+    
+    assert stats['period'] == {'month': month, 'year': year}
+    for section, values in expected.items():
+        if section == 'general' or section.startswith('hours_by'):
+            # Horas somadas por cliente/técnico e depois no total: a ordem das somas muda os últimos bits
+            assert stats[section] == pytest.approx(values, rel=1e-12), section
+        else:
+            assert stats[section] == values, section
+
+def test_statistics_from_rollups_match_per_ticket_calculation(client):
+    insert_tickets(400)
+    rollup_service.refresh_period(9, 2025)
+    db.session.commit()
+    
+    response = client.get('/api/statistics/9/2025')
+    
+    assert response.status_code == 200
+    assert_matches_per_ticket(response.get_json())
+
+def test_statistics_of_empty_period(client):
+    assert client.get('/api/statistics/1/2020').status_code == 404
+
+def test_statistics_without_rollups_match_per_ticket_calculation(client):
+    # Tickets gravados sem refresh_period: o período não tem resumo e a rota agrega direto em ticket_data
+    insert_tickets(400, seed=1)
+    assert not rollup_service.has_period(9, 2025)
+    
+    response = client.get('/api/statistics/9/2025')
+    
+    assert response.status_code == 200
+    assert_matches_per_ticket(response.get_json())
+    assert not rollup_service.has_period(9, 2025)
+
+def test_statistics_agree_with_and_without_rollups(client):
+    insert_tickets(400, seed=2)
+    from_tickets = client.get('/api/statistics/9/2025').get_json()
+    
+    rollup_service.refresh_period(9, 2025)
+    billing_cache.bump_period(9, 2025)
+    db.session.commit()
+    from_rollups = client.get('/api/statistics/9/2025').get_json()
+    
+    assert from_rollups.keys() == from_tickets.keys()
+    for section, values in from_tickets.items():
+        assert from_rollups[section] == pytest.approx(values, rel=1e-12), section
@@ -0,0 +1,46 @@
+"""
+/technician-details/<técnico>/<mês>/<ano>: tickets ligados ao cadastro e tickets
+que só têm o nome do técnico (sem cadastro ou gravados antes de uma renomeação)
+"""
+from src.database import db
+from src.models.client import TicketData
+from src.models.technician import Technician
+
+def insert_tickets(rows):
+    db.session.execute(TicketData.__table__.insert(), [
+        {
+            'ticket_id': str(i),
+            'client_name': 'Cliente A',
+            'technician': technician,
+            'technician_id': technician_id,
+            'total_service_time': 2.0,
+            'processing_month': 9,
+            'processing_year': 2025
+        }
+        for i, (technician, technician_id) in enumerate(rows)
+    ])
+    db.session.commit()
+
+def details(client, technician):
+    response = client.get(f'/api/technician-details/{technician}/9/2025')
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_unregistered_technician(client):
+    insert_tickets([('Ana', None), ('Ana', None), ('Bruno', None)])
+    
+    data = details(client, 'Ana')
+    
+    assert data['summary']['ticket_count'] == 2
+    assert data['summary']['total_hours'] == 4.0
+    assert len(data['tickets']) == 2
+
+def test_tickets_under_name_before_rename(client):
+    # 'Carla Souza' foi renomeada para 'Carla': os tickets com o nome antigo ficam sem technician_id
+    technician = Technician(name='Carla')
+    db.session.add(technician)
+    db.session.commit()
+    insert_tickets([('Carla', technician.id), ('Carla', technician.id), ('Carla Souza', None)])
+    
+    assert details(client, 'Carla')['summary']['ticket_count'] == 2
+    assert details(client, 'Carla Souza')['summary']['ticket_count'] == 1
@@ -0,0 +1,47 @@
+"""
+/technicians/stats/<mês>/<ano>: tickets de cada técnico por padrão (lidos pelo
+frontend atual) e só os totais com include_tickets=false
+"""
+from src.database import db
+from src.models.client import TicketData
+from src.models.technician import Technician
+
+def insert_tickets():
+    ana, bruno = Technician(name='Ana'), Technician(name='Bruno')
+    db.session.add_all([ana, bruno])
+    db.session.flush()
+    db.session.execute(TicketData.__table__.insert(), [
+        {
+            'ticket_id': str(i),
+            'client_name': 'Cliente A',
+            'technician': 'Ana',
+            'technician_id': ana.id,
+            'total_service_time': 2.0,
+            'processing_month': 9,
+            'processing_year': 2025
+        }
+        for i in range(3)
+    ])
+    db.session.commit()
+
+def stats_by_name(client, query=''):
+    response = client.get(f'/api/technicians/stats/9/2025{query}')
+    assert response.status_code == 200
+    return {entry['technician']['name']: entry['stats'] for entry in response.get_json()['technicians_stats']}
+
+def test_stats_include_tickets_by_default(client):
+    insert_tickets()
+    
+    stats = stats_by_name(client)
+    
+    assert [ticket['ticket_id'] for ticket in stats['Ana']['tickets']] == ['0', '1', '2']
+    assert stats['Ana']['total_tickets'] == 3
+    assert stats['Bruno']['total_tickets'] == 0
+
+def test_stats_without_tickets(client):
+    insert_tickets()
+    
+    stats = stats_by_name(client, '?include_tickets=false')
+    
+    assert 'tickets' not in stats['Ana']
+    assert stats['Ana']['total_hours'] == 6.0